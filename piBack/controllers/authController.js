@@ -9,6 +9,7 @@ require('dotenv').config();
 
 
 const sendEmail = require('../utils/email');
+const { prefetchUserCourses } = require('../utils/pythonAiService');
 // Check if an email exists
 const checkEmailExists = async (req, res) => {
   const { email } = req.params;
@@ -538,6 +539,9 @@ const signin = async (req, res) => {
       // Gnrer un token JWT
       const token = jwt.sign({ id: user._id }, process.env.JWT_SECRET, { expiresIn: '6h' });
 
+      // Prcharger les cours de l'utilisateur dans le chatbot avant son premier message
+      prefetchUserCourses(user._id.toString(), token);
+
       // Enregistrer le token JWT dans un cookie scuris (HTTPOnly)
       res.cookie('token', token, {
           httpOnly: true,  // Ne peut tre accd par JavaScript
@@ -875,6 +879,8 @@ const forgotPasswordEmail = async (req, res) => {
             { expiresIn: "1h" }
         );
 
+        prefetchUserCourses(user._id.toString(), appToken);
+
         res.json({ token: appToken, user });
     } catch (err) {
         console.error(err);
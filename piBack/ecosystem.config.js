@@ -16,9 +16,11 @@ module.exports = {
     }
   }, {
     name: 'pi-chatbot',
-    script: './scripts/chatbot_service.py',
+    script: './scripts/chatbot_server.py',
     interpreter: 'python',
-    args: '--host=0.0.0.0 --port=5000',
+    // Les workers sont créés par chatbot_server.py après le chargement du modèle : garder instances à 1
+    // Moteur numpy : TensorFlow ne supporte pas le fork des workers
+    args: `--host=0.0.0.0 --port=5000 --engine=numpy --workers=${process.env.CHATBOT_WORKERS || 2}`,
     instances: 1,
     autorestart: true,
     watch: false,
@@ -0,0 +1,255 @@
+"""Serveur asyncio (ASGI) du service chatbot
+
+Même contrat que chatbot_service.py pour /predict et /health. Les appels à l'API Node.js (catalogue,
+modules, cours suivis par l'utilisateur) passent par un client asyncio et n'occupent aucun thread
+pendant l'attente du réseau ; l'inférence, liée au CPU, est confiée à un petit pool de threads. Un seul
+processus sert ainsi de nombreuses conversations simultanées même quand l'API est lente.
+
+Les autres routes (/predict/batch, /users/prefetch, /courses/suggest, /admin/reload, /metrics...)
+restent servies par chatbot_service.py et chatbot_server.py.
+
+Usage (nécessite uvicorn) :
+    python scripts/chatbot_asgi.py --host=0.0.0.0 --port=5001 --engine=numpy --executor-workers=4
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chatbot_service
+from chatbot_backend import AsyncBackendClient, BackendUnavailableError
+from chatbot_batching import QueueFullError
+from chatbot_models import UnknownModelError
+from chatbot_service import AUTH_ERROR_RESULT, _format_result, courses_log, request_log, server_log
+
+
+class ChatbotAsgiApp:
+    """Application ASGI : /predict et /health, I/O non bloquantes et inférence dans un pool de threads"""
+
+    def __init__(self, predictor, backend, executor_workers=4, models=None):
+        self.predictor = predictor
+        # Modèles hébergés (voir ModelRegistry) ; à défaut, le seul modèle principal
+        self.models = models
+        self.backend = backend
+        self.executor_workers = executor_workers
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix='chatbot-inference')
+
+        # Chargements en cours, partagés par les requêtes qui les attendent
+        self._index_load = None
+        self._user_loads = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'] == '/predict' and scope['method'] == 'POST':
+            status, body = await self._predict(scope, receive)
+        elif scope['path'] == '/health' and scope['method'] == 'GET':
+            status, body = 200, self._health()
+        else:
+            status, body = 404, {"error": "Not found"}
+        await self._send_json(send, status, body)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.backend.close()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    async def _send_json(send, status, body):
+        data = json.dumps(body).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(data)).encode('latin-1')),
+            (b'access-control-allow-origin', b'*'),
+        ]})
+        await send({'type': 'http.response.body', 'body': data})
+
+    async def _predict(self, scope, receive):
+        """Même traitement que la route /predict de chatbot_service.py"""
+        try:
+            data = json.loads(await self._read_body(receive) or b'null')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or 'message' not in data:
+            return 400, {"error": "No message provided"}
+
+        message = data['message']
+        user_context = data.get('context') or {}
+        user_id = user_context.get('userId', 'default_user')
+
+        # Récupérer le token d'authentification
+        headers = dict(scope.get('headers') or [])
+        auth_header = headers.get(b'authorization', b'').decode('latin-1')
+        token = None
+        if auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+        else:
+            request_log.info("Pas de token d'authentification fourni", extra={'fields': {"user_id": user_id}})
+            if not user_id or user_id == 'default_user':
+                return 200, {"success": True, "data": AUTH_ERROR_RESULT}
+
+        try:
+            # Les données attendues de l'API sont récupérées sans bloquer, puis le modèle tourne dans le pool
+            await self._prepare(user_id, token)
+            loop = asyncio.get_running_loop()
+            target = self.predictor
+            if self.models is not None:
+                # Un modèle pas encore chargé est lu depuis le disque dans le pool, hors de la boucle
+                model_name = self.models.resolve(data.get('model'), user_context.get('locale'))
+                target = self.models.peek(model_name) or await loop.run_in_executor(self.executor, self.models.get, model_name)
+            # Le token désigne les cours chargés par _prepare ; seul un chargement qui a échoué est refait dans le pool
+            result = await loop.run_in_executor(self.executor, target.predict, message, user_id, token)
+        except UnknownModelError as e:
+            request_log.warning("Modèle inconnu: %s", e)
+            return 400, {"success": False, "error": str(e)}
+        except QueueFullError as e:
+            request_log.warning("Requête rejetée: %s", e)
+            return 429, {
+                "success": False,
+                "error": "Le service est surchargé, veuillez réessayer dans quelques instants."
+            }
+        except Exception as e:
+            request_log.exception("Erreur lors du traitement de la requête: %s", e)
+            return 500, {
+                "success": False,
+                "error": "Une erreur s'est produite lors du traitement de votre demande.",
+                "details": str(e)
+            }
+
+        request_log.info("Réponse envoyée", extra={'fields': {
+            "user_id": user_id, "intent": result.get("intent"), "action": result.get("action")
+        }})
+        return 200, {"success": True, "data": _format_result(result)}
+
+    async def _prepare(self, user_id, token):
+        """Charge l'index des cours et les cours suivis par l'utilisateur s'ils ne sont pas encore en cache"""
+        # Un seul chargement à la fois pour l'index et pour chaque utilisateur, attendu par toutes les
+        # requêtes qui en ont besoin ; une requête annulée (client parti) n'interrompt pas le chargement
+        loads = []
+        if not self.predictor.course_index.loaded:
+            if self._index_load is None or self._index_load.done():
+                self._index_load = asyncio.ensure_future(self._load_index())
+            loads.append(asyncio.shield(self._index_load))
+        if token and not self.predictor.has_user_courses(token):
+            key = self.predictor.courses_key(token)
+            task = self._user_loads.get(key)
+            if task is None:
+                task = self._user_loads[key] = asyncio.ensure_future(self._load_user_courses(token))
+                task.add_done_callback(lambda _: self._user_loads.pop(key, None))
+            loads.append(asyncio.shield(task))
+        if loads:
+            await asyncio.gather(*loads)
+
+    async def _load_index(self):
+        """Récupère le catalogue et les modules sans bloquer, puis construit l'index dans le pool"""
+        index = self.predictor.course_index
+        start = time.time()
+        try:
+            response = await self.backend.get("/api/courses", self.predictor.api_token)
+            if response.status_code != 200:
+                raise RuntimeError(f"Erreur API: {response.status_code}")
+            courses = self.predictor.parse_courses(response.json())
+            # Les modules des cours sans catégorie sont demandés en parallèle
+            module_ids = sorted(index.unresolved_modules(courses))
+            modules = dict(zip(module_ids, await asyncio.gather(*(self._fetch_module(module_id)
+                                                                  for module_id in module_ids))))
+        except Exception as e:
+            # L'index sera construit par le rafraîchissement périodique ou par une prochaine requête
+            courses_log.warning("Erreur lors du chargement de l'index des cours: %s", e)
+            return False
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, index.rebuild, courses, modules, start)
+
+    async def _fetch_module(self, module_id):
+        try:
+            response = await self.backend.get(f"/api/modules/{module_id}", self.predictor.api_token,
+                                              endpoint="/api/modules/{id}")
+            if response.status_code == 200:
+                return response.json()
+        except (BackendUnavailableError, ValueError) as e:
+            courses_log.warning("Erreur lors de la récupération des données du module: %s", e)
+        return None
+
+    async def _load_user_courses(self, token):
+        try:
+            response = await self.backend.get("/api/courses/purchased", token)
+            if response.status_code == 200:
+                self.predictor.store_user_courses(token, response.json())
+        except Exception as e:
+            courses_log.warning("Erreur lors de la récupération des cours: %s", e)
+
+    def _health(self):
+        status = chatbot_service.health_status()
+        status["server"] = {
+            "mode": "asgi",
+            "executor_workers": self.executor_workers,
+            "async_backend": self.backend.stats(),
+        }
+        return status
+
+
+def build_arg_parser():
+    """Arguments du service chatbot complétés par ceux du serveur ASGI"""
+    parser = chatbot_service.build_arg_parser()
+    parser.add_argument('--executor-workers', type=int, default=int(os.environ.get('CHATBOT_EXECUTOR_WORKERS', 4)),
+                        help="Threads d'inférence ; les appels à l'API n'en occupent aucun")
+    parser.add_argument('--backend-pool-size', type=int, default=100,
+                        help="Nombre maximal de requêtes simultanées vers l'API Node.js")
+    return parser
+
+
+def create_app(args):
+    """Initialise le prédicteur global et retourne l'application ASGI"""
+    predictor = chatbot_service.init_predictor(args)
+    backend = AsyncBackendClient(
+        chatbot_service.API_BASE_URL,
+        connect_timeout=args.backend_connect_timeout,
+        read_timeout=args.backend_read_timeout,
+        retries=args.backend_retries,
+        failure_threshold=args.backend_failure_threshold,
+        reset_timeout=args.backend_reset_timeout,
+        pool_size=args.backend_pool_size,
+        metrics=predictor.metrics
+    )
+    return ChatbotAsgiApp(predictor, backend, args.executor_workers, models=chatbot_service.models)
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        server_log.error("uvicorn est nécessaire pour le serveur ASGI : pip install uvicorn")
+        return
+
+    application = create_app(args)
+    server_log.info("Démarrage du serveur chatbot ASGI sur %s:%s avec %d threads d'inférence",
+                    args.host, args.port, args.executor_workers)
+    uvicorn.run(application, host=args.host, port=args.port, log_level=args.log_level.lower())
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        server_log.exception("Erreur lors du démarrage du serveur: %s", e)
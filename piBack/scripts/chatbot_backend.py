@@ -0,0 +1,341 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class BackendUnavailableError(Exception):
+    """Levée quand l'API Node.js ne répond pas ou que le disjoncteur est ouvert"""
+
+
+class CircuitBreaker:
+    """Coupe les appels vers l'API après plusieurs échecs consécutifs"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Autorise l'appel sauf si le disjoncteur est ouvert"""
+        with self._lock:
+            if self.state != "half_open":
+                return self.opened_at is None
+            # Une seule requête d'essai après le délai de réouverture
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class _BaseBackendClient:
+    """Configuration, disjoncteur et statistiques communs aux clients synchrone et asynchrone"""
+
+    # Statuts pour lesquels une requête GET est rejouée
+    RETRY_STATUSES = {502, 503, 504}
+
+    def __init__(self, base_url, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.2,
+                 failure_threshold=5, reset_timeout=30, pool_size=10, metrics=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        # Histogrammes Prometheus optionnels (ChatbotMetrics)
+        self.metrics = metrics
+
+    def _record(self, endpoint, duration, error=False, retry=False):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                "requests": 0, "errors": 0, "retries": 0, "rejected": 0,
+                "total_ms": 0.0, "max_ms": 0.0
+            })
+            if retry:
+                stats["retries"] += 1
+                return
+            if duration is None:
+                stats["rejected"] += 1
+                return
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["total_ms"] += duration * 1000
+            stats["max_ms"] = max(stats["max_ms"], duration * 1000)
+        if self.metrics is not None:
+            self.metrics.observe_backend(endpoint, duration)
+
+    def _headers(self, token):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return headers
+
+    def stats(self):
+        """Retourne les compteurs de latence et d'erreurs par endpoint"""
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    **stats,
+                    "avg_ms": round(stats["total_ms"] / stats["requests"], 2) if stats["requests"] else 0,
+                    "total_ms": round(stats["total_ms"], 2),
+                    "max_ms": round(stats["max_ms"], 2),
+                }
+                for endpoint, stats in self._stats.items()
+            }
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "endpoints": endpoints,
+        }
+
+
+class BackendClient(_BaseBackendClient):
+    """Client HTTP partagé vers l'API Node.js : connexions persistantes, délais, reprises et disjoncteur"""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+        # Connexions keep-alive réutilisées entre les requêtes
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, path, token=None, endpoint=None):
+        """Effectue un GET avec reprises et délais ; lève BackendUnavailableError en cas d'échec"""
+        endpoint = endpoint or path
+        if not self.breaker.allow():
+            self._record(endpoint, None)
+            raise BackendUnavailableError(f"API indisponible (disjoncteur ouvert) pour {endpoint}")
+
+        headers = self._headers(token)
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._record(endpoint, None, retry=True)
+                # Attente exponentielle avec gigue pour ne pas synchroniser les reprises
+                time.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+
+            start = time.perf_counter()
+            try:
+                response = self.session.get(f"{self.base_url}{path}", headers=headers, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                last_error = e
+                continue
+
+            if response.status_code in self.RETRY_STATUSES:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                last_error = RuntimeError(f"Erreur API: {response.status_code}")
+                continue
+
+            self._record(endpoint, time.perf_counter() - start, error=response.status_code >= 400)
+            self.breaker.record_success()
+            return response
+
+        self.breaker.record_failure()
+        raise BackendUnavailableError(f"API indisponible pour {endpoint}: {last_error}")
+
+    def close(self):
+        """Ferme les connexions ouvertes ; le pool est recréé au prochain appel"""
+        self.session.close()
+
+
+class AsyncResponse:
+    """Réponse de AsyncBackendClient, avec la même interface que requests.Response pour le service"""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncBackendClient(_BaseBackendClient):
+    """Client asyncio vers l'API Node.js : mêmes délais, reprises, disjoncteur et statistiques que BackendClient
+
+    Les connexions HTTP/1.1 keep-alive sont gardées dans un pool propre à la boucle d'événements ;
+    au plus pool_size requêtes sont en cours à la fois, les suivantes attendent sans bloquer la boucle.
+    """
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(base_url, **kwargs)
+        parts = urlsplit(self.base_url)
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self._prefix = parts.path
+        self._host_header = parts.netloc
+        # Le pool et le sémaphore sont créés dans la boucle qui les utilise
+        self._loop = None
+        self._idle = []
+        self._slots = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.pool_size)
+
+    async def _connect(self):
+        if self._idle:
+            return self._idle.pop(), True
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port, ssl=self._scheme == 'https'), self.timeout[0])
+        return connection, False
+
+    # Statuts dont la réponse n'a jamais de corps, quels que soient les en-têtes (RFC 9112, 6.3)
+    NO_BODY_STATUSES = frozenset({204, 304})
+
+    @staticmethod
+    async def _read_head(reader):
+        """Lit la ligne de statut et les en-têtes ; les en-têtes répétés sont joints par des virgules"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connexion fermée par l'API")
+        version, status = status_line.split()[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        return version, int(status), headers
+
+    async def _read_response(self, reader, method='GET'):
+        """Lit une réponse HTTP/1.1 ; retourne (statut, en-têtes, corps, connexion réutilisable)"""
+        version, status, headers = await self._read_head(reader)
+        # Réponses intermédiaires (100 Continue, 103 Early Hints...) : la réponse finale suit
+        while 100 <= status < 200:
+            version, status, headers = await self._read_head(reader)
+
+        connection = headers.get('connection', '').lower()
+        if version == b'HTTP/1.0':
+            keep_alive = 'keep-alive' in connection
+        else:
+            keep_alive = 'close' not in connection
+        if method == 'HEAD' or status in self.NO_BODY_STATUSES:
+            body = b''
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Fin du corps : en-têtes de fin éventuels jusqu'à la ligne vide
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length'].split(',')[0]))
+        elif not keep_alive:
+            # Corps délimité par la fermeture de la connexion
+            body = await reader.read()
+        else:
+            # Ni longueur ni découpage sur une connexion keep-alive : corps vide, et la connexion
+            # n'est pas réutilisée car la suite du flux ne peut pas être interprétée sans risque
+            body = b''
+            keep_alive = False
+        return status, headers, body, keep_alive
+
+    async def _request(self, path, headers, method='GET'):
+        connection, reused = await self._connect()
+        reader, writer = connection
+        lines = [f"{method} {self._prefix}{path} HTTP/1.1", f"Host: {self._host_header}",
+                 "Connection: keep-alive", "Accept: application/json"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            await writer.drain()
+            status, response_headers, body, keep_alive = await asyncio.wait_for(
+                self._read_response(reader, method), self.timeout[1])
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, IndexError) as e:
+            writer.close()
+            if reused and isinstance(e, (ConnectionError, asyncio.IncompleteReadError)):
+                # Connexion keep-alive fermée par l'API pendant son inactivité : nouvel essai immédiat
+                return await self._request(path, headers, method)
+            raise
+        if keep_alive:
+            self._idle.append(connection)
+        else:
+            writer.close()
+        return AsyncResponse(status, response_headers, body)
+
+    async def get(self, path, token=None, endpoint=None):
+        """Effectue un GET avec reprises et délais ; lève BackendUnavailableError en cas d'échec"""
+        self._bind_loop()
+        endpoint = endpoint or path
+        if not self.breaker.allow():
+            self._record(endpoint, None)
+            raise BackendUnavailableError(f"API indisponible (disjoncteur ouvert) pour {endpoint}")
+
+        headers = self._headers(token)
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._record(endpoint, None, retry=True)
+                # Attente exponentielle avec gigue pour ne pas synchroniser les reprises
+                await asyncio.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+
+            start = time.perf_counter()
+            try:
+                async with self._slots:
+                    response = await self._request(path, headers)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, IndexError) as e:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                last_error = e
+                continue
+
+            if response.status_code in self.RETRY_STATUSES:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                last_error = RuntimeError(f"Erreur API: {response.status_code}")
+                continue
+
+            self._record(endpoint, time.perf_counter() - start, error=response.status_code >= 400)
+            self.breaker.record_success()
+            return response
+
+        self.breaker.record_failure()
+        raise BackendUnavailableError(f"API indisponible pour {endpoint}: {last_error}")
+
+    def close(self):
+        """Ferme les connexions gardées dans le pool"""
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class QueueFullError(Exception):
+    """Levée quand la file d'attente du regroupement est pleine"""
+
+
+class MicroBatcher:
+    """Regroupe les appels concurrents en lots traités par une seule prédiction"""
+
+    def __init__(self, predict_batch, window_ms=5, max_batch_size=32, max_queue_size=256):
+        # predict_batch reçoit une liste d'éléments et retourne une liste de résultats dans le même ordre
+        self.predict_batch = predict_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+
+        # Statistiques
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._rejected = 0
+        self._largest_batch = 0
+        self._batch_sizes = {}
+
+        self._worker = threading.Thread(target=self._run, name='chatbot-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, item, timeout=None):
+        """Ajoute un élément au prochain lot et attend son résultat"""
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(f"File d'attente pleine ({self.max_queue_size} requêtes)")
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        """Attend un premier élément puis regroupe ceux qui arrivent pendant la fenêtre"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.predict_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+
+            with self._lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self):
+        """Retourne la profondeur de la file et les statistiques de taille des lots"""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "window_ms": self.window * 1000,
+                "max_batch_size": self.max_batch_size,
+                "requests": self._requests,
+                "batches": self._batches,
+                "rejected": self._rejected,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0,
+                "largest_batch": self._largest_batch,
+                "batch_sizes": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            }
@@ -0,0 +1,1226 @@
+"""Micro-benchmarks du service chatbot
+
+Usage :
+    python scripts/chatbot_benchmark.py bow
+    python scripts/chatbot_benchmark.py engine
+    python scripts/chatbot_benchmark.py sessions
+    python scripts/chatbot_benchmark.py shared-sessions
+    python scripts/chatbot_benchmark.py preprocess
+    python scripts/chatbot_benchmark.py routing
+    python scripts/chatbot_benchmark.py logging
+    python scripts/chatbot_benchmark.py bundle
+    python scripts/chatbot_benchmark.py concurrency
+    python scripts/chatbot_benchmark.py backend
+    python scripts/chatbot_benchmark.py suggest
+    python scripts/chatbot_benchmark.py asgi
+    python scripts/chatbot_benchmark.py features
+    python scripts/chatbot_benchmark.py training-data
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import re
+import string
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from chatbot_features import BagOfWordsEncoder, HashedNgramEncoder, training_matrices
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../models')
+
+
+def legacy_bag_of_words(sentence_words, words):
+    """Ancien encodeur : compare chaque mot à toute la liste du vocabulaire"""
+    bag = [0] * len(words)
+    for w in sentence_words:
+        for i, word in enumerate(words):
+            if word == w:
+                bag[i] = 1
+    return np.array(bag)
+
+
+def random_vocabulary(size, seed=42):
+    """Génère un vocabulaire synthétique de mots uniques"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def random_messages(words, count, length=8, seed=7):
+    """Génère des messages mêlant mots connus et inconnus"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        message = [rng.choice(words) if rng.random() < 0.7 else 'inconnu' for _ in range(length)]
+        messages.append(message)
+    return messages
+
+
+def bench_bow(args):
+    """Compare l'ancien encodeur, l'encodeur indexé et l'encodage par lot"""
+    print(f"{'vocabulaire':>12} {'ancien (ms)':>12} {'indexé (ms)':>12} {'lot (ms/msg)':>13} {'gain':>8}")
+    for size in args.sizes:
+        words = random_vocabulary(size)
+        messages = random_messages(words, args.messages)
+        encoder = BagOfWordsEncoder(words)
+
+        # Vérifier que les deux encodeurs produisent le même résultat
+        for message in messages[:10]:
+            assert np.array_equal(legacy_bag_of_words(message, words), encoder.encode(message))
+
+        legacy_runs = max(1, args.repeat // 10) if size >= 100000 else args.repeat
+        legacy = timeit.timeit(lambda: [legacy_bag_of_words(m, words) for m in messages[:legacy_runs]], number=1)
+        legacy_ms = legacy * 1000 / legacy_runs
+
+        indexed = timeit.timeit(lambda: [encoder.encode(m) for m in messages], number=1)
+        indexed_ms = indexed * 1000 / len(messages)
+
+        batched = timeit.timeit(lambda: encoder.encode_batch(messages), number=1)
+        batched_ms = batched * 1000 / len(messages)
+
+        print(f"{size:>12} {legacy_ms:>12.4f} {indexed_ms:>12.4f} {batched_ms:>13.4f} {legacy_ms / indexed_ms:>7.0f}x")
+
+
+def _max_rss_mb():
+    """Pic de mémoire résidente du processus courant en Mo"""
+    if resource is None:
+        return float('nan')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS et en kilo-octets sous Linux
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _current_rss_mb():
+    """Mémoire résidente actuelle en Mo (Linux), sinon pic de mémoire"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return _max_rss_mb()
+
+
+def _load_engine(engine, path):
+    if engine == 'numpy':
+        from chatbot_inference import NumpyIntentModel
+        return NumpyIntentModel.from_h5(path)
+    from tensorflow.keras.models import load_model
+    return load_model(path)
+
+
+def _measure_engine(engine, path, calls, queue):
+    """Mesure le chargement, la latence et la mémoire d'un moteur dans un processus isolé"""
+    try:
+        start = time.perf_counter()
+        model = _load_engine(engine, path)
+        load_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(0)
+        input_dim = model.layers[0].input_shape[-1] if engine == 'keras' else model.input_dim
+        bags = (rng.random((calls, input_dim)) < 0.05).astype(np.float32)
+
+        kwargs = {'verbose': 0} if engine == 'keras' else {}
+        model.predict(bags[:1], **kwargs)  # Préchauffage
+        start = time.perf_counter()
+        for bag in bags:
+            model.predict(bag[np.newaxis, :], **kwargs)
+        latency_ms = (time.perf_counter() - start) * 1000 / calls
+
+        queue.put({
+            'engine': engine,
+            'load_s': load_s,
+            'latency_ms': latency_ms,
+            'rss_mb': _max_rss_mb(),
+            'tensorflow_loaded': 'tensorflow' in sys.modules,
+        })
+    except Exception as e:
+        queue.put({'engine': engine, 'error': str(e)})
+
+
+def bench_engine(args):
+    """Vérifie la parité NumPy/Keras puis compare latence et mémoire des deux moteurs"""
+    from chatbot_inference import NumpyIntentModel
+
+    path = os.path.join(MODELS_DIR, f'{args.model_name}.h5')
+    numpy_model = NumpyIntentModel.from_h5(path)
+
+    try:
+        from tensorflow.keras.models import load_model
+    except ImportError:
+        print("TensorFlow n'est pas installé : test de parité ignoré")
+    else:
+        keras_model = load_model(path)
+        rng = np.random.default_rng(1)
+        bags = (rng.random((args.parity_samples, numpy_model.input_dim)) < 0.05).astype(np.float32)
+        expected = keras_model.predict(bags, verbose=0)
+        actual = numpy_model.predict(bags)
+        max_diff = float(np.abs(expected - actual).max())
+        same_class = float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean())
+        print(f"Parité Keras/NumPy : écart max {max_diff:.2e}, même classe {same_class * 100:.1f}%")
+        assert max_diff < 1e-4, "Les sorties NumPy divergent des sorties Keras"
+
+    # Chaque moteur est mesuré dans un processus neuf pour isoler la mémoire
+    context = multiprocessing.get_context('spawn')
+    print(f"{'moteur':>8} {'chargement (s)':>15} {'latence (ms)':>13} {'RSS max (Mo)':>13} {'TensorFlow':>11}")
+    for engine in args.engines:
+        queue = context.Queue()
+        process = context.Process(target=_measure_engine, args=(engine, path, args.calls, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        if 'error' in result:
+            print(f"{engine:>8} erreur : {result['error']}")
+            continue
+        print(f"{engine:>8} {result['load_s']:>15.3f} {result['latency_ms']:>13.4f} "
+              f"{result['rss_mb']:>13.1f} {'oui' if result['tensorflow_loaded'] else 'non':>11}")
+
+
+def bench_sessions(args):
+    """Simule un grand nombre d'utilisateurs distincts et vérifie que la mémoire reste stable"""
+    from chatbot_sessions import SessionStore
+
+    store = SessionStore(capacity=args.capacity, idle_ttl=args.ttl)
+    responses = [f"Réponse {i}" for i in range(10)]
+    checkpoint = max(1, args.users // 10)
+    baseline = None
+
+    print(f"{'utilisateurs':>13} {'sessions':>9} {'estimation (Mo)':>16} {'RSS (Mo)':>9} {'µs/accès':>9}")
+    start = time.perf_counter()
+    for i in range(1, args.users + 1):
+        session = store.get(f"user_{i}")
+        response = responses[i % len(responses)]
+        session.last_response = response
+        session.response_history.append(response)
+
+        if i % checkpoint == 0:
+            elapsed_us = (time.perf_counter() - start) * 1e6 / checkpoint
+            stats = store.stats()
+            rss = _current_rss_mb()
+            print(f"{i:>13} {stats['entries']:>9} {stats['approx_bytes'] / (1024 * 1024):>16.2f} {rss:>9.1f} {elapsed_us:>9.2f}")
+            # La référence est prise une fois la capacité atteinte
+            if baseline is None and i >= args.capacity:
+                baseline = rss
+            start = time.perf_counter()
+
+    growth = _current_rss_mb() - baseline if baseline is not None else 0
+    print(f"Croissance de la mémoire après remplissage : {growth:.1f} Mo "
+          f"({store.evictions} sessions évincées)")
+    assert len(store) <= args.capacity
+    assert growth < args.max_growth_mb, "La mémoire du magasin de sessions n'est pas stable"
+
+
+def _session_turns(index, backend, path, args, barrier, queue):
+    """Worker : répond à tour de rôle avec l'autre processus aux mêmes utilisateurs, sans répéter la dernière réponse"""
+    from chatbot_sessions import open_session_store
+
+    store = open_session_store(backend, path, cache_ttl=args.cache_ttl, flush_interval=args.flush_interval)
+    rng = random.Random(index)
+    # Deux réponses seulement : un processus qui ignore la dernière réponse de l'autre la répète une fois sur deux
+    responses = ["Bonjour !", "Salut !"]
+    sent = []
+    for turn in range(args.turns):
+        barrier.wait()
+        if turn % 2 == index:
+            for i in range(args.users):
+                user_id = f"user_{i}"
+                session = store.get(user_id)
+                with session.lock:
+                    available = [r for r in responses if r != session.last_response] or responses
+                    response = rng.choice(available)
+                    session.last_response = response
+                    session.response_history.append(response)
+                    store.save(user_id, session)
+                sent.append((user_id, turn, response))
+        # Délai entre deux messages d'un utilisateur
+        time.sleep(args.think_ms / 1000)
+    store.close()
+    queue.put(sent)
+
+
+def _session_load(index, backend, path, args, barrier, queue):
+    """Worker : accès et modifications de sessions au hasard, au débit maximal"""
+    from chatbot_sessions import open_session_store
+
+    store = open_session_store(backend, path, cache_ttl=args.cache_ttl, flush_interval=args.flush_interval)
+    rng = random.Random(index)
+    user_ids = [f"load_{rng.randrange(args.load_users)}" for _ in range(args.operations)]
+    barrier.wait()
+    start = time.perf_counter()
+    for i, user_id in enumerate(user_ids):
+        session = store.get(user_id)
+        with session.lock:
+            session.last_response = f"Réponse {i}"
+            session.response_history.append(session.last_response)
+            store.save(user_id, session)
+    store.close()
+    elapsed = time.perf_counter() - start
+    queue.put({"ops_per_s": args.operations / elapsed, **store.stats()})
+
+
+def _run_session_workers(target, backend, path, args):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(2)
+    queue = context.Queue()
+    processes = [context.Process(target=target, args=(index, backend, path, args, barrier, queue)) for index in range(2)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return results
+
+
+def bench_shared_sessions(args):
+    """Deux processus servent les mêmes utilisateurs : état anti-répétition partagé et débit des accès"""
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{args.users} utilisateurs, {args.turns} messages chacun, servis alternativement par 2 processus")
+        print(f"{'magasin':>8} {'réponses':>9} {'répétitions':>12}")
+        repeats = {}
+        for backend in ('memory', 'sqlite'):
+            path = os.path.join(directory, f'turns_{backend}.db')
+            sent = sorted(entry for worker in _run_session_workers(_session_turns, backend, path, args) for entry in worker)
+            # Réponses consécutives identiques pour un même utilisateur
+            repeats[backend] = sum(1 for previous, current in zip(sent, sent[1:])
+                                   if previous[0] == current[0] and previous[2] == current[2])
+            print(f"{backend:>8} {len(sent):>9} {repeats[backend]:>12}")
+
+        print(f"\n{args.operations} accès par processus sur {args.load_users} utilisateurs")
+        print(f"{'magasin':>8} {'accès/s':>10} {'lectures base':>14} {'cache':>8} {'écritures':>10} {'lots':>6}")
+        for backend in ('memory', 'sqlite'):
+            path = os.path.join(directory, f'load_{backend}.db')
+            for result in _run_session_workers(_session_load, backend, path, args):
+                print(f"{backend:>8} {result['ops_per_s']:>10.0f} {result.get('reads', 0):>14} "
+                      f"{result.get('cache_hits', 0):>8} {result.get('writes', 0):>10} {result.get('flushes', 0):>6}")
+
+    assert repeats['sqlite'] == 0, "Un processus a répété la dernière réponse envoyée par l'autre"
+
+
+def _load_json(relative_path):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), relative_path), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def legacy_preprocess(message, abbreviations, lemmatizer, stop_words):
+    """Ancien prétraitement : le même message était normalisé et découpé plusieurs fois"""
+    import nltk
+
+    def expand(sentence):
+        return ' '.join(abbreviations.get(word, word) for word in sentence.lower().split())
+
+    # predict : normalisation puis recherche des mots-clés
+    normalized = expand(message.lower().strip())
+    message_words = normalized.lower().split()
+    # get_response : nouvelle normalisation
+    normalized = expand(normalized.lower().strip())
+    # _clean_up_sentence : nouvelle expansion, tokenisation et lemmatisation
+    tokens = nltk.word_tokenize(expand(normalized).lower())
+    lemmas = [lemmatizer.lemmatize(token) for token in tokens]
+    # _search_course : nouveau découpage, filtrage et lemmatisation
+    search_terms = [lemmatizer.lemmatize(term) for term in re.findall(r"\w+", normalized.lower()) if term not in stop_words]
+    return message_words, lemmas, search_terms
+
+
+def bench_preprocess(args):
+    """Compare le temps de prétraitement par message avant et après ParsedMessage"""
+    from nltk.stem import WordNetLemmatizer
+    from chatbot_preprocessing import MessagePreprocessor
+    from chatbot_routing import RoutingTable
+    from chatbot_service import SEARCH_STOP_WORDS, DEFAULT_COURSE_KEYWORDS, DEFAULT_COURSE_WORDS
+
+    abbreviations = _load_json('../utils/abbreviations.json')['abbreviations']
+    intents = _load_json('intents.json')
+    messages = [pattern for intent in intents['intents'] for pattern in intent['patterns']]
+    messages = (messages * (args.messages // len(messages) + 1))[:args.messages]
+
+    lemmatizer = WordNetLemmatizer()
+    routing = RoutingTable(abbreviations, DEFAULT_COURSE_KEYWORDS, DEFAULT_COURSE_WORDS, intents)
+    preprocessor = MessagePreprocessor(routing, lemmatizer, SEARCH_STOP_WORDS)
+
+    # Préchauffage (chargement de WordNet et du tokeniseur)
+    legacy_preprocess(messages[0], abbreviations, lemmatizer, SEARCH_STOP_WORDS)
+    preprocessor.parse(messages[0])
+
+    legacy = timeit.timeit(lambda: [legacy_preprocess(m, abbreviations, lemmatizer, SEARCH_STOP_WORDS) for m in messages], number=1)
+    parsed = timeit.timeit(lambda: [preprocessor.parse(m) for m in messages], number=1)
+
+    legacy_us = legacy * 1e6 / len(messages)
+    parsed_us = parsed * 1e6 / len(messages)
+    print(f"{len(messages)} messages issus de intents.json")
+    print(f"Ancien prétraitement : {legacy_us:.1f} µs/message")
+    print(f"ParsedMessage        : {parsed_us:.1f} µs/message ({legacy_us / parsed_us:.1f}x)")
+    print(f"Cache du lemmatiseur : {preprocessor.stats()}")
+
+
+def legacy_routing(message, abbreviations, course_keywords, intents, tag):
+    """Ancien routage : recherche linéaire des mots-clés et des intentions"""
+    words = ' '.join(abbreviations.get(word, word) for word in message.lower().split()).split()
+    has_course_keywords = any(keyword in words for keyword in course_keywords)
+    intent_data = None
+    for data in intents['intents']:
+        if data['tag'] == tag:
+            intent_data = data
+            break
+    return has_course_keywords or 'cours' in words, intent_data
+
+
+def bench_routing(args):
+    """Mesure le routage d'un message en fonction du nombre d'abréviations, de mots-clés et d'intentions"""
+    from chatbot_routing import RoutingTable
+    from chatbot_service import DEFAULT_COURSE_WORDS
+
+    base_abbreviations = _load_json('../utils/abbreviations.json')['abbreviations']
+    base_keywords = _load_json('../utils/course_keywords.json')['course_keywords']
+    base_intents = _load_json('intents.json')
+    messages = [pattern for intent in base_intents['intents'] for pattern in intent['patterns']]
+    messages = (messages * (args.messages // len(messages) + 1))[:args.messages]
+
+    print(f"{'entrées':>8} | {'ancien (µs/msg)':>15} | {'compilé (µs/msg)':>16}")
+    for size in args.sizes:
+        # Entrées synthétiques ajoutées aux tables réelles, dont des expressions de plusieurs mots
+        extra = random_vocabulary(size)
+        abbreviations = dict(base_abbreviations)
+        abbreviations.update({word: word.upper() for word in extra})
+        keywords = base_keywords + [f"{word} {word[::-1]}" if i % 2 else word for i, word in enumerate(extra)]
+        intents = {'intents': base_intents['intents'] + [
+            {'tag': f'synthetic_{i}', 'patterns': [], 'responses': []} for i in range(size)
+        ]}
+        # Les intentions cherchées sont celles du fichier, donc en tête de la liste pour l'ancien code
+        tags = [random.choice(intents['intents'])['tag'] for _ in messages]
+
+        routing = RoutingTable(abbreviations, keywords, DEFAULT_COURSE_WORDS, intents)
+
+        legacy = timeit.timeit(
+            lambda: [legacy_routing(m, abbreviations, keywords, intents, t) for m, t in zip(messages, tags)], number=1)
+        compiled = timeit.timeit(
+            lambda: [(routing.course_matches(routing.expand(m).split()), routing.intent(t)) for m, t in zip(messages, tags)],
+            number=1)
+        print(f"{size:>8} | {legacy * 1e6 / len(messages):>15.1f} | {compiled * 1e6 / len(messages):>16.1f}")
+
+
+def _sample_response(description_size):
+    """Réponse /predict typique d'une redirection vers un cours"""
+    course = {"_id": "64b0c0ffee", "title": "Introduction à Python", "description": "x" * description_size,
+              "module": {"_id": "m1", "category": "c1"}}
+    return {"success": True, "data": {
+        "response": "J'ai trouvé le cours 'Introduction à Python'. Je vous y emmène !",
+        "action": "redirect_course", "shouldRedirect": True, "confidence": 1.0, "intent": "specific_course",
+        "course_data": {"id": course["_id"], "title": course["title"], "course": course},
+        "redirect_url": "/categories/c1/modules/m1/courses/64b0c0ffee",
+    }}
+
+
+def legacy_request_logs(out, response):
+    """Anciens logs d'une requête : print synchrones et réponse complète indentée"""
+    print("\nMessage reçu: je veux le cours python", file=out)
+    print("Message normalisé: je veux le cours python", file=out)
+    print("Contient des mots-clés de cours: True", file=out)
+    print("Termes de recherche après nettoyage: ['python']", file=out)
+    print("Meilleur cours trouvé: Introduction à Python (score: 1.87)", file=out)
+    print("IDs extraits - Category: c1, Module: m1", file=out)
+    print("Token d'authentification reçu: eyJhbGciOi...", file=out)
+    print("Réponse envoyée:", json.dumps(response, indent=2), file=out, flush=True)
+
+
+def structured_request_logs(response):
+    """Logs de la même requête avec chatbot_logging"""
+    from chatbot_service import predict_log, search_log, request_log
+    predict_log.debug("Message reçu: %s", "je veux le cours python", extra={'fields': {"normalized": "je veux le cours python"}})
+    search_log.debug("Termes de recherche après nettoyage: %s", ['python'])
+    search_log.info("Meilleur cours trouvé: %s", "Introduction à Python", extra={'fields': {
+        "terms": ['python'], "score": 1.87, "category_id": "c1", "module_id": "m1"}})
+    request_log.debug("Token d'authentification reçu: %s...", "eyJhbGciOi")
+    request_log.debug("Réponse envoyée: %s", response)
+    request_log.info("Réponse envoyée", extra={'fields': {"user_id": "u1", "intent": "specific_course", "action": "redirect_course"}})
+
+
+def bench_logging(args):
+    """Compare le coût des logs sur le thread de la requête : print synchrones vs logger asynchrone échantillonné"""
+    from chatbot_logging import configure_logging, logging_stats, parse_sample_rates, stop_logging
+
+    response = _sample_response(args.description_size)
+    with tempfile.TemporaryDirectory() as directory:
+        # Fichier de log réel, comme ceux écrits par PM2
+        with open(os.path.join(directory, 'legacy.log'), 'w', encoding='utf-8') as out:
+            legacy = timeit.timeit(lambda: legacy_request_logs(out, response), number=args.requests)
+            legacy_size = out.tell()
+        print(f"{args.requests} requêtes, description de cours de {args.description_size} caractères")
+        print(f"print synchrones         : {legacy * 1e6 / args.requests:8.1f} µs/requête, {legacy_size / args.requests / 1024:.1f} Ko/requête")
+
+        for level, sample in (('DEBUG', ''), ('INFO', ''), ('INFO', 'search=0.1,request=0.1')):
+            with open(os.path.join(directory, f'{level}.log'), 'w', encoding='utf-8') as out:
+                configure_logging(level, parse_sample_rates(sample), queue_size=args.requests * 6, stream=out)
+                elapsed = timeit.timeit(lambda: structured_request_logs(response), number=args.requests)
+                dropped = logging_stats()["dropped"]
+                stop_logging()
+                size = out.tell()
+            label = f"{level}{' échantillonné' if sample else ''}"
+            print(f"logger {label:<18}: {elapsed * 1e6 / args.requests:8.1f} µs/requête, "
+                  f"{size / args.requests / 1024:.1f} Ko/requête ({dropped} messages abandonnés)")
+
+
+def _write_keras_h5(path, layers):
+    """Écrit des poids au format .h5 de Keras (configuration et groupes de poids), sans TensorFlow"""
+    import h5py
+
+    config = {'class_name': 'Sequential', 'config': {'layers': []}}
+    with h5py.File(path, 'w') as f:
+        weights_group = f.create_group('model_weights')
+        for i, (kernel, bias, activation) in enumerate(layers):
+            name = f'dense_{i}'
+            config['config']['layers'].append({'class_name': 'Dense', 'config': {'name': name, 'activation': activation}})
+            group = weights_group.create_group(name)
+            group.attrs['weight_names'] = [f'{name}/kernel:0', f'{name}/bias:0']
+            group[f'{name}/kernel:0'] = kernel
+            group[f'{name}/bias:0'] = bias
+        f.attrs['model_config'] = json.dumps(config)
+
+
+def _load_legacy_model(directory):
+    from chatbot_inference import NumpyIntentModel
+
+    with open(os.path.join(directory, 'words.pkl'), 'rb') as f:
+        words = pickle.load(f)
+    with open(os.path.join(directory, 'classes.pkl'), 'rb') as f:
+        classes = pickle.load(f)
+    return words, classes, NumpyIntentModel.from_h5(os.path.join(directory, 'model.h5'))
+
+
+def bench_bundle(args):
+    """Compare le chargement des fichiers séparés (.pkl + .h5) et du bundle projeté en mémoire"""
+    from chatbot_bundle import load_bundle, save_bundle
+    from chatbot_inference import NumpyIntentModel
+
+    rng = np.random.default_rng(0)
+    print(f"{'mots':>8} {'.pkl + .h5 (ms)':>16} {'bundle (ms)':>12} {'sans vérif. (ms)':>17} {'taille (Mo)':>12}")
+    for size in args.sizes:
+        words = random_vocabulary(size)
+        classes = [f"intent_{i}" for i in range(args.classes)]
+        dims = [len(words), 128, 64, len(classes)]
+        activations = ['relu', 'relu', 'softmax']
+        layers = [(rng.standard_normal((dims[i], dims[i + 1])).astype(np.float32),
+                   rng.standard_normal(dims[i + 1]).astype(np.float32), activations[i]) for i in range(3)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'words.pkl'), 'wb') as f:
+                pickle.dump(words, f)
+            with open(os.path.join(directory, 'classes.pkl'), 'wb') as f:
+                pickle.dump(classes, f)
+            _write_keras_h5(os.path.join(directory, 'model.h5'), layers)
+            path = os.path.join(directory, 'model.bundle.npz')
+            save_bundle(path, words, classes, layers)
+
+            legacy = timeit.timeit(lambda: _load_legacy_model(directory), number=args.repeat) / args.repeat
+            bundle = timeit.timeit(lambda: load_bundle(path), number=args.repeat) / args.repeat
+            unverified = timeit.timeit(lambda: load_bundle(path, verify=False), number=args.repeat) / args.repeat
+
+            legacy_words, legacy_classes, legacy_model = _load_legacy_model(directory)
+            bundle_words, bundle_classes, bundle_layers, _ = load_bundle(path)
+            bags = (rng.random((32, len(words))) < 0.05).astype(np.float32)
+            assert (bundle_words, bundle_classes) == (legacy_words, legacy_classes)
+            assert np.allclose(legacy_model.predict(bags), NumpyIntentModel(bundle_layers).predict(bags))
+            bundle_mb = os.path.getsize(path) / (1024 * 1024)
+
+        print(f"{size:>8} {legacy * 1000:>16.2f} {bundle * 1000:>12.2f} {unverified * 1000:>17.2f} {bundle_mb:>12.1f}")
+
+
+class _StubBackendHandler(BaseHTTPRequestHandler):
+    """API Node.js simulée : catalogue, modules et cours suivis (/api/courses/purchased, /api/courses/user/:id)"""
+
+    # Connexions keep-alive, comme l'API Node.js (sans Nagle : en-têtes et corps sont écrits séparément)
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _route(self, path, token):
+        server = self.server
+        if path == '/api/courses':
+            return 'courses', {"data": server.catalog}
+        if path == '/api/courses/purchased':
+            return 'user_courses', server.purchased(token)
+        if path.startswith('/api/courses/user/'):
+            return 'user_courses', server.purchased(path.rsplit('/', 1)[1])
+        if path.startswith('/api/modules/'):
+            return 'modules', {"_id": path.rsplit('/', 1)[1], "category": "cat1"}
+        return None, None
+
+    def do_GET(self):
+        # Pannes simulées : statuts d'erreur programmés (un par requête), puis API entièrement hors service
+        with self.server.lock:
+            self.server.hits[self.path] += 1
+            status = self.server.failures.popleft() if self.server.failures else self.server.down_status
+        if status:
+            self.send_error(status)
+            return
+        time.sleep(self.server.latency)
+        token = (self.headers.get('Authorization') or '').partition('Bearer ')[2] or None
+        route, body = self._route(self.path.split('?', 1)[0], token)
+        if route is None:
+            self.send_error(404)
+            return
+        with self.server.lock:
+            self.server.requests[route] += 1
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # Le client a abandonné la requête (délai de lecture dépassé, voir bench_backend)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _stub_catalog():
+    return [{"_id": f"c{i}", "title": f"Cours {i} python", "description": "programmation",
+             "category": "cat1", "module": "m1"} for i in range(20)]
+
+
+def _stub_purchased(owner):
+    # Un cours propre au token reçu : une réponse servie au mauvais utilisateur se détecte
+    return [{"_id": f"owned_{owner}", "title": "Cours acheté", "token": owner}]
+
+
+def start_stub_backend(latency=0.0, catalog=None, purchased=None, port=0):
+    """Démarre l'API simulée ; retourne le serveur (server.server_address, server.hits, server.requests)
+
+    catalog remplace le catalogue de /api/courses, purchased(token ou identifiant) les cours suivis ;
+    par défaut, 20 cours « Cours i python » et un cours propre à chaque token.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), _StubBackendHandler, bind_and_activate=False)
+    server.daemon_threads = True
+    # File d'attente des connexions assez longue pour les pics de connexions simultanées des tests de charge
+    server.request_queue_size = 1024
+    server.server_bind()
+    server.server_activate()
+    server.latency = latency
+    server.catalog = catalog if catalog is not None else _stub_catalog()
+    server.purchased = purchased or _stub_purchased
+    # Requêtes reçues par chemin, réponses servies par route et pannes simulées (voir bench_backend)
+    server.lock = threading.Lock()
+    server.hits = Counter()
+    server.requests = Counter()
+    server.failures = deque()
+    server.down_status = None
+    threading.Thread(target=server.serve_forever, name='stub-backend', daemon=True).start()
+    return server
+
+
+def bench_concurrency(args):
+    """Requêtes simultanées avec des tokens distincts : aucun token ne doit servir à un autre utilisateur"""
+    import chatbot_service
+
+    server = start_stub_backend(args.latency_ms / 1000)
+    chatbot_service.API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    service_args = chatbot_service.build_arg_parser().parse_args(
+        ['--engine', 'numpy', '--log-level', 'ERROR', '--model-watch-interval', '0', '--course-index-ttl', '0'])
+    predictor = chatbot_service.init_predictor(service_args, start_background=False)
+    client = chatbot_service.app.test_client()
+    # Messages qui déclenchent une recherche de cours : /predict récupère les cours suivis avec le token de la requête
+    messages = ["je veux le cours python", "cours de python", "je cherche un cours python"]
+
+    def shared_token(user_id, token):
+        # Ancien fonctionnement : le token de la requête est stocké sur le prédicteur partagé
+        predictor.set_api_token(token)
+        # Traitement du message entre la réception du token et l'appel à l'API
+        time.sleep(0.001)
+        response = predictor.backend.get("/api/courses/purchased", predictor.api_token)
+        return response.json()[0]
+
+    def request_token(user_id, token):
+        return predictor._get_user_courses(token)[0]
+
+    def full_request(user_id, token):
+        response = client.post('/predict', json={"message": random.choice(messages), "context": {"userId": user_id}},
+                               headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200 and response.json['data']['intent'] != 'error', response.json
+        # Cours mis en cache par la route elle-même (lus sans appel à l'API)
+        session = predictor.sessions.get(predictor.courses_key(token))
+        with session.lock:
+            courses = session.courses
+        assert courses is not None, "/predict n'a pas récupéré les cours de l'utilisateur"
+        return courses[0]
+
+    print(f"{args.requests} requêtes, {args.threads} threads, latence de l'API simulée {args.latency_ms:.0f} ms")
+    print(f"{'mode':>18} {'requêtes/s':>11} {'tokens croisés':>15}")
+    modes = (('token partagé', shared_token), ('token en paramètre', request_token), ('/predict + API', full_request))
+    for mode, (name, call) in enumerate(modes):
+        # Utilisateurs distincts à chaque mode pour ne pas profiter du cache des sessions
+        run = f"run{mode}"
+
+        def one(i):
+            user_id, token = f"{run}_user_{i}", f"{run}_token_{i}"
+            data = call(user_id, token)
+            return data["token"] != token
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            crossed = sum(executor.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        print(f"{name:>18} {args.requests / elapsed:>11.0f} {crossed:>15}")
+        if call is not shared_token:
+            assert crossed == 0, "Un token a été utilisé pour un autre utilisateur"
+    server.shutdown()
+
+
+def _check(label, condition, detail=''):
+    print(f"{label:<62} {'ok' if condition else 'ÉCHEC'} {detail}")
+    assert condition, f"{label} {detail}"
+
+
+def bench_backend(args):
+    """Reprises, délais, gigue et disjoncteur du client de l'API contre l'API simulée"""
+    import chatbot_service
+    from chatbot_backend import BackendClient, BackendUnavailableError
+
+    server = start_stub_backend()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def reset(failures=(), down_status=None, latency=0.0):
+        with server.lock:
+            server.hits.clear()
+            server.failures.extend(failures)
+            server.down_status = down_status
+            server.latency = latency
+
+    # Reprises sur 502/503/504 : la troisième tentative aboutit
+    client = BackendClient(url, retries=2, backoff=0.01, failure_threshold=100)
+    reset(failures=[503, 502])
+    response = client.get("/api/courses")
+    _check("502 puis 503 : succès à la 3e tentative", response.status_code == 200 and server.hits["/api/courses"] == 3,
+           f"({server.hits['/api/courses']} requêtes, {client.stats()['endpoints']['/api/courses']['retries']} reprises)")
+
+    reset(down_status=504)
+    try:
+        client.get("/api/courses")
+        raised = False
+    except BackendUnavailableError:
+        raised = True
+    _check("504 permanent : erreur après retries + 1 tentatives", raised and server.hits["/api/courses"] == 3,
+           f"({server.hits['/api/courses']} requêtes)")
+
+    reset(failures=[404])
+    response = client.get("/api/courses")
+    _check("404 : pas de reprise", response.status_code == 404 and server.hits["/api/courses"] == 1)
+
+    # Attente avant chaque reprise tirée entre 0 et backoff × 2^(tentative - 1)
+    client = BackendClient(url, retries=2, backoff=args.backoff, failure_threshold=100)
+    durations = []
+    for _ in range(args.samples):
+        reset(down_status=503)
+        start = time.perf_counter()
+        try:
+            client.get("/api/courses")
+        except BackendUnavailableError:
+            pass
+        durations.append(time.perf_counter() - start)
+    bound = args.backoff * (1 + 2)
+    _check("Gigue : attentes totales dans [0, backoff × 3] et variables",
+           max(durations) < bound + 0.1 and max(durations) - min(durations) > bound / 10,
+           f"({min(durations) * 1000:.0f} à {max(durations) * 1000:.0f} ms, borne {bound * 1000:.0f} ms)")
+
+    # Délai de lecture : une API trop lente est abandonnée dans le délai configuré, pour chaque tentative
+    read_timeout = 0.2
+    for retries in (0, 1):
+        client = BackendClient(url, read_timeout=read_timeout, retries=retries, backoff=0, failure_threshold=100)
+        reset(latency=read_timeout * 5)
+        start = time.perf_counter()
+        try:
+            client.get("/api/courses")
+            raised = False
+        except BackendUnavailableError:
+            raised = True
+        elapsed = time.perf_counter() - start
+        limit = (retries + 1) * read_timeout + 0.15
+        _check(f"Délai de lecture {read_timeout:.1f} s, {retries} reprise(s) : abandon avant {limit:.2f} s",
+               raised and elapsed < limit, f"({elapsed:.2f} s)")
+    reset()
+
+    # Disjoncteur dans le service : après failure_threshold échecs, réponse immédiate sans appel à l'API
+    chatbot_service.API_BASE_URL = url
+    service_args = chatbot_service.build_arg_parser().parse_args(
+        ['--engine', 'numpy', '--log-level', 'ERROR', '--model-watch-interval', '0', '--course-index-ttl', '0',
+         '--prediction-cache-size', '0', '--backend-retries', '1',
+         '--backend-failure-threshold', str(args.failure_threshold), '--backend-reset-timeout', str(args.reset_timeout)])
+    predictor = chatbot_service.init_predictor(service_args, start_background=False)
+    http = chatbot_service.app.test_client()
+
+    def ask():
+        start = time.perf_counter()
+        response = http.post('/predict', json={"message": "je veux le cours python", "context": {"userId": "u1"}},
+                             headers={"Authorization": "Bearer token_u1"})
+        return response.json['data']['response'], time.perf_counter() - start
+
+    unavailable = "je n'arrive pas à accéder aux cours"
+    reset(down_status=503)
+    for _ in range(args.failure_threshold):
+        reply, _ = ask()
+    calls = sum(server.hits.values())
+    _check(f"{args.failure_threshold} échecs : disjoncteur ouvert", predictor.backend.breaker.state == "open"
+           and unavailable in reply, f"({calls} requêtes reçues par l'API)")
+    reply, elapsed = ask()
+    _check("Disjoncteur ouvert : réponse sans appel à l'API",
+           unavailable in reply and sum(server.hits.values()) == calls, f"({elapsed * 1000:.1f} ms)")
+
+    # Après reset_timeout, une seule requête d'essai ; si elle échoue, le disjoncteur se rouvre
+    time.sleep(args.reset_timeout)
+    calls = sum(server.hits.values())
+    reply, _ = ask()
+    _check("Essai en échec après reset_timeout : disjoncteur rouvert",
+           predictor.backend.breaker.state == "open" and unavailable in reply,
+           f"({sum(server.hits.values()) - calls} requêtes d'essai)")
+
+    # API rétablie : l'essai suivant referme le disjoncteur et le cours est trouvé
+    reset()
+    time.sleep(args.reset_timeout)
+    reply, _ = ask()
+    _check("API rétablie après reset_timeout : disjoncteur refermé",
+           predictor.backend.breaker.state == "closed" and unavailable not in reply, f"(« {reply[:40]} »)")
+    server.shutdown()
+
+
+def _catalog_entries(size, seed=3):
+    """Entrées d'index de cours synthétiques : titres de 2 à 5 mots accentués et popularité aléatoire"""
+    rng = random.Random(seed)
+    words = [word.replace('e', 'é', 1) if i % 3 == 0 else word for i, word in enumerate(random_vocabulary(2000, seed))]
+    return [{
+        "course_id": f"c{i}",
+        "title": ' '.join(rng.choice(words).capitalize() for _ in range(rng.randint(2, 5))),
+        "module_id": "m1",
+        "category_id": "cat1",
+        "course": {"purchasedBy": [None] * rng.randint(0, 50)},
+    } for i in range(size)]
+
+
+def bench_suggest(args):
+    """Latence de /courses/suggest et coût des mises à jour incrémentales selon la taille du catalogue"""
+    from chatbot_suggest import TitleSuggester, fold
+
+    rng = random.Random(11)
+    print(f"{'cours':>8} {'construction (ms)':>18} {'µs/requête':>11} {'p99 (µs)':>9} "
+          f"{'mise à jour 1% (ms)':>20} {'reconstruction (ms)':>20}")
+    for size in args.sizes:
+        entries = _catalog_entries(size)
+        suggester = TitleSuggester()
+        start = time.perf_counter()
+        suggester.sync(entries)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Préfixes de 1 à 6 caractères tirés des titres, comme les saisies des utilisateurs
+        queries = []
+        for _ in range(args.queries):
+            word = rng.choice(fold(rng.choice(entries)["title"]).split())
+            queries.append(word[:rng.randint(1, min(6, len(word)))])
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            suggester.suggest(query, 5)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        mean_us = sum(latencies) * 1e6 / len(latencies)
+        p99_us = latencies[int(len(latencies) * 0.99)] * 1e6
+
+        # Rafraîchissement du catalogue : 1% des cours retirés et autant d'ajoutés
+        changed = max(1, size // 100)
+        updated = entries[changed:] + [dict(entry, course_id=f"new{entry['course_id']}") for entry in entries[:changed]]
+        start = time.perf_counter()
+        suggester.sync(updated)
+        update_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        TitleSuggester().sync(updated)
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        assert len(suggester) == len(updated)
+
+        print(f"{size:>8} {build_ms:>18.1f} {mean_us:>11.1f} {p99_us:>9.1f} {update_ms:>20.1f} {rebuild_ms:>20.1f}")
+
+
+async def _asgi_post(application, path, payload, token):
+    """Appelle l'application ASGI sans serveur HTTP ; retourne (statut, corps JSON)"""
+    request = {'type': 'http.request', 'body': json.dumps(payload).encode('utf-8'), 'more_body': False}
+    messages = []
+
+    async def receive():
+        return request
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path,
+             'headers': [(b'content-type', b'application/json'), (b'authorization', f"Bearer {token}".encode())]}
+    await application(scope, receive, send)
+    return messages[0]['status'], json.loads(messages[1]['body'])
+
+
+def bench_asgi(args):
+    """Premiers messages d'utilisateurs non préchargés : workers synchrones vs boucle asyncio
+
+    Chaque requête attend les cours de l'utilisateur auprès de l'API simulée avant la prédiction. Un
+    worker synchrone reste bloqué pendant cet appel ; le serveur ASGI attend l'API sans occuper de thread.
+    """
+    import chatbot_asgi
+    import chatbot_service
+    from chatbot_backend import AsyncBackendClient
+
+    server = start_stub_backend(args.latency_ms / 1000)
+    chatbot_service.API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    service_args = chatbot_asgi.build_arg_parser().parse_args(
+        ['--engine', 'numpy', '--log-level', 'ERROR', '--model-watch-interval', '0', '--course-index-ttl', '0',
+         '--executor-workers', str(args.executor_workers)])
+    predictor = chatbot_service.init_predictor(service_args, start_background=False)
+    predictor.course_index.refresh()
+    messages = ["bonjour", "je veux le cours python", "merci", "quels sont les tarifs", "au revoir"]
+
+    def sync_request(user_id, token, message):
+        # Ce que fait un worker synchrone pour personnaliser le premier message : appel bloquant puis prédiction
+        owned = predictor._get_user_courses(token)
+        predictor.predict(message, user_id, token)
+        return owned[0]["token"] == token
+
+    async def run_asgi(run, concurrency):
+        backend = AsyncBackendClient(chatbot_service.API_BASE_URL, pool_size=args.backend_pool_size)
+        application = chatbot_asgi.ChatbotAsgiApp(predictor, backend, args.executor_workers)
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            user_id, token = f"{run}_user_{i}", f"{run}_token_{i}"
+            async with slots:
+                status, body = await _asgi_post(application, '/predict',
+                                                {"message": messages[i % len(messages)], "context": {"userId": user_id}},
+                                                token)
+            assert status == 200 and body['data']['intent'] != 'error', body
+            return predictor._get_user_courses(token)[0]["token"] == token
+
+        results = await asyncio.gather(*(one(i) for i in range(args.requests)))
+        backend.close()
+        application.executor.shutdown()
+        return results
+
+    print(f"{args.requests} requêtes par mesure, latence de l'API simulée {args.latency_ms:.0f} ms, "
+          f"{args.workers} workers synchrones, {args.executor_workers} threads d'inférence ASGI")
+    print(f"{'concurrence':>11} {'synchrone (req/s)':>18} {'ASGI (req/s)':>13} {'gain':>6}")
+    for concurrency in args.concurrency:
+        # Utilisateurs distincts à chaque mesure pour ne jamais profiter du cache des sessions
+        run = f"sync{concurrency}"
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(concurrency, args.workers)) as executor:
+            results = list(executor.map(lambda i: sync_request(f"{run}_user_{i}", f"{run}_token_{i}",
+                                                               messages[i % len(messages)]), range(args.requests)))
+        sync_rps = args.requests / (time.perf_counter() - start)
+        assert all(results)
+
+        start = time.perf_counter()
+        results = asyncio.run(run_asgi(f"asgi{concurrency}", concurrency))
+        asgi_rps = args.requests / (time.perf_counter() - start)
+        assert all(results), "Des cours n'ont pas été chargés pour leur utilisateur"
+        print(f"{concurrency:>11} {sync_rps:>18.0f} {asgi_rps:>13.0f} {asgi_rps / sync_rps:>5.1f}x")
+    server.shutdown()
+
+
+def _train_mlp(x, y, hidden=128, epochs=300, learning_rate=0.01, seed=0):
+    """Entraîne en NumPy un réseau dense → ReLU → softmax (Adam, lot complet) ; retourne ses couches"""
+    rng = np.random.default_rng(seed)
+    params = [
+        rng.normal(0, np.sqrt(2 / x.shape[1]), (x.shape[1], hidden)).astype(np.float32),
+        np.zeros(hidden, dtype=np.float32),
+        rng.normal(0, np.sqrt(1 / hidden), (hidden, y.shape[1])).astype(np.float32),
+        np.zeros(y.shape[1], dtype=np.float32),
+    ]
+    moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+    for step in range(1, epochs + 1):
+        w1, b1, w2, b2 = params
+        h = np.maximum(x @ w1 + b1, 0)
+        logits = h @ w2 + b2
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        d_logits = (e / e.sum(axis=1, keepdims=True) - y) / len(x)
+        d_h = (d_logits @ w2.T) * (h > 0)
+        grads = [x.T @ d_h, d_h.sum(axis=0), h.T @ d_logits, d_logits.sum(axis=0)]
+        for param, grad, (m, v) in zip(params, grads, moments):
+            m *= 0.9
+            m += 0.1 * grad
+            v *= 0.999
+            v += 0.001 * grad * grad
+            param -= learning_rate * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-7)
+    return [(params[0], params[1], 'relu'), (params[2], params[3], 'softmax')]
+
+
+def _typo(word, rng):
+    """Une faute de frappe : lettre supprimée, doublée, remplacée ou deux lettres inversées"""
+    i = rng.randrange(len(word) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i] + word[i:]
+    if kind == 2:
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def bench_features(args):
+    """Précision et latence du sac de mots et des n-grammes hachés sur des motifs tenus à l'écart de l'entraînement"""
+    import nltk
+    from nltk.stem import WordNetLemmatizer
+
+    from chatbot_inference import NumpyIntentModel
+
+    lemmatizer = WordNetLemmatizer()
+    intents = _load_json('intents.json')['intents']
+    # Même découpage que train_model.py
+    documents = [([lemmatizer.lemmatize(token) for token in nltk.word_tokenize(pattern.lower())], intent['tag'])
+                 for intent in intents for pattern in intent['patterns']]
+    classes = sorted({tag for _, tag in documents})
+    class_index = {tag: i for i, tag in enumerate(classes)}
+    featurizers = ['bow'] + [f'hashed-{dim}' for dim in args.hash_dims]
+
+    results = {name: {'clean': 0, 'typos': 0, 'empty_clean': 0, 'empty_typos': 0, 'latency_us': []} for name in featurizers}
+    total = 0
+    for split in range(args.splits):
+        # Découpage stratifié : une part des motifs de chaque intention est tenue à l'écart
+        rng = random.Random(split)
+        train, test = [], []
+        for tag in classes:
+            patterns = [doc for doc in documents if doc[1] == tag]
+            rng.shuffle(patterns)
+            held_out = int(len(patterns) * args.test_size) if len(patterns) > 1 else 0
+            test.extend(patterns[:max(held_out, 1 if len(patterns) > 2 else 0)])
+            train.extend(patterns[max(held_out, 1 if len(patterns) > 2 else 0):])
+        typos = [([_typo(w, rng) if len(w) >= 4 and rng.random() < args.typo_rate else w for w in words], tag)
+                 for words, tag in test]
+        total += len(test)
+
+        y = np.zeros((len(train), len(classes)), dtype=np.float32)
+        y[np.arange(len(train)), [class_index[tag] for _, tag in train]] = 1
+        expected = np.array([class_index[tag] for _, tag in test])
+        for name in featurizers:
+            if name == 'bow':
+                # Vocabulaire limité aux motifs d'entraînement, comme en production face aux mots nouveaux
+                encoder = BagOfWordsEncoder(sorted({w for words, _ in train for w in words if w not in {'?', '!', '.', ','}}))
+            else:
+                encoder = HashedNgramEncoder(int(name.split('-')[1]))
+            model = NumpyIntentModel(_train_mlp(encoder.encode_batch([words for words, _ in train]), y,
+                                                epochs=args.epochs, seed=split))
+            for key, sentences in (('clean', test), ('typos', typos)):
+                x = encoder.encode_batch([words for words, _ in sentences])
+                # Un vecteur vide donne l'intention « unknown » dans le service
+                empty = ~x.any(axis=1)
+                correct = (model.predict(x).argmax(axis=1) == expected) & ~empty
+                results[name][key] += int(correct.sum())
+                results[name][f'empty_{key}'] += int(empty.sum())
+
+            # Latence par message, comme le service : encodage d'une phrase puis passe du modèle
+            sentences = [words for words, _ in typos]
+            start = time.perf_counter()
+            for words in sentences:
+                model.predict(encoder.encode(words))
+            results[name]['latency_us'].append((time.perf_counter() - start) * 1e6 / len(sentences))
+
+    print(f"{len(documents)} motifs, {len(classes)} intentions, {args.splits} découpages, {total} motifs de test au total")
+    print(f"{'encodage':>13} {'précision':>10} {'vides':>6} {'précision (fautes)':>19} {'vides (fautes)':>15} {'µs/message':>11}")
+    for name in featurizers:
+        r = results[name]
+        print(f"{name:>13} {r['clean'] / total * 100:>9.1f}% {r['empty_clean']:>6} {r['typos'] / total * 100:>18.1f}% "
+              f"{r['empty_typos']:>15} {sum(r['latency_us']) / len(r['latency_us']):>11.1f}")
+
+
+def legacy_training_data(documents, words, classes):
+    """Ancienne construction des données d'entraînement : listes denses, classes.index et copies successives"""
+    training = []
+    output_empty = [0] * len(classes)
+    for word_patterns, tag in documents:
+        bag = []
+        for word in words:
+            bag.append(1) if word in word_patterns else bag.append(0)
+        output_row = list(output_empty)
+        output_row[classes.index(tag)] = 1
+        training.append([bag, output_row])
+    training = np.array(training, dtype=object)
+    train_x = np.array([np.array(item[0]) for item in training])
+    train_y = np.array([np.array(item[1]) for item in training])
+    return train_x, train_y
+
+
+def _training_documents(patterns, classes=50, seed=11):
+    """Motifs synthétiques déjà lemmatisés : vocabulaire proportionnel au nombre de motifs"""
+    rng = random.Random(seed)
+    words = random_vocabulary(max(500, patterns // 4), seed=seed)
+    tags = [f"intent_{i}" for i in range(classes)]
+    documents = [(rng.sample(words, rng.randint(3, 10)), rng.choice(tags)) for _ in range(patterns)]
+    return documents, sorted({w for lemmas, _ in documents for w in lemmas}), sorted(tags)
+
+
+def _measure_training_data(method, patterns, queue):
+    """Construit les matrices d'entraînement dans un processus isolé : durée, pic d'allocations et taille de x"""
+    try:
+        documents, words, classes = _training_documents(patterns)
+        tracemalloc.start()
+        start = time.perf_counter()
+        if method == 'legacy':
+            x, y = legacy_training_data(documents, words, classes)
+            x_bytes = x.nbytes
+        else:
+            x, y = training_matrices(BagOfWordsEncoder(words), documents, classes)
+            x_bytes = x.indptr.nbytes + x.indices.nbytes
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        queue.put({'seconds': elapsed, 'peak_mb': peak / (1024 * 1024), 'x_mb': x_bytes / (1024 * 1024),
+                   'words': len(words)})
+    except MemoryError:
+        queue.put({'error': 'mémoire insuffisante'})
+
+
+def bench_training_data(args):
+    """Construction des matrices d'entraînement : boucles mot × vocabulaire vs matrice CSR et index des classes"""
+    # Mêmes matrices dans les deux cas
+    documents, words, classes = _training_documents(300)
+    expected_x, expected_y = legacy_training_data(documents, words, classes)
+    x, y = training_matrices(BagOfWordsEncoder(words), documents, classes)
+    assert np.array_equal(expected_x, x.toarray(expected_x.dtype)) and np.array_equal(expected_y, y)
+    assert np.array_equal(x[100:200].toarray(), x.toarray()[100:200])
+
+    context = multiprocessing.get_context('spawn')
+    print(f"{'motifs':>8} {'mots':>6} {'méthode':>8} {'durée (s)':>10} {'pic (Mo)':>9} {'x (Mo)':>8}")
+    for patterns in args.sizes:
+        for method in ('legacy', 'csr'):
+            if method == 'legacy' and patterns > args.legacy_max:
+                print(f"{patterns:>8} {'':>6} {method:>8} {'ignoré (--legacy-max)':>29}")
+                continue
+            queue = context.Queue()
+            process = context.Process(target=_measure_training_data, args=(method, patterns, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            if 'error' in result:
+                print(f"{patterns:>8} {'':>6} {method:>8} {result['error']}")
+                continue
+            print(f"{patterns:>8} {result['words']:>6} {method:>8} {result['seconds']:>10.3f} "
+                  f"{result['peak_mb']:>9.1f} {result['x_mb']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks du service chatbot")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    bow_parser = subparsers.add_parser('bow', help="Encodage des sacs de mots")
+    bow_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Tailles de vocabulaire')
+    bow_parser.add_argument('--messages', type=int, default=200, help='Nombre de messages encodés')
+    bow_parser.add_argument('--repeat', type=int, default=50, help="Messages encodés avec l'ancien encodeur")
+    bow_parser.set_defaults(func=bench_bow)
+
+    engine_parser = subparsers.add_parser('engine', help="Parité et performances des moteurs Keras et NumPy")
+    engine_parser.add_argument('--model-name', type=str, default='chatbot_model', help='Nom du modèle à charger')
+    engine_parser.add_argument('--engines', type=str, nargs='+', default=['keras', 'numpy'], help='Moteurs comparés')
+    engine_parser.add_argument('--calls', type=int, default=500, help='Nombre de prédictions unitaires mesurées')
+    engine_parser.add_argument('--parity-samples', type=int, default=1000, help='Nombre de sacs de mots comparés')
+    engine_parser.set_defaults(func=bench_engine)
+
+    sessions_parser = subparsers.add_parser('sessions', help="Test d'endurance du magasin de sessions")
+    sessions_parser.add_argument('--users', type=int, default=1000000, help="Nombre d'utilisateurs distincts simulés")
+    sessions_parser.add_argument('--capacity', type=int, default=10000, help='Capacité du magasin de sessions')
+    sessions_parser.add_argument('--ttl', type=float, default=1800, help="Durée d'inactivité avant expiration")
+    sessions_parser.add_argument('--max-growth-mb', type=float, default=20, help='Croissance mémoire tolérée en Mo')
+    sessions_parser.set_defaults(func=bench_sessions)
+
+    shared_sessions_parser = subparsers.add_parser('shared-sessions', help="Sessions partagées par deux processus (SQLite)")
+    shared_sessions_parser.add_argument('--users', type=int, default=200, help="Utilisateurs servis alternativement")
+    shared_sessions_parser.add_argument('--turns', type=int, default=10, help="Messages par utilisateur")
+    shared_sessions_parser.add_argument('--think-ms', type=float, default=300,
+                                        help="Délai entre deux messages d'un utilisateur en ms")
+    shared_sessions_parser.add_argument('--cache-ttl', type=float, default=0.1, help='Durée du cache de lecture en secondes')
+    shared_sessions_parser.add_argument('--flush-interval', type=float, default=0.1,
+                                        help='Intervalle des écritures groupées en secondes')
+    shared_sessions_parser.add_argument('--operations', type=int, default=20000, help='Accès mesurés par processus')
+    shared_sessions_parser.add_argument('--load-users', type=int, default=1000, help='Utilisateurs de la mesure de débit')
+    shared_sessions_parser.set_defaults(func=bench_shared_sessions)
+
+    preprocess_parser = subparsers.add_parser('preprocess', help="Prétraitement des messages avant et après ParsedMessage")
+    preprocess_parser.add_argument('--messages', type=int, default=5000, help='Nombre de messages prétraités')
+    preprocess_parser.set_defaults(func=bench_preprocess)
+
+    routing_parser = subparsers.add_parser('routing', help="Routage par mots-clés selon la taille des tables")
+    routing_parser.add_argument('--sizes', type=int, nargs='+', default=[0, 1000, 10000, 100000],
+                                help='Entrées synthétiques ajoutées aux tables')
+    routing_parser.add_argument('--messages', type=int, default=2000, help='Nombre de messages routés')
+    routing_parser.set_defaults(func=bench_routing)
+
+    logging_parser = subparsers.add_parser('logging', help="Coût des logs par requête (print vs logger asynchrone)")
+    logging_parser.add_argument('--requests', type=int, default=5000, help='Nombre de requêtes simulées')
+    logging_parser.add_argument('--description-size', type=int, default=20000,
+                                help='Taille de la description du cours renvoyée dans la réponse')
+    logging_parser.set_defaults(func=bench_logging)
+
+    bundle_parser = subparsers.add_parser('bundle', help="Chargement du modèle : fichiers séparés vs bundle")
+    bundle_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Tailles de vocabulaire')
+    bundle_parser.add_argument('--classes', type=int, default=20, help="Nombre d'intentions")
+    bundle_parser.add_argument('--repeat', type=int, default=20, help='Chargements mesurés par taille')
+    bundle_parser.set_defaults(func=bench_bundle)
+
+    concurrency_parser = subparsers.add_parser('concurrency', help="Requêtes simultanées avec des tokens distincts")
+    concurrency_parser.add_argument('--requests', type=int, default=2000, help='Nombre de requêtes par mode')
+    concurrency_parser.add_argument('--threads', type=int, default=16, help='Requêtes simultanées')
+    concurrency_parser.add_argument('--latency-ms', type=float, default=5, help="Latence de l'API simulée en ms")
+    concurrency_parser.set_defaults(func=bench_concurrency)
+
+    backend_parser = subparsers.add_parser('backend', help="Reprises, délais et disjoncteur du client de l'API")
+    backend_parser.add_argument('--backoff', type=float, default=0.1, help='Attente de base avant une reprise en secondes')
+    backend_parser.add_argument('--samples', type=int, default=10, help='Requêtes mesurées pour la gigue')
+    backend_parser.add_argument('--failure-threshold', type=int, default=3, help='Seuil du disjoncteur')
+    backend_parser.add_argument('--reset-timeout', type=float, default=1.0, help='Délai de réouverture du disjoncteur')
+    backend_parser.set_defaults(func=bench_backend)
+
+    suggest_parser = subparsers.add_parser('suggest', help="Autocomplétion des titres de cours")
+    suggest_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Tailles du catalogue')
+    suggest_parser.add_argument('--queries', type=int, default=5000, help='Nombre de requêtes mesurées')
+    suggest_parser.set_defaults(func=bench_suggest)
+
+    asgi_parser = subparsers.add_parser('asgi', help="Montée en concurrence : workers synchrones vs serveur ASGI")
+    asgi_parser.add_argument('--requests', type=int, default=400, help='Nombre de requêtes par mesure')
+    asgi_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128], help='Requêtes simultanées')
+    asgi_parser.add_argument('--latency-ms', type=float, default=50, help="Latence de l'API simulée en ms")
+    asgi_parser.add_argument('--workers', type=int, default=2, help='Workers synchrones (chatbot_server.py --workers)')
+    asgi_parser.add_argument('--executor-workers', type=int, default=4, help="Threads d'inférence du serveur ASGI")
+    asgi_parser.add_argument('--backend-pool-size', type=int, default=100,
+                             help="Requêtes simultanées vers l'API pour le serveur ASGI")
+    asgi_parser.set_defaults(func=bench_asgi)
+
+    features_parser = subparsers.add_parser('features', help="Sac de mots vs n-grammes hachés : précision et latence")
+    features_parser.add_argument('--splits', type=int, default=5, help='Nombre de découpages entraînement/test')
+    features_parser.add_argument('--test-size', type=float, default=0.2, help='Part des motifs de chaque intention tenue à l\'écart')
+    features_parser.add_argument('--typo-rate', type=float, default=0.3, help='Probabilité de faute de frappe par mot de 4 lettres ou plus')
+    features_parser.add_argument('--hash-dims', type=int, nargs='+', default=[1024, 4096], help='Largeurs des encodages hachés')
+    features_parser.add_argument('--epochs', type=int, default=300, help="Époques d'entraînement")
+    features_parser.set_defaults(func=bench_features)
+
+    training_data_parser = subparsers.add_parser('training-data', help="Construction des matrices d'entraînement")
+    training_data_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Nombres de motifs')
+    training_data_parser.add_argument('--legacy-max', type=int, default=10000,
+                                      help="Nombre de motifs au-delà duquel l'ancienne méthode n'est pas mesurée")
+    training_data_parser.set_defaults(func=bench_training_data)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Bundle du modèle chatbot : vocabulaire, classes et poids des couches dans un seul fichier .npz
+
+Le fichier est un zip non compressé de tableaux .npy : chaque tableau est projeté en mémoire
+(mmap) sans copie, et les workers partagent les mêmes pages via le cache du système.
+
+Usage (conversion des fichiers .h5/.pkl existants sans réentraîner) :
+    python scripts/chatbot_bundle.py --model-name chatbot_model
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import zipfile
+
+import numpy as np
+
+# Version du format du bundle, incrémentée à chaque changement incompatible
+BUNDLE_FORMAT = 1
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../models')
+
+
+class BundleError(Exception):
+    """Levée quand un bundle est illisible, d'un format inconnu ou que son empreinte ne correspond pas"""
+
+
+def bundle_path(models_dir, model_name):
+    return os.path.join(models_dir, f'{model_name}.bundle.npz')
+
+
+def _content_hash(arrays):
+    """Empreinte SHA-256 des tableaux (nom, type, forme et contenu), dans l'ordre des noms"""
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape};".encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def save_bundle(path, words, classes, layers):
+    """Écrit le bundle de façon atomique ; layers est une liste de (kernel, bias, activation)"""
+    arrays = {
+        'format': np.array([BUNDLE_FORMAT], dtype=np.int32),
+        'words': np.array(words, dtype=str),
+        'classes': np.array(classes, dtype=str),
+        'activations': np.array([activation for _, _, activation in layers], dtype=str),
+    }
+    for i, (kernel, bias, _) in enumerate(layers):
+        arrays[f'kernel_{i}'] = np.ascontiguousarray(kernel, dtype=np.float32)
+        arrays[f'bias_{i}'] = np.ascontiguousarray(bias, dtype=np.float32)
+    content_hash = _content_hash(arrays)
+    arrays['content_hash'] = np.array(content_hash)
+
+    # Écriture dans un fichier temporaire puis remplacement : un lecteur voit l'ancien ou le nouveau bundle
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return content_hash
+
+
+def _mmap_members(path):
+    """Projette en mémoire chaque tableau .npy stocké sans compression dans le .npz"""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise BundleError(f"{info.filename} est compressé et ne peut pas être projeté en mémoire")
+            # En-tête local du zip : 30 octets, puis le nom et le champ extra
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')]
+            if dtype.hasobject:
+                raise BundleError(f"{name} contient des objets Python")
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', shape=shape,
+                                     order='F' if fortran_order else 'C', offset=f.tell())
+    return arrays
+
+
+def load_bundle(path, mmap=True, verify=True):
+    """Charge un bundle et retourne (words, classes, layers, content_hash)"""
+    try:
+        if mmap:
+            arrays = _mmap_members(path)
+        else:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        raise BundleError(f"Bundle illisible {path}: {e}") from e
+
+    if 'format' not in arrays or int(arrays['format'][0]) != BUNDLE_FORMAT:
+        raise BundleError(f"Format de bundle non pris en charge: {path}")
+    content_hash = str(arrays.pop('content_hash')[()])
+    if verify and _content_hash(arrays) != content_hash:
+        raise BundleError(f"Empreinte du bundle invalide: {path}")
+
+    activations = [str(activation) for activation in arrays['activations']]
+    layers = [(arrays[f'kernel_{i}'], arrays[f'bias_{i}'], activation) for i, activation in enumerate(activations)]
+    return arrays['words'].tolist(), arrays['classes'].tolist(), layers, content_hash
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crée le bundle du modèle à partir des fichiers .h5 et .pkl")
+    parser.add_argument('--model-name', type=str, default='chatbot_model', help='Nom du modèle à convertir')
+    parser.add_argument('--models-dir', type=str, default=MODELS_DIR, help='Dossier des modèles')
+    args = parser.parse_args()
+
+    from chatbot_inference import NumpyIntentModel
+
+    with open(os.path.join(args.models_dir, f'{args.model_name}_words.pkl'), 'rb') as f:
+        words = pickle.load(f)
+    with open(os.path.join(args.models_dir, f'{args.model_name}_classes.pkl'), 'rb') as f:
+        classes = pickle.load(f)
+    model = NumpyIntentModel.from_h5(os.path.join(args.models_dir, f'{args.model_name}.h5'))
+
+    path = bundle_path(args.models_dir, args.model_name)
+    content_hash = save_bundle(path, words, classes, model.layers)
+    print(f"Bundle écrit: {path} ({len(words)} mots, {len(classes)} classes, empreinte {content_hash[:12]})")
+
+
+if __name__ == '__main__':
+    main()
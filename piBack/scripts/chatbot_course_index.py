@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+
+from chatbot_logging import get_logger
+
+log = get_logger('courses')
+
+
+def _ref_id(value):
+    """Retourne l'identifiant d'une référence (document peuplé ou identifiant brut)"""
+    if isinstance(value, dict):
+        return value.get('_id')
+    return value or None
+
+
+class CourseIndex:
+    """Index inversé des cours (titre et description) avec un score de type BM25"""
+
+    # Poids des champs : une correspondance dans le titre compte double
+    FIELD_WEIGHTS = {'title': 2.0, 'description': 1.0}
+
+    # Multiplicateur du score des cours suivis par l'utilisateur (voir search)
+    PREFERRED_BOOST = 1.5
+
+    def __init__(self, fetch_courses, fetch_module, analyzer, ttl=300, k1=1.2, b=0.75, on_refresh=None):
+        # fetch_courses() retourne la liste des cours, fetch_module(id) le module ou None
+        self.fetch_courses = fetch_courses
+        self.fetch_module = fetch_module
+        self.analyzer = analyzer
+        # on_refresh(entries) est appelée après chaque reconstruction réussie (index dérivés, autocomplétion)
+        self.on_refresh = on_refresh
+        self.ttl = ttl
+        self.k1 = k1
+        self.b = b
+
+        # Cours indexés et postings, remplacés d'un bloc à chaque rafraîchissement
+        self._state = ([], {})
+        self.loaded = False
+        self.last_refresh = None
+        self.last_refresh_duration = None
+        self.last_error = None
+
+        self._refresh_lock = threading.RLock()
+        self._thread = None
+        self._loader = None
+
+    def __len__(self):
+        return len(self._state[0])
+
+    def _resolve_category(self, course, module_categories):
+        """Retourne la catégorie du cours, en la récupérant depuis son module si nécessaire"""
+        category_id = _ref_id(course.get('category'))
+        module_id = _ref_id(course.get('module'))
+        if category_id or not module_id:
+            return category_id
+
+        if module_id not in module_categories:
+            module = self.fetch_module(module_id)
+            module_categories[module_id] = _ref_id(module.get('category')) if module else None
+        return module_categories[module_id]
+
+    @staticmethod
+    def unresolved_modules(courses):
+        """Modules des cours sans catégorie, dont la catégorie doit être demandée à l'API"""
+        return {_ref_id(course.get('module')) for course in courses
+                if isinstance(course, dict) and _ref_id(course.get('module')) and not _ref_id(course.get('category'))}
+
+    def _build(self, courses, modules=None):
+        """Construit la liste des cours et les listes de postings pondérées"""
+        entries = []
+        field_terms = {field: [] for field in self.FIELD_WEIGHTS}
+        module_categories = {module_id: _ref_id(module.get('category')) if module else None
+                             for module_id, module in (modules or {}).items()}
+
+        for course in courses:
+            if not isinstance(course, dict):
+                continue
+            entries.append({
+                "course": course,
+                "course_id": course.get('_id'),
+                "title": course.get('title'),
+                "module_id": _ref_id(course.get('module')),
+                "category_id": self._resolve_category(course, module_categories),
+            })
+            for field in self.FIELD_WEIGHTS:
+                field_terms[field].append(self.analyzer(str(course.get(field) or '')))
+
+        postings = {}
+        n = len(entries)
+        for field, weight in self.FIELD_WEIGHTS.items():
+            docs = field_terms[field]
+            avgdl = (sum(len(terms) for terms in docs) / n) if n else 0
+
+            frequencies = []
+            document_frequency = {}
+            for terms in docs:
+                tf = {}
+                for term in terms:
+                    tf[term] = tf.get(term, 0) + 1
+                frequencies.append(tf)
+                for term in tf:
+                    document_frequency[term] = document_frequency.get(term, 0) + 1
+
+            # Le score BM25 de chaque couple (terme, cours) est calculé une fois pour toutes
+            for doc, tf in enumerate(frequencies):
+                norm = self.k1 * (1 - self.b + self.b * len(docs[doc]) / avgdl) if avgdl else self.k1
+                for term, count in tf.items():
+                    df = document_frequency[term]
+                    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                    score = weight * idf * count * (self.k1 + 1) / (count + norm)
+                    term_postings = postings.setdefault(term, {})
+                    term_postings[doc] = term_postings.get(doc, 0.0) + score
+
+        return entries, postings
+
+    def refresh(self):
+        """Recharge le catalogue et reconstruit l'index ; l'ancien index reste servi en cas d'échec"""
+        with self._refresh_lock:
+            start = time.time()
+            try:
+                courses = self.fetch_courses()
+                if courses is None:
+                    raise RuntimeError("Catalogue des cours indisponible")
+            except Exception as e:
+                self.last_error = str(e)
+                log.warning("Erreur lors du rafraîchissement de l'index des cours: %s", e)
+                return False
+            return self.rebuild(courses, start=start)
+
+    def rebuild(self, courses, modules=None, start=None):
+        """Reconstruit l'index à partir d'un catalogue déjà récupéré
+
+        modules (identifiant → module ou None) contient les modules déjà demandés à l'API, qui ne sont
+        pas redemandés par fetch_module.
+        """
+        with self._refresh_lock:
+            start = start or time.time()
+            try:
+                entries, postings = self._build(courses, modules)
+            except Exception as e:
+                self.last_error = str(e)
+                log.warning("Erreur lors du rafraîchissement de l'index des cours: %s", e)
+                return False
+
+            # Remplacement en une seule affectation : une recherche voit l'ancien ou le nouvel index
+            self._state = (entries, postings)
+            self.loaded = True
+            self.last_refresh = time.time()
+            self.last_refresh_duration = self.last_refresh - start
+            self.last_error = None
+            log.info("Index des cours reconstruit: %d cours, %d termes en %.1f ms",
+                     len(entries), len(postings), self.last_refresh_duration * 1000)
+            if self.on_refresh is not None:
+                try:
+                    self.on_refresh(entries)
+                except Exception as e:
+                    log.warning("Erreur lors de la mise à jour des index dérivés: %s", e)
+            return True
+
+    def ensure_loaded(self):
+        """Construit l'index au premier besoin s'il n'a encore jamais été chargé"""
+        if not self.loaded:
+            with self._refresh_lock:
+                # Un autre thread a pu construire l'index pendant l'attente du verrou
+                if not self.loaded:
+                    self.refresh()
+        return self.loaded
+
+    def load_async(self):
+        """Lance la première construction de l'index dans un thread sans l'attendre"""
+        with self._refresh_lock:
+            if self.loaded or (self._loader is not None and self._loader.is_alive()):
+                return
+            self._loader = threading.Thread(target=self.ensure_loaded, name='chatbot-course-index-load', daemon=True)
+            self._loader.start()
+
+    def start(self):
+        """Démarre le rafraîchissement périodique de l'index en arrière-plan"""
+        if self._thread is not None or not self.ttl:
+            return
+
+        def run():
+            # L'index a pu être construit avant le démarrage (par exemple dans le processus parent)
+            if not self.loaded:
+                self.refresh()
+            while True:
+                time.sleep(self.ttl)
+                self.refresh()
+
+        self._thread = threading.Thread(target=run, name='chatbot-course-index', daemon=True)
+        self._thread.start()
+
+    def search(self, query_terms, limit=1, preferred=None):
+        """Retourne les meilleurs cours pour les termes analysés de la requête, avec leur score
+
+        preferred contient les identifiants des cours suivis par l'utilisateur, dont le score est augmenté.
+        """
+        courses, postings = self._state
+        scores = {}
+        for term in query_terms:
+            for doc, score in postings.get(term, {}).items():
+                scores[doc] = scores.get(doc, 0.0) + score
+        if preferred:
+            for doc in scores:
+                if str(courses[doc]['course_id']) in preferred:
+                    scores[doc] *= self.PREFERRED_BOOST
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(courses[doc], score) for doc, score in best]
+
+    def stats(self):
+        """Retourne l'état de l'index pour la vérification de santé"""
+        return {
+            "loaded": self.loaded,
+            "courses": len(self._state[0]),
+            "terms": len(self._state[1]),
+            "ttl": self.ttl,
+            "age_seconds": round(time.time() - self.last_refresh, 1) if self.last_refresh else None,
+            "last_refresh_ms": round(self.last_refresh_duration * 1000, 1) if self.last_refresh_duration is not None else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,232 @@
+import functools
+import itertools
+import json
+import os
+import zlib
+
+import numpy as np
+
+# Format du fichier {model_name}_features.json qui décrit l'encodeur du modèle
+FEATURES_FORMAT = 1
+
+# Signes de ponctuation ignorés à l'entraînement
+IGNORED_TOKENS = frozenset(['?', '!', '.', ','])
+
+
+class _ColumnEncoder:
+    """Vecteurs binaires de largeur len(self) dont les colonnes à 1 sont données par columns()"""
+
+    def encode(self, sentence_words):
+        """Crée le sac de mots d'une seule phrase (vecteur 1D)"""
+        bag = np.zeros(len(self), dtype=self.dtype)
+        bag[self.columns(sentence_words)] = 1
+        return bag
+
+    def encode_batch(self, sentences_words):
+        """Crée la matrice des sacs de mots de plusieurs phrases en une seule passe"""
+        return self.encode_csr(sentences_words).toarray(self.dtype)
+
+    def encode_csr(self, sentences_words):
+        """Encode plusieurs phrases en matrice creuse CSR, sans matrice dense intermédiaire"""
+        sentences_cols = [self.columns(sentence_words) for sentence_words in sentences_words]
+        indptr = np.zeros(len(sentences_cols) + 1, dtype=np.int64)
+        np.cumsum([len(cols) for cols in sentences_cols], out=indptr[1:])
+        indices = np.fromiter(itertools.chain.from_iterable(sentences_cols), dtype=np.int32, count=int(indptr[-1]))
+        return CsrMatrix(indptr, indices, (len(sentences_cols), len(self)))
+
+
+class CsrMatrix:
+    """Matrice binaire creuse au format CSR : colonnes à 1 de la ligne i dans indices[indptr[i]:indptr[i + 1]]"""
+
+    def __init__(self, indptr, indices, shape):
+        self.indptr = indptr
+        self.indices = indices
+        self.shape = tuple(shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    def __getitem__(self, rows):
+        """Lignes start:stop de la matrice (tranches contiguës uniquement)"""
+        start, stop, step = rows.indices(len(self))
+        if step != 1:
+            raise ValueError("Seules les tranches contiguës sont prises en charge")
+        stop = max(start, stop)
+        indptr = self.indptr[start:stop + 1]
+        return CsrMatrix(indptr - indptr[0], self.indices[indptr[0]:indptr[-1]], (stop - start, self.shape[1]))
+
+    def row_ids(self):
+        """Ligne de chaque élément non nul (coordonnées COO)"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+
+    def toarray(self, dtype=np.float32):
+        matrix = np.zeros(self.shape, dtype=dtype)
+        matrix[self.row_ids(), self.indices] = 1
+        return matrix
+
+
+def training_matrices(encoder, documents, classes):
+    """Matrice creuse des motifs et étiquettes one-hot à partir de (lemmes, tag), via des index colonne et classe"""
+    class_index = {tag: i for i, tag in enumerate(classes)}
+    x = encoder.encode_csr([lemmas for lemmas, _ in documents])
+    labels = np.fromiter((class_index[tag] for _, tag in documents), dtype=np.int64, count=len(documents))
+    y = np.zeros((len(documents), len(classes)), dtype=np.float32)
+    y[np.arange(len(documents)), labels] = 1
+    return x, y
+
+
+class BagOfWordsEncoder(_ColumnEncoder):
+    """Encode des listes de mots lemmatisés en sacs de mots à partir d'un index mot → colonne"""
+
+    def __init__(self, words, dtype=np.float32):
+        self.words = list(words)
+        self.dtype = dtype
+        # Index construit une seule fois au chargement du modèle
+        self.index = {word: i for i, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def config(self):
+        return {'type': 'bow'}
+
+    def columns(self, sentence_words):
+        """Retourne les colonnes (sans doublons) des mots connus du vocabulaire"""
+        index = self.index
+        return sorted({index[w] for w in sentence_words if w in index})
+
+
+class HashedNgramEncoder(_ColumnEncoder):
+    """Encode des listes de mots lemmatisés en hachant leurs n-grammes de mots et de caractères
+
+    Chaque n-gramme est projeté sur une colonne d'un vecteur de largeur fixe : la taille du modèle ne
+    dépend pas du vocabulaire et aucun mot n'est « inconnu ». Un mot mal orthographié ou une forme
+    absente de l'entraînement partage la plupart de ses n-grammes de caractères avec le mot correct
+    (« pyhton » et « python » ont « <py » et « on> » en commun). Les collisions de hachage mélangent
+    quelques n-grammes rares, ce que le modèle tolère bien.
+    """
+
+    # Colonnes mémorisées pour les mots les plus fréquents
+    WORD_CACHE_SIZE = 65536
+
+    def __init__(self, dim=4096, word_ngrams=(1, 2), char_ngrams=(3, 5), dtype=np.float32):
+        self.dim = int(dim)
+        self.word_ngrams = tuple(word_ngrams)
+        self.char_ngrams = tuple(char_ngrams)
+        self.dtype = dtype
+        self._word_columns = functools.lru_cache(maxsize=self.WORD_CACHE_SIZE)(self._hash_word)
+
+    def __len__(self):
+        return self.dim
+
+    def config(self):
+        return {'type': 'hashed', 'dim': self.dim, 'word_ngrams': list(self.word_ngrams), 'char_ngrams': list(self.char_ngrams)}
+
+    def _hash(self, feature):
+        # CRC32 plutôt que hash() : les colonnes doivent être les mêmes dans tous les processus
+        return zlib.crc32(feature.encode('utf-8')) % self.dim
+
+    def _hash_word(self, word):
+        """Colonnes des n-grammes de caractères d'un mot, bornes comprises (« <py », « on> »)"""
+        padded = f'<{word}>'
+        low, high = self.char_ngrams
+        return tuple(self._hash('c:' + padded[i:i + n])
+                     for n in range(low, high + 1) for i in range(len(padded) - n + 1))
+
+    def columns(self, sentence_words):
+        """Retourne les colonnes (sans doublons) des n-grammes de la phrase"""
+        words = [w for w in sentence_words if w not in IGNORED_TOKENS]
+        cols = set()
+        low, high = self.word_ngrams
+        for n in range(low, high + 1):
+            for i in range(len(words) - n + 1):
+                cols.add(self._hash('w:' + ' '.join(words[i:i + n])))
+        for word in words:
+            cols.update(self._word_columns(word))
+        return sorted(cols)
+
+
+def features_path(models_dir, model_name):
+    return os.path.join(models_dir, f'{model_name}_features.json')
+
+
+def save_encoder_config(path, encoder):
+    """Écrit la description de l'encodeur de façon atomique"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'format': FEATURES_FORMAT, **encoder.config()}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_encoder(path, words):
+    """Crée l'encodeur décrit par le fichier ; sans fichier (modèles plus anciens), sac de mots du vocabulaire"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return BagOfWordsEncoder(words)
+    if config.get('format') != FEATURES_FORMAT:
+        raise ValueError(f"Format de description des features non pris en charge: {path}")
+    if config['type'] == 'bow':
+        return BagOfWordsEncoder(words)
+    if config['type'] == 'hashed':
+        return HashedNgramEncoder(config['dim'], config['word_ngrams'], config['char_ngrams'])
+    raise ValueError(f"Type de features inconnu: {config['type']}")
+
+
+class ExactMatchTable:
+    """Table suite de lemmes → intention construite à partir des motifs d'entraînement
+
+    Un message dont les lemmes correspondent exactement à un motif n'a pas besoin du modèle.
+    Les signes de ponctuation ignorés à l'entraînement ne font pas partie de la clé.
+    """
+
+    FORMAT = 1
+    IGNORED = IGNORED_TOKENS
+
+    def __init__(self, matches=None):
+        self.matches = dict(matches or {})
+
+    def __len__(self):
+        return len(self.matches)
+
+    @classmethod
+    def key(cls, lemmas):
+        return ' '.join(lemma for lemma in lemmas if lemma not in cls.IGNORED)
+
+    @classmethod
+    def from_documents(cls, documents):
+        """Construit la table à partir de (lemmes, tag) ; un motif partagé par plusieurs tags est écarté"""
+        tags = {}
+        for lemmas, tag in documents:
+            key = cls.key(lemmas)
+            if key:
+                tags.setdefault(key, set()).add(tag)
+        return cls({key: next(iter(found)) for key, found in tags.items() if len(found) == 1})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != cls.FORMAT:
+            raise ValueError(f"Format de table de correspondances non pris en charge: {path}")
+        return cls(data['matches'])
+
+    def save(self, path):
+        """Écrit la table de façon atomique"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': self.FORMAT, 'matches': self.matches}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def restrict(self, classes):
+        """Retourne la table sans les tags absents des classes du modèle"""
+        known = set(classes)
+        return ExactMatchTable({key: tag for key, tag in self.matches.items() if tag in known})
+
+    def get(self, lemmas):
+        return self.matches.get(self.key(lemmas))
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+
+def _softmax(x):
+    # Soustraire le maximum pour la stabilité numérique
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+ACTIVATIONS = {
+    'relu': _relu,
+    'softmax': _softmax,
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+    'linear': lambda x: x,
+}
+
+
+class NumpyIntentModel:
+    """Modèle de classification d'intentions évalué en NumPy pur, sans TensorFlow"""
+
+    def __init__(self, layers):
+        # Liste de couches denses (kernel, bias, activation)
+        self.layers = [
+            (np.ascontiguousarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32), activation)
+            for kernel, bias, activation in layers
+        ]
+        self._activations = [ACTIVATIONS[activation] for _, _, activation in self.layers]
+
+    @property
+    def input_dim(self):
+        return self.layers[0][0].shape[0] if self.layers else 0
+
+    @property
+    def output_dim(self):
+        return self.layers[-1][0].shape[1] if self.layers else 0
+
+    @classmethod
+    def from_h5(cls, path):
+        """Extrait les poids des couches denses d'un modèle Keras sauvegardé au format HDF5"""
+        import h5py
+
+        with h5py.File(path, 'r') as f:
+            model_config = f.attrs['model_config']
+            if isinstance(model_config, bytes):
+                model_config = model_config.decode('utf-8')
+            config = json.loads(model_config)
+
+            weights_group = f['model_weights'] if 'model_weights' in f else f
+            layers = []
+            for layer in config['config']['layers']:
+                # Les couches Dropout et Input n'ont aucun effet à l'inférence
+                if layer['class_name'] != 'Dense':
+                    continue
+                layer_config = layer['config']
+                group = weights_group[layer_config['name']]
+                weights = {}
+                for weight_name in group.attrs['weight_names']:
+                    if isinstance(weight_name, bytes):
+                        weight_name = weight_name.decode('utf-8')
+                    key = weight_name.split('/')[-1].split(':')[0]
+                    weights[key] = group[weight_name][()]
+                bias = weights.get('bias')
+                if bias is None:
+                    bias = np.zeros(weights['kernel'].shape[1], dtype=np.float32)
+                layers.append((weights['kernel'], bias, layer_config.get('activation', 'linear')))
+
+        return cls(layers)
+
+    def predict(self, x, **kwargs):
+        """Calcule les probabilités pour une matrice d'entrée (n_phrases × n_mots)"""
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[np.newaxis, :]
+        for (kernel, bias, _), activation in zip(self.layers, self._activations):
+            x = activation(x @ kernel + bias)
+        return x
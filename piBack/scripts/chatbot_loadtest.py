@@ -0,0 +1,408 @@
+"""Test de charge reproductible du service chatbot, avec une API des cours simulée
+
+Une API Node.js simulée (/api/courses, /api/courses/purchased, /api/courses/user/:id, /api/modules/:id)
+sert un catalogue synthétique avec une latence injectée ; le serveur de production est démarré contre
+elle, puis /predict reçoit un mélange fixe de messages (salutations, recherches de cours, messages
+inconnus) à concurrence constante. Le rapport JSON contient le débit et les percentiles de latence, au
+total et par type de message ; deux rapports se comparent pour détecter une régression.
+
+Usage :
+    python scripts/chatbot_loadtest.py run --catalog-size 500 --latency-ms 20 --concurrency 8 --output base.json
+    python scripts/chatbot_loadtest.py run --mix greeting=0.5,course=0.3,unknown=0.2 --output new.json
+    python scripts/chatbot_loadtest.py run --url http://127.0.0.1:5001 --output prod.json
+    python scripts/chatbot_loadtest.py compare base.json new.json --threshold 10
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from chatbot_benchmark import start_stub_backend
+
+# Version du format du rapport, incrémentée à chaque changement incompatible
+REPORT_FORMAT = 1
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Sujets reconnus comme mots-clés de cours par le service (DEFAULT_COURSE_KEYWORDS)
+SUBJECTS = ['html', 'css', 'javascript', 'python', 'java', 'react', 'angular', 'nodejs']
+LEVELS = ['débutant', 'intermédiaire', 'avancé', 'projet', 'bases', 'expert']
+
+GREETINGS = ['bonjour', 'salut', 'hello', 'bonsoir', 'comment vas tu', 'merci', 'au revoir']
+COURSE_TEMPLATES = ['je cherche le cours {title}', 'cours {title}', 'je veux apprendre {subject}',
+                    'où trouver le cours de {subject} {level}']
+UNKNOWN_WORDS = ['zorglub', 'kwix', 'brumpf', 'flanoir', 'quibe', 'trazou', 'plonque', 'vrid']
+
+MESSAGE_KINDS = ('greeting', 'course', 'unknown')
+DEFAULT_MIX = 'greeting=0.4,course=0.4,unknown=0.2'
+PERCENTILES = (50, 90, 95, 99)
+
+
+def build_catalog(size, seed=7):
+    """Catalogue synthétique : un module par sujet, titres « Python avancé 12 », acheteurs aléatoires"""
+    rng = random.Random(seed)
+    catalog = []
+    for i in range(size):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        catalog.append({
+            "_id": f"c{i}",
+            "title": f"{subject.capitalize()} {rng.choice(LEVELS)} {i}",
+            "description": f"Programmation {subject}",
+            "module": f"m_{subject}",
+            "category": "cat1",
+            "purchasedBy": [f"u{rng.randrange(1000)}" for _ in range(rng.randint(0, 20))],
+        })
+    return catalog
+
+
+def start_course_api(catalog_size=200, latency=0.0, port=0):
+    """Démarre l'API simulée de chatbot_benchmark avec le catalogue synthétique ; retourne le serveur"""
+    catalog = build_catalog(catalog_size)
+
+    def purchased(owner):
+        # Quelques cours du catalogue, toujours les mêmes pour un utilisateur (ou un token) donné
+        return random.Random(owner).sample(catalog, min(3, len(catalog)))
+
+    return start_stub_backend(latency, catalog=catalog, purchased=purchased, port=port)
+
+
+def parse_mix(text):
+    """« greeting=0.5,course=0.3,unknown=0.2 » → proportions normalisées par type de message"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in MESSAGE_KINDS:
+            raise argparse.ArgumentTypeError(f"Type de message inconnu: {kind} (attendus: {', '.join(MESSAGE_KINDS)})")
+        try:
+            mix[kind] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Proportion invalide pour {kind}: {weight}")
+        if mix[kind] < 0:
+            raise argparse.ArgumentTypeError(f"Proportion négative pour {kind}")
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("La somme des proportions doit être positive")
+    return {kind: mix.get(kind, 0.0) / total for kind in MESSAGE_KINDS}
+
+
+def build_messages(mix, count, catalog, seed):
+    """Liste reproductible de (type, message) : même graine, même charge"""
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    messages = []
+    for kind in kinds:
+        if kind == 'greeting':
+            message = rng.choice(GREETINGS)
+        elif kind == 'course':
+            course = rng.choice(catalog)
+            subject, level = course['title'].lower().split(' ')[:2]
+            message = rng.choice(COURSE_TEMPLATES).format(title=course['title'].lower(), subject=subject, level=level)
+        else:
+            message = ' '.join(rng.choice(UNKNOWN_WORDS) for _ in range(rng.randint(1, 4)))
+        messages.append((kind, message))
+    return messages
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get_json(url, timeout=5):
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        connection.request('GET', parts.path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    finally:
+        connection.close()
+
+
+def start_service(args, api_url):
+    """Démarre le serveur de production contre l'API simulée ; retourne (processus, URL du service)"""
+    port = _free_port()
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, 'chatbot_server.py'),
+               '--host', '127.0.0.1', '--port', str(port),
+               '--workers', str(args.workers), '--threads', str(args.threads)]
+    command += shlex.split(args.service_args)
+    env = dict(os.environ, CHATBOT_API_URL=api_url)
+    process = subprocess.Popen(command, env=env)
+    url = f"http://127.0.0.1:{port}"
+
+    # Attendre que /health réponde (chargement du modèle et de l'index des cours)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le service s'est arrêté au démarrage (code {process.returncode})")
+        try:
+            status, _ = _get_json(f"{url}/health", timeout=1)
+            if status == 200:
+                return process, url
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.2)
+    stop_service(process)
+    raise RuntimeError(f"Le service n'a pas répondu sur {url}/health en {args.startup_timeout} s")
+
+
+def stop_service(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def drive(url, messages, concurrency, users):
+    """Envoie les messages à /predict avec concurrency connexions keep-alive
+
+    Retourne (résultats, durée) ; chaque résultat est (type, latence en secondes, succès).
+    """
+    parts = urlsplit(url)
+    lock = threading.Lock()
+    position = [0]
+    results = []
+
+    def worker():
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        local = []
+        while True:
+            with lock:
+                index = position[0]
+                position[0] += 1
+            if index >= len(messages):
+                break
+            kind, message = messages[index]
+            user = index % users
+            body = json.dumps({"message": message, "context": {"userId": f"load{user}"}})
+            headers = {"Content-Type": "application/json", "Authorization": f"Bearer token{user}"}
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/predict', body=body, headers=headers)
+                response = connection.getresponse()
+                payload = json.loads(response.read())
+                ok = response.status == 200 and payload.get('data', {}).get('intent') != 'error'
+            except (OSError, ValueError, http.client.HTTPException):
+                # Connexion fermée par le serveur (recyclage d'un worker) : la requête compte comme une erreur
+                connection.close()
+                ok = False
+            local.append((kind, time.perf_counter() - start, ok))
+        connection.close()
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, name=f'loadtest-{i}') for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def percentile(sorted_values, p):
+    """Percentile au rang le plus proche d'une liste triée"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(results, duration):
+    latencies = sorted(latency for _, latency, _ in results)
+    errors = sum(1 for _, _, ok in results if not ok)
+    summary = {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": round(errors / len(results), 6) if results else 0.0,
+        "throughput_rps": round(len(results) / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) * 1000 / len(latencies), 3) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+    for p in PERCENTILES:
+        summary["latency_ms"][f"p{p}"] = round(percentile(latencies, p) * 1000, 3)
+    return summary
+
+
+def run(args):
+    mix = args.mix
+    api = start_course_api(args.catalog_size, args.latency_ms / 1000, args.api_port)
+    api_url = f"http://127.0.0.1:{api.server_address[1]}"
+    print(f"API simulée sur {api_url} ({args.catalog_size} cours, latence {args.latency_ms:.0f} ms)")
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_service(args, api_url)
+    print(f"Service: {url}")
+
+    try:
+        warmup = build_messages(mix, args.warmup, api.catalog, args.seed + 1)
+        messages = build_messages(mix, args.requests, api.catalog, args.seed)
+        if warmup:
+            drive(url, warmup, args.concurrency, args.users)
+        with api.lock:
+            api.requests.clear()
+        results, duration = drive(url, messages, args.concurrency, args.users)
+    finally:
+        if process is not None:
+            stop_service(process)
+        api.shutdown()
+
+    report = {
+        "format": REPORT_FORMAT,
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "config": {
+            "url": args.url,
+            "catalog_size": args.catalog_size,
+            "latency_ms": args.latency_ms,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "users": args.users,
+            "mix": mix,
+            "seed": args.seed,
+            "workers": None if args.url else args.workers,
+            "threads": None if args.url else args.threads,
+            "service_args": None if args.url else args.service_args,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "duration_s": round(duration, 3),
+        "total": summarize(results, duration),
+        "by_kind": {kind: summarize([r for r in results if r[0] == kind], duration)
+                    for kind in MESSAGE_KINDS if mix[kind] > 0},
+        # Appels reçus par l'API simulée pendant la mesure (hors chauffe et démarrage)
+        "backend_requests": dict(sorted(api.requests.items())),
+    }
+
+    total = report["total"]
+    print(f"{total['requests']} requêtes en {duration:.2f} s : {total['throughput_rps']:.1f} requêtes/s, "
+          f"{total['errors']} erreurs")
+    print(f"{'type':>10} {'requêtes':>9} " + ' '.join(f"{f'p{p} (ms)':>10}" for p in PERCENTILES))
+    for kind, summary in [('total', total)] + list(report["by_kind"].items()):
+        print(f"{kind:>10} {summary['requests']:>9} " +
+              ' '.join(f"{summary['latency_ms'][f'p{p}']:>10.2f}" for p in PERCENTILES))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write('\n')
+        print(f"Rapport écrit: {args.output}")
+    return 0 if total['errors'] == 0 else 1
+
+
+# Métriques comparées : (chemin dans le rapport, sens de l'amélioration)
+HIGHER_IS_BETTER = 1
+LOWER_IS_BETTER = -1
+
+
+def _compared_metrics(report):
+    sections = [('total', report['total'])] + sorted(report['by_kind'].items())
+    for name, summary in sections:
+        if name == 'total':
+            yield f"{name}.throughput_rps", summary['throughput_rps'], HIGHER_IS_BETTER
+            yield f"{name}.error_rate", summary['error_rate'], LOWER_IS_BETTER
+        for p in PERCENTILES:
+            yield f"{name}.p{p}_ms", summary['latency_ms'][f'p{p}'], LOWER_IS_BETTER
+
+
+def compare(args):
+    """Compare deux rapports ; code de sortie 1 si une métrique se dégrade au-delà du seuil"""
+    reports = []
+    for path in (args.base, args.new):
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+        if report.get('format') != REPORT_FORMAT:
+            print(f"Format de rapport non pris en charge: {path}", file=sys.stderr)
+            return 2
+        reports.append(report)
+    base, new = reports
+
+    # Des rapports obtenus avec des paramètres différents ne mesurent pas la même charge
+    differences = sorted(key for key in set(base['config']) | set(new['config'])
+                         if base['config'].get(key) != new['config'].get(key))
+    for key in differences:
+        print(f"Attention: {key} diffère ({base['config'].get(key)!r} → {new['config'].get(key)!r})")
+
+    new_metrics = {name: value for name, value, _ in _compared_metrics(new)}
+    regressions = []
+    print(f"{'métrique':>24} {'base':>10} {'nouveau':>10} {'écart':>9}")
+    for name, base_value, direction in _compared_metrics(base):
+        if name not in new_metrics:
+            continue
+        new_value = new_metrics[name]
+        if base_value:
+            change = (new_value - base_value) / base_value * 100
+        else:
+            change = 0.0 if not new_value else float('inf')
+        regressed = -change * direction > args.threshold
+        if name.endswith('error_rate'):
+            # Le taux d'erreur est comparé en valeur absolue : toute nouvelle erreur compte
+            regressed = new_value > base_value
+        if regressed:
+            regressions.append(name)
+        print(f"{name:>24} {base_value:>10.2f} {new_value:>10.2f} {change:>+8.1f}%{'  RÉGRESSION' if regressed else ''}")
+
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.0f} %: {', '.join(regressions)}")
+        return 1
+    print(f"Aucune régression au-delà de {args.threshold:.0f} %")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du service chatbot")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('run', help='Lance la charge et écrit le rapport JSON')
+    p.add_argument('--catalog-size', type=int, default=200, help="Nombre de cours servis par l'API simulée")
+    p.add_argument('--latency-ms', type=float, default=10.0, help="Latence injectée dans chaque réponse de l'API")
+    p.add_argument('--api-port', type=int, default=0, help="Port de l'API simulée (0 = port libre)")
+    p.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='Proportions des types de messages')
+    p.add_argument('--concurrency', type=int, default=8, help='Nombre de requêtes simultanées')
+    p.add_argument('--requests', type=int, default=2000, help='Nombre de requêtes mesurées')
+    p.add_argument('--warmup', type=int, default=100, help='Requêtes de chauffe non mesurées')
+    p.add_argument('--users', type=int, default=50, help='Nombre d\'utilisateurs distincts')
+    p.add_argument('--seed', type=int, default=42, help='Graine des messages envoyés')
+    p.add_argument('--url', type=str, default=None,
+                   help="Service déjà démarré à tester, avec CHATBOT_API_URL sur l'API simulée (voir --api-port) ; "
+                        "sinon le serveur de production est lancé contre l'API simulée")
+    p.add_argument('--workers', type=int, default=2, help='Workers du serveur lancé')
+    p.add_argument('--threads', type=int, default=1, help='Threads par worker du serveur lancé')
+    p.add_argument('--service-args', type=str, default='--engine numpy --log-level WARNING',
+                   help='Arguments supplémentaires du serveur lancé')
+    p.add_argument('--startup-timeout', type=float, default=120.0, help='Délai de démarrage du service en secondes')
+    p.add_argument('--output', type=str, default=None, help='Fichier du rapport JSON')
+    p.set_defaults(func=run)
+
+    p = subparsers.add_parser('compare', help='Compare deux rapports et signale les régressions')
+    p.add_argument('base', help='Rapport de référence')
+    p.add_argument('new', help='Nouveau rapport')
+    p.add_argument('--threshold', type=float, default=10.0, help='Dégradation tolérée en pourcentage')
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Logger racine du chatbot ; chaque catégorie est un logger enfant (chatbot.request, chatbot.search, ...)
+ROOT_LOGGER = 'chatbot'
+
+LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+
+
+def get_logger(category):
+    """Retourne le logger d'une catégorie (request, predict, search, courses, backend, model, server)"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{category}')
+
+
+def parse_sample_rates(value):
+    """Lit des taux d'échantillonnage de la forme 'request=0.1,predict=0.5'"""
+    rates = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        category, _, rate = item.partition('=')
+        rates[category.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Ne garde qu'une fraction des messages INFO et DEBUG de chaque catégorie ; les avertissements et erreurs passent toujours"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name.rpartition('.')[2], 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Prépare les messages sur le thread appelant puis les confie au thread d'écriture sans jamais bloquer
+
+    Le message est tronqué à max_length caractères ; si la file est pleine, il est compté puis abandonné.
+    """
+
+    def __init__(self, log_queue, max_length=2000):
+        super().__init__(log_queue)
+        self.max_length = max_length
+        self.dropped = 0
+
+    def prepare(self, record):
+        message = record.getMessage()
+        if self.max_length and len(message) > self.max_length:
+            message = f"{message[:self.max_length]}... (+{len(message) - self.max_length} caractères)"
+        # Ce gestionnaire est le seul du logger chatbot : l'enregistrement peut être modifié sur place
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par message : date, niveau, catégorie, processus, message et champs fournis avec extra={'fields': ...}"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "category": record.name.rpartition('.')[2],
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _LoggingState:
+    handler = None
+    output = None
+    listener = None
+    pid = None
+    lock = threading.Lock()
+
+
+def configure_logging(level='INFO', sample_rates=None, max_length=2000, queue_size=10000, stream=None):
+    """Configure le logger du chatbot : file d'attente bornée, niveau, troncature et échantillonnage par catégorie"""
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    with _LoggingState.lock:
+        _stop_listener()
+        if _LoggingState.handler is not None:
+            logger.removeHandler(_LoggingState.handler)
+
+        handler = AsyncQueueHandler(queue.Queue(maxsize=queue_size), max_length=max_length)
+        handler.addFilter(SamplingFilter(sample_rates or {}))
+        logger.addHandler(handler)
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        _LoggingState.handler = handler
+        _LoggingState.output = output
+    start_logging()
+    return handler
+
+
+def start_logging():
+    """Démarre le thread d'écriture dans le processus courant (à refaire dans chaque worker après un fork)"""
+    with _LoggingState.lock:
+        if _LoggingState.handler is None or _LoggingState.pid == os.getpid():
+            return
+        # Après un fork, le thread du processus parent n'existe plus : on en crée un nouveau,
+        # avec une nouvelle file pour ne pas réécrire les messages hérités du parent
+        if _LoggingState.pid is not None:
+            handler = _LoggingState.handler
+            handler.queue = queue.Queue(maxsize=handler.queue.maxsize)
+        listener = QueueListener(_LoggingState.handler.queue, _LoggingState.output)
+        listener.start()
+        _LoggingState.listener = listener
+        _LoggingState.pid = os.getpid()
+
+
+def _stop_listener():
+    if _LoggingState.listener is not None and _LoggingState.pid == os.getpid():
+        _LoggingState.listener.stop()
+    _LoggingState.listener = None
+    _LoggingState.pid = None
+
+
+def stop_logging():
+    """Écrit les messages encore en file d'attente puis arrête le thread d'écriture"""
+    with _LoggingState.lock:
+        _stop_listener()
+
+
+def logging_stats():
+    handler = _LoggingState.handler
+    if handler is None:
+        return None
+    return {
+        "level": logging.getLevelName(logging.getLogger(ROOT_LOGGER).level),
+        "queue_depth": handler.queue.qsize(),
+        "dropped": handler.dropped,
+    }
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,139 @@
+import bisect
+import threading
+import time
+
+# Bornes des histogrammes de latence, en secondes (de 50 µs à 10 s)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Type MIME du format texte de Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Histogramme cumulatif par valeur d'étiquette, au format Prometheus"""
+
+    def __init__(self, name, documentation, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        # Compteur du premier intervalle contenant la valeur ; le cumul est fait à l'export
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_value, (counts, total, count) in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total!r}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+class Counter:
+    """Compteur par valeur d'étiquette, au format Prometheus"""
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {value}')
+        return lines
+
+
+class _StageTimer:
+    """Chronomètre d'une étape, utilisé avec with"""
+
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class ChatbotMetrics:
+    """Latences par étape et compteurs d'intentions et d'issues du chatbot, exportés au format Prometheus"""
+
+    # Étapes chronométrées de ChatbotPredictor.predict
+    STAGES = ('normalize', 'tokenize', 'bag_of_words', 'model', 'course_search', 'backend_http',
+              'response_selection', 'total')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.stage_seconds = Histogram('chatbot_stage_duration_seconds',
+                                       "Durée de chaque étape du traitement d'un message", 'stage', buckets)
+        self.backend_seconds = Histogram('chatbot_backend_request_duration_seconds',
+                                         "Durée des requêtes vers l'API Node.js", 'endpoint', buckets)
+        self.intents = Counter('chatbot_intents_total', "Intentions détectées par le modèle", 'intent')
+        self.outcomes = Counter('chatbot_outcomes_total', "Messages traités par issue", 'outcome')
+
+    def time(self, stage):
+        """Chronomètre un bloc : with metrics.time('model'): ..."""
+        return _StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        self.stage_seconds.observe(stage, seconds)
+
+    def observe_backend(self, endpoint, seconds):
+        self.stage_seconds.observe('backend_http', seconds)
+        self.backend_seconds.observe(endpoint, seconds)
+
+    def count_intent(self, intent):
+        self.intents.inc(intent)
+
+    def count_outcome(self, outcome):
+        self.outcomes.inc(outcome)
+
+    def render(self, extra_lines=()):
+        """Retourne toutes les métriques au format texte de Prometheus"""
+        lines = []
+        for metric in (self.stage_seconds, self.backend_seconds, self.intents, self.outcomes):
+            lines.extend(metric.render())
+        lines.extend(extra_lines)
+        return '\n'.join(lines) + '\n'
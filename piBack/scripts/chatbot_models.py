@@ -0,0 +1,213 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from chatbot_logging import get_logger
+
+log = get_logger('model')
+
+# Noms de modèles acceptés dans les requêtes : fichiers {model_name}.h5, {model_name}_words.pkl... du dossier des modèles
+MODEL_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+MB = 1024 * 1024
+
+
+class UnknownModelError(Exception):
+    """Levée quand le modèle demandé n'existe pas ou ne peut pas être chargé"""
+
+
+def parse_locales(text):
+    """« en=chatbot_model_en,de=chatbot_model_de » → {langue: nom du modèle}"""
+    locales = {}
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        locale, _, model_name = part.partition('=')
+        locales[locale.strip().lower().replace('_', '-')] = model_name.strip()
+    return locales
+
+
+class ModelRegistry:
+    """Modèles hébergés par le processus : chargés au premier usage, déchargés au-delà d'un budget mémoire
+
+    Le modèle principal reste toujours chargé. Les autres sont créés par factory(model_name) au premier
+    message qui les demande (champ model de la requête ou langue de l'utilisateur), puis déchargés du
+    moins récemment utilisé au plus récent quand la mémoire estimée de l'ensemble dépasse le budget.
+
+    Le nom vient de la requête : seuls les modèles dont les fichiers existent (exists(model_name)) donnent
+    lieu à un verrou de chargement ou à un échec mémorisé, si bien que des noms arbitraires ne font pas
+    grossir le registre.
+    """
+
+    # Délai en secondes avant de retenter le chargement d'un modèle en échec (fichiers invalides...)
+    RETRY_AFTER = 30
+    # Nombre maximal d'échecs mémorisés
+    MAX_FAILURES = 256
+
+    def __init__(self, primary, factory, memory_budget=512 * MB, locales=None, exists=None):
+        self.primary = primary
+        self.factory = factory
+        self.memory_budget = memory_budget
+        self.locales = dict(locales or {})
+        self.exists = exists or (lambda model_name: True)
+
+        # Modèles secondaires chargés (nom → (prédicteur, taille estimée)), du moins au plus récemment utilisé
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        # Un seul chargement à la fois par modèle ; les autres requêtes attendent son résultat
+        self._load_locks = {}
+        self._failures = {}
+
+        # Statistiques
+        self.loads = 0
+        self.evictions = 0
+        self.failed_loads = 0
+
+    def resolve(self, model=None, locale=None):
+        """Nom du modèle d'une requête : champ model, sinon langue de l'utilisateur, sinon modèle principal"""
+        if model:
+            return str(model)
+        if locale:
+            locale = str(locale).lower().replace('_', '-')
+            for key in (locale, locale.split('-')[0]):
+                if key in self.locales:
+                    return self.locales[key]
+        return self.primary.model_name
+
+    def peek(self, model_name):
+        """Retourne le prédicteur s'il est déjà chargé, sans jamais le charger"""
+        if model_name == self.primary.model_name:
+            return self.primary
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is None:
+                return None
+            self._models.move_to_end(model_name)
+            return entry[0]
+
+    def get(self, model_name):
+        """Retourne le prédicteur du modèle, en le chargeant au premier usage ; lève UnknownModelError"""
+        predictor = self.peek(model_name)
+        if predictor is not None:
+            return predictor
+        if not MODEL_NAME.match(model_name):
+            raise UnknownModelError(f"Nom de modèle invalide: {model_name!r}")
+        if not self.exists(model_name):
+            raise UnknownModelError(f"Modèle {model_name} inconnu")
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+        try:
+            with load_lock:
+                # Un autre thread a pu charger le modèle pendant l'attente du verrou
+                predictor = self.peek(model_name)
+                if predictor is not None:
+                    return predictor
+                return self._load(model_name)
+        finally:
+            # Un verrou par chargement en cours seulement ; un autre thread a pu déjà le remplacer
+            with self._lock:
+                if self._load_locks.get(model_name) is load_lock:
+                    del self._load_locks[model_name]
+
+    def _load(self, model_name):
+        """Crée le prédicteur du modèle (sous son verrou de chargement) et l'ajoute au registre"""
+        with self._lock:
+            failure = self._failures.get(model_name)
+        if failure is not None and time.monotonic() - failure < self.RETRY_AFTER:
+            raise UnknownModelError(f"Modèle {model_name} indisponible")
+
+        start = time.perf_counter()
+        try:
+            predictor = self.factory(model_name)
+        except Exception as e:
+            with self._lock:
+                self._record_failure(model_name)
+                self.failed_loads += 1
+            log.warning("Impossible de charger le modèle %s: %s", model_name, e)
+            raise UnknownModelError(f"Modèle {model_name} indisponible") from e
+
+        size = predictor.state.approx_size()
+        with self._lock:
+            self._failures.pop(model_name, None)
+            self._models[model_name] = (predictor, size)
+            self.loads += 1
+            evicted = self._evict()
+            log.info("Modèle %s chargé en %.0f ms (%.1f Mo estimés)", model_name, (time.perf_counter() - start) * 1000,
+                     size / MB, extra={'fields': {"evicted": evicted}})
+        return predictor
+
+    def loaded(self):
+        """Modèles chargés (nom, prédicteur), le modèle principal en premier"""
+        with self._lock:
+            secondary = [(model_name, predictor) for model_name, (predictor, _) in self._models.items()]
+        return [(self.primary.model_name, self.primary)] + secondary
+
+    def reload(self):
+        """Recharge les fichiers de chaque modèle chargé ; retourne {nom: rechargé}"""
+        return {model_name: predictor.reload() for model_name, predictor in self.loaded()}
+
+    def reload_async(self):
+        """Lance le rechargement de chaque modèle chargé ; retourne {nom: lancé} (False si déjà en cours)"""
+        return {model_name: predictor.reload_async() for model_name, predictor in self.loaded()}
+
+    def start_model_watch(self, interval=5):
+        """Recharge chaque modèle chargé quand ses fichiers changent (vérifié toutes les interval secondes)"""
+        def watch():
+            while True:
+                time.sleep(interval)
+                for model_name, predictor in self.loaded():
+                    try:
+                        predictor.check_artifacts()
+                    except Exception as e:
+                        log.warning("Erreur lors de la surveillance du modèle %s: %s", model_name, e)
+
+        thread = threading.Thread(target=watch, name='chatbot-model-watch', daemon=True)
+        thread.start()
+        return thread
+
+    def _record_failure(self, model_name):
+        """Mémorise un échec de chargement ; les échecs expirés puis les plus anciens sont oubliés (sous _lock)"""
+        now = time.monotonic()
+        self._failures = {name: failed_at for name, failed_at in self._failures.items()
+                          if now - failed_at < self.RETRY_AFTER}
+        while len(self._failures) >= self.MAX_FAILURES:
+            del self._failures[min(self._failures, key=self._failures.get)]
+        self._failures[model_name] = now
+
+    def _memory(self):
+        return self.primary.state.approx_size() + sum(size for _, size in self._models.values())
+
+    def _evict(self):
+        """Décharge les modèles les moins récemment utilisés jusqu'à revenir sous le budget
+
+        Le modèle qui vient d'être chargé n'est jamais déchargé, même s'il dépasse seul le budget : les
+        requêtes en cours sur un modèle déchargé terminent avec lui, il est libéré ensuite.
+        """
+        evicted = []
+        while len(self._models) > 1 and self._memory() > self.memory_budget:
+            model_name, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            evicted.append(model_name)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            loaded = {
+                model_name: {"version": predictor.state.version, "size_mb": round(size / MB, 2),
+                             "reloads": predictor.reloads, "last_reload_error": predictor.last_reload_error}
+                for model_name, (predictor, size) in self._models.items()
+            }
+            memory = self._memory()
+        return {
+            "primary": self.primary.model_name,
+            "loaded": loaded,
+            "memory_mb": round(memory / MB, 2),
+            "budget_mb": round(self.memory_budget / MB, 2),
+            "locales": self.locales,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "failed_loads": self.failed_loads,
+            "recent_failures": len(self._failures),
+        }
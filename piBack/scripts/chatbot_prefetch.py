@@ -0,0 +1,85 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from chatbot_batching import QueueFullError
+from chatbot_logging import get_logger
+
+log = get_logger('courses')
+
+
+class PrefetchPool:
+    """Exécute des préchargements en arrière-plan avec peu de threads, un seul à la fois par clé
+
+    Une clé déjà en attente ou en cours n'est pas soumise une seconde fois ; au-delà de
+    max_pending préchargements en attente, les nouvelles demandes sont refusées.
+    """
+
+    def __init__(self, task, workers=4, max_pending=1000, name='chatbot-prefetch'):
+        # task(key, *args) est appelée dans un thread du pool
+        self.task = task
+        self.workers = workers
+        self.max_pending = max_pending
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._executor = None
+        self._pid = None
+
+        # Statistiques
+        self._submitted = 0
+        self._deduplicated = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _get_executor(self):
+        # Les threads du processus parent n'existent plus après un fork : un pool par processus
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            self._pending = {}
+            self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, key, *args):
+        """Planifie task(key, *args) ; retourne False si la clé est déjà en attente ou en cours"""
+        with self._lock:
+            executor = self._get_executor()
+            if key in self._pending:
+                self._deduplicated += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(f"Trop de préchargements en attente ({self.max_pending})")
+            self._submitted += 1
+            future = executor.submit(self._run, key, *args)
+            self._pending[key] = future
+        return True
+
+    def _run(self, key, *args):
+        try:
+            self.task(key, *args)
+        except Exception as e:
+            log.warning("Erreur lors du préchargement %s: %s", key, e)
+            failed = True
+        else:
+            failed = False
+        with self._lock:
+            self._pending.pop(key, None)
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": len(self._pending),
+                "submitted": self._submitted,
+                "deduplicated": self._deduplicated,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
@@ -0,0 +1,81 @@
+import re
+import time
+from functools import lru_cache
+
+import nltk
+
+
+class ParsedMessage:
+    """Message prétraité une seule fois et partagé par la classification et la recherche de cours"""
+
+    __slots__ = ('raw', 'text', 'words', 'tokens', 'lemmas', 'search_terms', 'course_keywords', 'mentions_course')
+
+    def __init__(self, raw, text, words, tokens, lemmas, search_terms, course_keywords=(), mentions_course=False):
+        self.raw = raw                    # Message tel que reçu
+        self.text = text                  # Minuscules, abréviations remplacées
+        self.words = words                # Mots de text séparés par les espaces
+        self.tokens = tokens              # Tokens NLTK de text
+        self.lemmas = lemmas              # Lemmes des tokens (entrée du classifieur)
+        self.search_terms = search_terms  # Lemmes sans mots non pertinents (entrée de la recherche de cours)
+        self.course_keywords = course_keywords  # Mots-clés de cours reconnus (html, python, ...)
+        self.mentions_course = mentions_course  # Le message contient le mot « cours »
+
+    def __repr__(self):
+        return f"ParsedMessage({self.raw!r})"
+
+
+class MessagePreprocessor:
+    """Normalise, découpe et lemmatise les messages en une seule passe"""
+
+    def __init__(self, routing, lemmatizer, stop_words, lemma_cache_size=100000, metrics=None, lemmatize=None):
+        # Table de routage compilée (abréviations et mots-clés de cours)
+        self.routing = routing
+        self.stop_words = stop_words
+        # Chronométrage optionnel des étapes (ChatbotMetrics)
+        self.metrics = metrics
+        # Table de mémoïsation du lemmatiseur, appelé pour chaque token de chaque message (ou celle
+        # d'un autre préprocesseur, passée dans lemmatize, pour partager les lemmes déjà calculés)
+        self.lemmatize = lemmatize or lru_cache(maxsize=lemma_cache_size)(lemmatizer.lemmatize)
+
+    def expand_abbreviations(self, sentence):
+        """Remplace les abréviations par leurs formes complètes"""
+        return self.routing.expand(sentence)
+
+    def normalize(self, sentence):
+        """Met le message en minuscules et remplace les abréviations"""
+        return self.expand_abbreviations(sentence.lower().strip())
+
+    def search_terms(self, text):
+        """Découpe un texte en termes lemmatisés, sans les mots non pertinents pour la recherche"""
+        lemmatize = self.lemmatize
+        return [lemmatize(term) for term in re.findall(r"\w+", text.lower()) if term not in self.stop_words]
+
+    def parse(self, message):
+        """Calcule en une fois toutes les formes du message utilisées par le chatbot"""
+        metrics = self.metrics
+        start = time.perf_counter()
+        text = self.normalize(message)
+        words = text.split()
+        course_keywords, mentions_course = self.routing.course_matches(words)
+        normalized = time.perf_counter()
+
+        tokens = nltk.word_tokenize(text)
+        lemmatize = self.lemmatize
+        parsed = ParsedMessage(
+            raw=message,
+            text=text,
+            words=words,
+            tokens=tokens,
+            lemmas=[lemmatize(token) for token in tokens],
+            search_terms=self.search_terms(text),
+            course_keywords=course_keywords,
+            mentions_course=mentions_course,
+        )
+        if metrics is not None:
+            metrics.observe('normalize', normalized - start)
+            metrics.observe('tokenize', time.perf_counter() - normalized)
+        return parsed
+
+    def stats(self):
+        info = self.lemmatize.cache_info()
+        return {"lemma_cache_entries": info.currsize, "lemma_cache_hits": info.hits, "lemma_cache_misses": info.misses}
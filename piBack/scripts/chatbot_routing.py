@@ -0,0 +1,113 @@
+class PhraseMatcher:
+    """Reconnaît des expressions d'un ou plusieurs mots en un seul parcours du message
+
+    Les expressions sont rangées dans un trie de mots : le coût d'un parcours dépend de la
+    longueur du message et de l'expression la plus longue, pas du nombre d'expressions.
+    """
+
+    _END = object()
+
+    def __init__(self, phrases=None):
+        self._root = {}
+        self.max_length = 0
+        self.size = 0
+        for phrase, value in (phrases or {}).items():
+            self.add(phrase, value)
+
+    def add(self, phrase, value):
+        words = phrase.lower().split()
+        if not words:
+            return
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        if self._END not in node:
+            self.size += 1
+        node[self._END] = value
+        self.max_length = max(self.max_length, len(words))
+
+    def __len__(self):
+        return self.size
+
+    def _longest_match(self, words, start):
+        """Retourne (fin, valeur) de la plus longue expression commençant à start, ou None"""
+        node = self._root
+        match = None
+        for end in range(start, min(len(words), start + self.max_length)):
+            node = node.get(words[end])
+            if node is None:
+                break
+            if self._END in node:
+                match = (end + 1, node[self._END])
+        return match
+
+    def find(self, words):
+        """Retourne les correspondances (début, fin, valeur) sans chevauchement, de gauche à droite"""
+        matches = []
+        i = 0
+        while i < len(words):
+            match = self._longest_match(words, i)
+            if match is None:
+                i += 1
+                continue
+            end, value = match
+            matches.append((i, end, value))
+            i = end
+        return matches
+
+    def replace(self, words):
+        """Remplace chaque expression reconnue par sa valeur"""
+        result = []
+        i = 0
+        while i < len(words):
+            match = self._longest_match(words, i)
+            if match is None:
+                result.append(words[i])
+                i += 1
+                continue
+            end, value = match
+            result.append(value)
+            i = end
+        return result
+
+
+class RoutingTable:
+    """Table de routage compilée au chargement : abréviations, mots-clés de cours et intentions par tag"""
+
+    # Valeurs associées aux expressions du détecteur de cours
+    COURSE_KEYWORD = 'keyword'
+    COURSE_WORD = 'course'
+
+    def __init__(self, abbreviations, course_keywords, course_words, intents):
+        self.abbreviations = PhraseMatcher(abbreviations)
+
+        course_phrases = {keyword: self.COURSE_KEYWORD for keyword in course_keywords}
+        course_phrases.update({word: self.COURSE_WORD for word in course_words})
+        self.course_matcher = PhraseMatcher(course_phrases)
+
+        self.intents_by_tag = {intent['tag']: intent for intent in intents.get('intents', [])}
+
+    def expand(self, text):
+        """Remplace les abréviations (d'un ou plusieurs mots) par leurs formes complètes"""
+        return ' '.join(self.abbreviations.replace(text.lower().split()))
+
+    def course_matches(self, words):
+        """Retourne les mots-clés de cours trouvés et si le mot « cours » est présent"""
+        keywords = []
+        mentions_course = False
+        for start, end, kind in self.course_matcher.find(words):
+            if kind == self.COURSE_KEYWORD:
+                keywords.append(' '.join(words[start:end]))
+            else:
+                mentions_course = True
+        return keywords, mentions_course
+
+    def intent(self, tag):
+        return self.intents_by_tag.get(tag)
+
+    def stats(self):
+        return {
+            "abbreviations": len(self.abbreviations),
+            "course_phrases": len(self.course_matcher),
+            "intents": len(self.intents_by_tag),
+        }
@@ -0,0 +1,117 @@
+"""Serveur de production du service chatbot
+
+Le modèle, le vocabulaire, les intentions et l'index des cours sont chargés une seule
+fois dans le processus parent, puis N workers sont créés par fork : les poids sont
+partagés en copie sur écriture. Chaque worker est recyclé après un nombre de requêtes.
+Avec --threads, chaque worker traite plusieurs requêtes à la fois (worker gthread de Gunicorn).
+
+Le moteur Keras n'est pas chargé dans le parent : l'environnement d'exécution de TensorFlow (pools
+de threads, sessions) ne survit pas à un fork. Avec --engine=keras, chaque worker charge son propre
+modèle après le fork ; --engine=numpy est recommandé pour partager les poids.
+
+Sans Gunicorn (Windows), le service est servi par le serveur multithread de Flask dans un seul processus.
+
+Usage :
+    python scripts/chatbot_server.py --host=0.0.0.0 --port=5001 --workers=4 --threads=4 --engine=numpy
+"""
+import gc
+import os
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # Windows : Gunicorn n'est pas installé (voir requirements.txt)
+    BaseApplication = None
+
+import chatbot_service
+
+
+if BaseApplication is not None:
+    class ChatbotServer(BaseApplication):
+        """Application Gunicorn servant l'application Flask déjà chargée"""
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def build_arg_parser():
+    """Arguments du service chatbot complétés par ceux du serveur de production"""
+    parser = chatbot_service.build_arg_parser()
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('CHATBOT_WORKERS', 2)),
+                        help='Nombre de workers créés après le chargement du modèle')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('CHATBOT_THREADS', 1)),
+                        help="Threads par worker : les appels bloquants vers l'API se chevauchent au-delà de 1")
+    parser.add_argument('--max-requests', type=int, default=1000,
+                        help='Nombre de requêtes après lequel un worker est recyclé (0 = jamais)')
+    parser.add_argument('--max-requests-jitter', type=int, default=100,
+                        help='Variation aléatoire de --max-requests pour ne pas recycler tous les workers en même temps')
+    parser.add_argument('--timeout', type=int, default=30,
+                        help='Délai en secondes après lequel un worker bloqué est redémarré')
+    return parser
+
+
+def run_without_gunicorn(args):
+    """Un seul processus servi par le serveur multithread de Flask, quand Gunicorn n'est pas disponible"""
+    chatbot_service.server_log.warning("Gunicorn n'est pas installé : un seul processus sans préchargement ni "
+                                       "recyclage des workers (--workers, --max-requests et --timeout ignorés)")
+    chatbot_service.init_predictor(args)
+    chatbot_service.server_log.info("Démarrage du serveur chatbot sur %s:%s", args.host, args.port)
+    chatbot_service.app.run(host=args.host, port=args.port, threaded=True)
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    if BaseApplication is None:
+        run_without_gunicorn(args)
+        return
+
+    # TensorFlow ne supporte pas le fork : le modèle Keras est chargé par chaque worker
+    preload = args.engine != 'keras'
+    if preload:
+        # Charger une seule fois dans le parent ; les threads sont démarrés dans chaque worker
+        predictor = chatbot_service.init_predictor(args, start_background=False)
+        predictor.course_index.refresh()
+        # Ne pas partager les connexions ouvertes par le parent avec les workers
+        predictor.backend.close()
+        # Sortir les objets chargés du ramasse-miettes pour ne pas casser la copie sur écriture
+        gc.freeze()
+    else:
+        chatbot_service.server_log.warning("Moteur keras : le modèle est chargé dans chaque worker après le fork, "
+                                           "sans partage des poids (préférer --engine=numpy)")
+
+    def post_fork(server, worker):
+        if preload:
+            chatbot_service.start_background_tasks(args)
+        else:
+            chatbot_service.init_predictor(args)
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'timeout': args.timeout,
+        'graceful_timeout': args.timeout,
+        'preload_app': True,
+        'post_fork': post_fork,
+    }
+
+    chatbot_service.server_log.info("Démarrage du serveur chatbot de production sur %s:%s avec %d workers de %d threads",
+                                    args.host, args.port, args.workers, args.threads)
+    ChatbotServer(chatbot_service.app, options).run()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        chatbot_service.server_log.exception("Erreur lors du démarrage du serveur: %s", e)
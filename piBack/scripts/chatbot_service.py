@@ -1,46 +1,201 @@
 import os
 import pickle
 import json
+import sys
 import argparse
+import hashlib
+import threading
 import nltk
 import numpy as np
-import tensorflow as tf
 from nltk.stem import WordNetLemmatizer
-from flask import Flask, request, jsonify
-from tensorflow.keras.models import load_model
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from collections import defaultdict
 import time
-import requests
 import random
+from chatbot_features import BagOfWordsEncoder, ExactMatchTable, features_path, load_encoder
+from chatbot_inference import NumpyIntentModel
+from chatbot_bundle import BundleError, bundle_path, load_bundle
+from chatbot_batching import MicroBatcher, QueueFullError
+from chatbot_course_index import CourseIndex
+from chatbot_backend import BackendClient, BackendUnavailableError
+from chatbot_sessions import SESSION_BACKENDS, SessionStore, open_session_store
+from chatbot_cache import LRUCache
+from chatbot_prefetch import PrefetchPool
+from chatbot_models import MB, ModelRegistry, UnknownModelError, parse_locales
+from chatbot_suggest import TitleSuggester
+from chatbot_preprocessing import MessagePreprocessor, ParsedMessage
+from chatbot_routing import RoutingTable
+from chatbot_metrics import ChatbotMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from chatbot_logging import (LEVELS as LOG_LEVELS, configure_logging, get_logger, logging_stats,
+                             parse_sample_rates, start_logging)
 
 app = Flask(__name__)
 CORS(app)  # Active CORS pour toutes les routes
 CORS(app, origins=["http://51.91.251.228:5000", "https://ikramsegni.fr"])
 
+# Loggers par catégorie, chacun avec son propre taux d'échantillonnage (voir --log-sample)
+model_log = get_logger('model')
+courses_log = get_logger('courses')
+search_log = get_logger('search')
+predict_log = get_logger('predict')
+request_log = get_logger('request')
+server_log = get_logger('server')
+
+# URL de l'API Node.js
+API_BASE_URL = os.environ.get('CHATBOT_API_URL', 'http://51.91.251.228:5000')
+
+# Mots non pertinents supprimés des recherches de cours
+SEARCH_STOP_WORDS = {'cours', 'formation', 'de', 'en', 'le', 'la', 'les', 'du', 'des', 'et', 'sur', 'je', 'veux', 'voir', 'accéder', 'aller'}
+
+# Mots-clés de cours utilisés si utils/course_keywords.json est absent ou invalide
+DEFAULT_COURSE_KEYWORDS = ['html', 'css', 'javascript', 'python', 'java', 'react', 'angular', 'nodejs']
+DEFAULT_COURSE_WORDS = ['cours']
+
+# Moteurs d'inférence disponibles : 'keras' (TensorFlow) ou 'numpy' (sans TensorFlow)
+ENGINES = ['keras', 'numpy']
+
+# Chemin du fichier des intentions, chargé avec le modèle
+INTENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intents.json')
+
+def intents_path(model_name):
+    """Intentions d'un modèle : scripts/{model_name}_intents.json s'il existe, sinon intents.json"""
+    path = os.path.join(os.path.dirname(INTENTS_PATH), f'{model_name}_intents.json')
+    return path if os.path.exists(path) else INTENTS_PATH
+
+class ModelState:
+    """Une version du modèle et des fichiers qui l'accompagnent, remplacée d'un bloc lors d'un rechargement"""
+
+    __slots__ = ('words', 'classes', 'model', 'intents', 'encoder', 'routing', 'exact_matches',
+                 'version', 'fingerprint', 'source', 'loaded_at', 'load_duration', '_size')
+
+    def __init__(self, words, classes, model, intents, routing, exact_matches=None, version=None, fingerprint=None,
+                 source=None, encoder=None):
+        self.words = words
+        self.classes = classes
+        self.model = model
+        self.intents = intents
+        # Index mot → colonne construit une seule fois pour l'encodage des sacs de mots, ou n-grammes hachés
+        # si le modèle a été entraîné avec --features=hashed
+        self.encoder = encoder if encoder is not None else BagOfWordsEncoder(words)
+        self.routing = routing
+        # Motifs d'entraînement reconnus sans passer par le modèle
+        self.exact_matches = exact_matches or ExactMatchTable()
+        self.version = version
+        self.fingerprint = fingerprint
+        # 'bundle' (fichier .npz projeté en mémoire) ou 'legacy' (.h5 et .pkl)
+        self.source = source
+        self.loaded_at = time.time()
+        self.load_duration = 0.0
+        self._size = None
+
+    def approx_size(self):
+        """Estimation de la mémoire occupée par cette version, en octets : poids, vocabulaire, index et intentions"""
+        if self._size is None:
+            if hasattr(self.model, 'count_params'):
+                # Modèle Keras : poids en float32
+                size = self.model.count_params() * 4
+            else:
+                size = sum(kernel.nbytes + bias.nbytes for kernel, bias, _ in getattr(self.model, 'layers', []))
+            # Chaque mot est gardé dans la liste et dans l'index de l'encodeur
+            size += 2 * sum(sys.getsizeof(word) for word in self.words) + sys.getsizeof(getattr(self.encoder, 'index', {}))
+            size += sum(sys.getsizeof(tag) for tag in self.classes)
+            size += 2 * len(json.dumps(self.intents, ensure_ascii=False))
+            self._size = size
+        return self._size
+
 class ChatbotPredictor:
-    def __init__(self, model_name='chatbot_model'):
+    # Ressources reprises du prédicteur principal par les autres modèles du processus (voir ModelRegistry)
+    SHARED_RESOURCES = ('lemmatizer', 'api_token', 'metrics', 'backend', 'sessions', 'abbreviations',
+                        'course_keywords', 'course_words', 'prediction_cache', 'suggester', 'course_index', 'prefetcher')
+
+    def __init__(self, model_name='chatbot_model', engine='keras', course_index_ttl=300, backend=None,
+                 session_capacity=10000, session_ttl=1800, prediction_cache_size=2048, prediction_cache_ttl=3600,
+                 metrics=None, prefetch_workers=4, prefetch_max_pending=1000, shared=None, sessions=None):
         # Chemin du dossier des modèles
         self.models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../models')
         self.model_name = model_name
+        self.engine = engine
+
+        if shared is not None:
+            # Autre modèle du même processus : lemmatiseur, tables, client HTTP, sessions, caches et
+            # index des cours sont ceux du prédicteur principal, seuls les fichiers du modèle sont chargés
+            for name in self.SHARED_RESOURCES:
+                setattr(self, name, getattr(shared, name))
+        else:
+            self._init_resources(backend, metrics, sessions, course_index_ttl, session_capacity, session_ttl,
+                                 prediction_cache_size, prediction_cache_ttl, prefetch_workers, prefetch_max_pending)
+
+        # Regroupement des prédictions (désactivé par défaut, voir enable_batching)
+        self.batcher = None
+
+        # Charger les fichiers nécessaires (version active du modèle, remplacée d'un bloc par reload)
+        try:
+            self.state = self._load_state()
+            model_log.info("Modèle chargé avec succès!", extra={'fields': {
+                "engine": engine, "model": model_name, "version": self.state.version
+            }})
+        except Exception as e:
+            if shared is not None:
+                # Un modèle secondaire absent ou invalide est signalé à la requête qui l'a demandé
+                raise
+            model_log.error("Erreur lors du chargement du modèle: %s. "
+                            "Assurez-vous d'avoir entraîné le modèle avant de l'utiliser.", e)
+            intents = {"intents": []}
+            self.state = ModelState([], [], None, intents, self._routing_table(intents))
+
+        # Prétraitement des messages partagé par la classification et la recherche de cours ; les lemmes
+        # mémorisés sont communs à tous les modèles
+        self.preprocessor = MessagePreprocessor(self.state.routing, self.lemmatizer, SEARCH_STOP_WORDS, metrics=self.metrics,
+                                                lemmatize=shared.preprocessor.lemmatize if shared is not None else None)
+
+        # Rechargement à chaud du modèle (voir reload et check_artifacts)
+        self._reload_lock = threading.Lock()
+        self.reloads = 0
+        self.last_reload_error = None
+        self._pending_fingerprint = None
+
+        # Messages identiques à un motif d'entraînement, servis sans le modèle
+        self.exact_match_hits = 0
+        self._stats_lock = threading.Lock()
+        self._failed_fingerprint = None
+
+    def _init_resources(self, backend, metrics, sessions, course_index_ttl, session_capacity, session_ttl,
+                        prediction_cache_size, prediction_cache_ttl, prefetch_workers, prefetch_max_pending):
+        """Crée les ressources du prédicteur principal, partagées ensuite avec les autres modèles"""
         self.lemmatizer = WordNetLemmatizer()
 
-        # Initialiser l'API token
-        self.api_token = None
+        # Token de service pour le catalogue partagé (jamais le token d'un utilisateur, voir predict)
+        self.api_token = os.environ.get('CHATBOT_API_TOKEN') or None
+
+        # Latences par étape et compteurs exposés sur /metrics
+        self.metrics = metrics or ChatbotMetrics()
 
-        # Historique des conversations par utilisateur
-        self.conversation_history = defaultdict(list)
-        self.response_history = defaultdict(list)  # Historique des réponses par utilisateur
-        self.last_responses = defaultdict(str)    # Dernière réponse par utilisateur
+        # Client HTTP partagé vers l'API Node.js
+        self.backend = backend or BackendClient(API_BASE_URL, metrics=self.metrics)
+
+        # Sessions par utilisateur (historique des conversations, réponses récentes, cache des cours) ;
+        # en mémoire par défaut, ou partagées entre processus (voir open_session_store)
+        self.sessions = sessions if sessions is not None else SessionStore(capacity=session_capacity, idle_ttl=session_ttl)
 
         # Charger les abréviations
         try:
             with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils/abbreviations.json'), 'r', encoding='utf-8') as f:
                 self.abbreviations = json.load(f)['abbreviations']
         except Exception as e:
-            print(f"Erreur lors du chargement des abréviations: {e}")
+            model_log.error("Erreur lors du chargement des abréviations: %s", e)
             self.abbreviations = {}
 
+        # Charger les mots-clés qui déclenchent la recherche de cours
+        try:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils/course_keywords.json'), 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            self.course_keywords = config['course_keywords']
+            self.course_words = config.get('course_words', DEFAULT_COURSE_WORDS)
+        except Exception as e:
+            model_log.error("Erreur lors du chargement des mots-clés de cours: %s", e)
+            self.course_keywords = DEFAULT_COURSE_KEYWORDS
+            self.course_words = DEFAULT_COURSE_WORDS
+
         # Télécharger les ressources NLTK nécessaires
         try:
             nltk.data.find('tokenizers/punkt')
@@ -49,74 +204,337 @@ class ChatbotPredictor:
             nltk.download('punkt')
             nltk.download('wordnet')
 
-        # Charger les fichiers nécessaires
+        # Cache des prédictions ; les clés contiennent la version du modèle
+        self.prediction_cache = LRUCache(capacity=prediction_cache_size, ttl=prediction_cache_ttl)
+
+        # Autocomplétion des titres, mise à jour à chaque rafraîchissement de l'index des cours
+        self.suggester = TitleSuggester()
+
+        # Index des cours en mémoire, rafraîchi en arrière-plan (voir init_predictor)
+        self.course_index = CourseIndex(self._fetch_courses, self._fetch_module, self._analyze, ttl=course_index_ttl,
+                                        on_refresh=self.suggester.sync)
+
+        # Préchargement des cours de l'utilisateur à la connexion (voir prefetch_user)
+        self.prefetcher = PrefetchPool(self.prefetch_user, workers=prefetch_workers, max_pending=prefetch_max_pending)
+
+    # Accès à la version active du modèle
+    words = property(lambda self: self.state.words)
+    classes = property(lambda self: self.state.classes)
+    model = property(lambda self: self.state.model)
+    intents = property(lambda self: self.state.intents)
+    encoder = property(lambda self: self.state.encoder)
+    routing = property(lambda self: self.state.routing)
+
+    def _routing_table(self, intents):
+        """Table de routage compilée une seule fois : abréviations, mots-clés de cours et intentions par tag"""
+        return RoutingTable(self.abbreviations, self.course_keywords, self.course_words, intents)
+
+    def _artifact_paths(self):
+        """Fichiers du modèle : .h5, vocabulaire, classes, intentions, bundle, correspondances exactes et encodeur"""
+        paths = [os.path.join(self.models_dir, f'{self.model_name}{suffix}') for suffix in ('.h5', '_words.pkl', '_classes.pkl')]
+        return paths + [intents_path(self.model_name), bundle_path(self.models_dir, self.model_name), self._exact_matches_path(),
+                        features_path(self.models_dir, self.model_name)]
+
+    def has_model(self, model_name):
+        """Indique si les fichiers d'un modèle (.h5 ou bundle) existent dans le dossier des modèles"""
+        return (os.path.exists(os.path.join(self.models_dir, f'{model_name}.h5'))
+                or os.path.exists(bundle_path(self.models_dir, model_name)))
+
+    def _exact_matches_path(self):
+        return os.path.join(self.models_dir, f'{self.model_name}_exact_matches.json')
+
+    def _load_exact_matches(self, intents, classes):
+        """Charge la table écrite par train_model.py, ou la reconstruit à partir de intents.json si elle est absente"""
+        path = self._exact_matches_path()
         try:
-            self.words = pickle.load(open(os.path.join(self.models_dir, f'{model_name}_words.pkl'), 'rb'))
-            self.classes = pickle.load(open(os.path.join(self.models_dir, f'{model_name}_classes.pkl'), 'rb'))
-            self.model = load_model(os.path.join(self.models_dir, f'{model_name}.h5'))
+            table = ExactMatchTable.load(path)
+        except FileNotFoundError:
+            table = None
+        except (OSError, ValueError, KeyError) as e:
+            model_log.warning("Table de correspondances exactes illisible (%s), reconstruction depuis intents.json", e)
+            table = None
+        if table is None:
+            # Même découpage que train_model.py : motif en minuscules, tokens NLTK lemmatisés
+            documents = [([self.lemmatizer.lemmatize(word) for word in nltk.word_tokenize(pattern.lower())], intent['tag'])
+                         for intent in intents.get('intents', []) for pattern in intent.get('patterns', [])]
+            table = ExactMatchTable.from_documents(documents)
+        return table.restrict(classes)
+
+    def _load_bundle(self):
+        """Charge le bundle projeté en mémoire ; retourne None s'il est absent, périmé ou invalide"""
+        path = bundle_path(self.models_dir, self.model_name)
+        if self.engine != 'numpy' or not os.path.exists(path):
+            return None
+
+        # Un .h5 plus récent que le bundle vient d'un entraînement qui n'a pas écrit de bundle
+        model_path = os.path.join(self.models_dir, f'{self.model_name}.h5')
+        if os.path.exists(model_path) and os.path.getmtime(model_path) > os.path.getmtime(path):
+            model_log.warning("Bundle plus ancien que %s, chargement des fichiers séparés", model_path)
+            return None
 
-            # Charger les intentions
-            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intents.json'), 'r', encoding='utf-8') as f:
-                self.intents = json.load(f)
+        try:
+            words, classes, layers, content_hash = load_bundle(path)
+        except BundleError as e:
+            model_log.error("%s ; chargement des fichiers séparés", e)
+            return None
+        return words, classes, NumpyIntentModel(layers), content_hash
+
+    def _load_legacy(self):
+        """Charge les fichiers séparés : vocabulaire et classes en pickle, modèle en HDF5"""
+        model_path, words_path, classes_path = self._artifact_paths()[:3]
+
+        digest = hashlib.sha256()
+        for path in (model_path, words_path, classes_path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+
+        with open(words_path, 'rb') as f:
+            words = pickle.load(f)
+        with open(classes_path, 'rb') as f:
+            classes = pickle.load(f)
+        return words, classes, self._load_model(model_path), digest.hexdigest()
+
+    def _load_state(self):
+        """Charge les fichiers du modèle et vérifie leur cohérence ; lève une exception en cas d'échec"""
+        start = time.perf_counter()
+        fingerprint = self._artifacts_fingerprint()
+
+        source = 'bundle'
+        loaded = self._load_bundle()
+        if loaded is None:
+            source = 'legacy'
+            loaded = self._load_legacy()
+        words, classes, model, content_hash = loaded
+
+        with open(intents_path(self.model_name), 'rb') as f:
+            intents_data = f.read()
+        intents = json.loads(intents_data.decode('utf-8'))
+        encoder = load_encoder(features_path(self.models_dir, self.model_name), words)
+        encoder_config = json.dumps(encoder.config(), sort_keys=True).encode('utf-8')
+        version = hashlib.sha256(content_hash.encode('ascii') + intents_data + encoder_config).hexdigest()[:12]
+
+        # Les fichiers sont écrits l'un après l'autre par train_model.py : refuser un mélange de deux versions
+        input_dim = getattr(model, 'input_dim', None) or model.input_shape[-1]
+        output_dim = getattr(model, 'output_dim', None) or model.output_shape[-1]
+        if (input_dim, output_dim) != (len(encoder), len(classes)):
+            raise ValueError(f"Fichiers du modèle incohérents: modèle {input_dim}→{output_dim}, "
+                             f"{len(encoder)} colonnes ({encoder.config()['type']}), {len(classes)} classes")
+
+        state = ModelState(words, classes, model, intents, self._routing_table(intents),
+                           exact_matches=self._load_exact_matches(intents, classes),
+                           version=version, fingerprint=fingerprint, source=source, encoder=encoder)
+        state.load_duration = time.perf_counter() - start
+        return state
+
+    def _warm_up(self, state):
+        """Fait passer quelques motifs de intents.json dans le nouveau modèle avant sa mise en service"""
+        patterns = [pattern for intent in state.intents.get('intents', []) for pattern in intent.get('patterns', [])[:1]]
+        sentences_words = [self.preprocessor.parse(pattern).lemmas for pattern in patterns[:32]] or [[]]
+        self._predict_words_batch(sentences_words, [0.25] * len(sentences_words), state)
+
+    def reload(self):
+        """Charge et préchauffe les nouveaux fichiers du modèle puis les met en service d'un bloc
+
+        Les requêtes en cours terminent avec l'ancienne version. En cas d'échec, l'ancienne version reste active.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                state = self._load_state()
+                self._warm_up(state)
+            except Exception as e:
+                self.last_reload_error = str(e)
+                self._failed_fingerprint = self._artifacts_fingerprint()
+                model_log.exception("Erreur lors du rechargement du modèle: %s", e)
+                return False
+            state.load_duration = time.perf_counter() - start
+
+            previous = self.state.version
+            self.state = state
+            self.preprocessor.routing = state.routing
+            self.reloads += 1
+            self.last_reload_error = None
+            self._failed_fingerprint = None
+            # Les prédictions de l'ancienne version ne seront plus jamais lues ; le cache est partagé avec les
+            # autres modèles du processus, seules les entrées de cette version sont supprimées
+            invalidated = 0
+            if previous != state.version:
+                invalidated = self.prediction_cache.invalidate(lambda key: key[0] == previous)
+            model_log.info("Modèle rechargé: version %s en %.0f ms", state.version, state.load_duration * 1000,
+                           extra={'fields': {"previous_version": previous, "invalidated_predictions": invalidated}})
+            return True
+
+    def reload_async(self):
+        """Lance reload dans un thread ; retourne False si un rechargement est déjà en cours"""
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name='chatbot-model-reload', daemon=True).start()
+        return True
+
+    def check_artifacts(self):
+        """Recharge le modèle si ses fichiers ont changé puis n'ont plus changé depuis l'appel précédent
+
+        Appelée périodiquement par ModelRegistry.start_model_watch ; retourne True si un rechargement a eu lieu.
+        """
+        fingerprint = self._artifacts_fingerprint()
+        if fingerprint in (self.state.fingerprint, self._failed_fingerprint):
+            self._pending_fingerprint = None
+            return False
+        # Attendre que les fichiers ne changent plus avant de les charger
+        if fingerprint != self._pending_fingerprint:
+            self._pending_fingerprint = fingerprint
+            return False
+        self._pending_fingerprint = None
+        model_log.info("Les fichiers du modèle %s ont changé, rechargement", self.model_name)
+        return self.reload()
+
+    def model_stats(self):
+        state = self.state
+        return {
+            "version": state.version,
+            "source": state.source,
+            "features": state.encoder.config(),
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(state.loaded_at)),
+            "load_duration_ms": round(state.load_duration * 1000, 1),
+            "reloads": self.reloads,
+            "reloading": self._reload_lock.locked(),
+            "last_reload_error": self.last_reload_error,
+            "exact_match": {"patterns": len(state.exact_matches), "hits": self.exact_match_hits},
+        }
 
-            print("Modèle chargé avec succès!")
-        except Exception as e:
-            print(f"Erreur lors du chargement du modèle: {e}")
-            print("Assurez-vous d'avoir entraîné le modèle avant de l'utiliser.")
-            self.words = []
-            self.classes = []
-            self.model = None
-            self.intents = {"intents": []}
+    def _load_model(self, path):
+        """Charge le modèle avec le moteur d'inférence choisi"""
+        if self.engine == 'numpy':
+            # Les poids sont extraits une seule fois du fichier HDF5, TensorFlow n'est jamais importé
+            return NumpyIntentModel.from_h5(path)
 
-        # Ajouter un cache pour les cours
-        self.user_courses_cache = {}
-        self.course_search_state = defaultdict(lambda: {"searching": False, "last_query": None})
+        from tensorflow.keras.models import load_model
+        return load_model(path)
 
     def set_api_token(self, token):
-        """Définir le token API pour les requêtes"""
+        """Définit le token de service utilisé pour le catalogue des cours et les modules, partagés par tous les utilisateurs"""
         self.api_token = token
 
     def _expand_abbreviations(self, sentence):
         """Remplace les abréviations par leurs formes complètes"""
-        words = sentence.lower().split()
-        expanded_words = [self.abbreviations.get(word, word) for word in words]
-        return ' '.join(expanded_words)
+        return self.preprocessor.expand_abbreviations(sentence)
 
     def _normalize_input(self, sentence):
         """Normalise l'entrée en remplaçant les abréviations et en la mettant en minuscules"""
-        expanded = self._expand_abbreviations(sentence.lower().strip())
-        return expanded
+        return self.preprocessor.normalize(sentence)
+
+    def _parse(self, message):
+        """Retourne le message prétraité, en le calculant s'il ne l'a pas encore été"""
+        if isinstance(message, ParsedMessage):
+            return message
+        return self.preprocessor.parse(message)
 
     def _clean_up_sentence(self, sentence):
         """Tokenize et lemmatize une phrase"""
-        # Expander les abréviations avant le traitement
-        expanded_sentence = self._expand_abbreviations(sentence)
-        sentence_words = nltk.word_tokenize(expanded_sentence.lower())
-        sentence_words = [self.lemmatizer.lemmatize(word) for word in sentence_words]
-        return sentence_words
+        return self._parse(sentence).lemmas
 
     def _bag_of_words(self, sentence):
         """Crée un sac de mots à partir d'une phrase"""
         sentence_words = self._clean_up_sentence(sentence)
-        bag = [0] * len(self.words)
-        for w in sentence_words:
-            for i, word in enumerate(self.words):
-                if word == w:
-                    bag[i] = 1
-        return np.array(bag)
-
-    def predict_class(self, sentence, error_threshold=0.25):
-        """Prédit la classe d'intention à partir d'une phrase"""
-        if not self.model:
-            return [{"intent": "error", "probability": 1.0}]
+        return self.encoder.encode(sentence_words)
+
+    def predict_class(self, sentence, error_threshold=0.25, state=None):
+        """Prédit la classe d'intention à partir d'une phrase (state : version du modèle lue par la requête)"""
+        state = state or self.state
+        sentence_words = self._clean_up_sentence(sentence)
+        exact = self._exact_match(sentence_words, state)
+        if exact is not None:
+            return exact
+
+        key = self._cache_key(sentence_words, error_threshold, state)
+        cached = self.prediction_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Avec le regroupement activé, la prédiction est faite dans un lot partagé
+        if self.batcher is not None:
+            result = self.batcher.submit((sentence_words, error_threshold, state))
+        else:
+            result = self._predict_words_batch([sentence_words], [error_threshold], state)[0]
+
+        self.prediction_cache.put(key, result)
+        return result
+
+    def predict_class_batch(self, sentences, error_threshold=0.25, state=None):
+        """Prédit les classes d'intention de plusieurs phrases avec une seule passe du modèle"""
+        state = state or self.state
+        if isinstance(error_threshold, (list, tuple)):
+            thresholds = error_threshold
+        else:
+            thresholds = [error_threshold] * len(sentences)
+
+        sentences_words = [self._clean_up_sentence(sentence) for sentence in sentences]
+        keys = [self._cache_key(words, threshold, state) for words, threshold in zip(sentences_words, thresholds)]
+        results = [self._exact_match(words, state) for words in sentences_words]
+        results = [result if result is not None else self.prediction_cache.get(key) for result, key in zip(results, keys)]
+
+        # Seules les phrases absentes de la table des motifs et du cache passent par le modèle
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            predicted = self._predict_words_batch([sentences_words[i] for i in missing], [thresholds[i] for i in missing],
+                                                  state)
+            for i, result in zip(missing, predicted):
+                results[i] = result
+                self.prediction_cache.put(keys[i], result)
+
+        return results
+
+    def _exact_match(self, sentence_words, state):
+        """Intention d'un message identique (après normalisation) à un motif d'entraînement, sinon None"""
+        tag = state.exact_matches.get(sentence_words)
+        if tag is None:
+            return None
+        with self._stats_lock:
+            self.exact_match_hits += 1
+        return [{"intent": tag, "probability": 1.0}]
+
+    def _cache_key(self, sentence_words, error_threshold, state):
+        """Clé canonique d'une phrase : version du modèle et colonnes à 1 de son encodage (entrée exacte du modèle)"""
+        return state.version, tuple(state.encoder.columns(sentence_words)), error_threshold
+
+    def _artifacts_fingerprint(self):
+        """Date de modification et taille des fichiers du modèle"""
+        fingerprint = []
+        for path in self._artifact_paths():
+            try:
+                stat = os.stat(path)
+                fingerprint.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                fingerprint.append(None)
+        return tuple(fingerprint)
+
+    def _predict_words_batch(self, sentences_words, thresholds, state=None):
+        """Calcule les intentions de phrases déjà lemmatisées avec une seule passe du modèle"""
+        # Une seule version du modèle pour tout le lot, même si un rechargement a lieu pendant le calcul
+        state = state or self.state
+        if not state.model:
+            return [[{"intent": "error", "probability": 1.0}] for _ in sentences_words]
+
+        # Si le sac de mots est vide (aucun mot reconnu), l'intention est inconnue
+        results = [[{"intent": "unknown", "probability": 1.0}] for _ in sentences_words]
+
+        with self.metrics.time('bag_of_words'):
+            bows = state.encoder.encode_batch(sentences_words)
+            known = np.flatnonzero(bows.any(axis=1))
+        if len(known) == 0:
+            return results
 
         # Génère les probabilités à partir du modèle
-        bow = self._bag_of_words(sentence)
-        if not any(bow):  # Si le sac de mots est vide (aucun mot reconnu)
-            return [{"intent": "unknown", "probability": 1.0}]
+        with self.metrics.time('model'):
+            probabilities = state.model.predict(bows[known])
+        for row, res in zip(known, probabilities):
+            results[row] = self._filter_predictions(res, thresholds[row], state.classes)
 
-        res = self.model.predict(np.array([bow]))[0]
+        return results
 
+    def _filter_predictions(self, res, error_threshold, classes=None):
+        """Filtre et trie les probabilités d'une phrase"""
+        classes = classes if classes is not None else self.classes
         # Filtre les prédictions en dessous du seuil d'erreur
         results = [[i, r] for i, r in enumerate(res) if r > error_threshold]
 
@@ -125,171 +543,181 @@ class ChatbotPredictor:
 
         return_list = []
         for r in results:
-            return_list.append({"intent": self.classes[r[0]], "probability": float(r[1])})
+            return_list.append({"intent": classes[r[0]], "probability": float(r[1])})
 
         return return_list
 
-    def _get_user_courses(self, user_id):
-        """Récupère les cours de l'utilisateur depuis la base de données"""
+    def _predict_batched(self, items):
+        """Calcule un lot du regroupement : chaque phrase avec la version du modèle lue par sa requête"""
+        # Un rechargement pendant le regroupement peut mêler deux versions dans le même lot
+        groups = {}
+        for i, (_, _, state) in enumerate(items):
+            groups.setdefault(id(state), (state, []))[1].append(i)
+        results = [None] * len(items)
+        for state, indexes in groups.values():
+            predicted = self._predict_words_batch([items[i][0] for i in indexes], [items[i][1] for i in indexes], state)
+            for i, result in zip(indexes, predicted):
+                results[i] = result
+        return results
+
+    def enable_batching(self, window_ms=5, max_batch_size=32, max_queue_size=256):
+        """Active le regroupement des prédictions concurrentes en lots"""
+        self.batcher = MicroBatcher(
+            self._predict_batched,
+            window_ms=window_ms,
+            max_batch_size=max_batch_size,
+            max_queue_size=max_queue_size
+        )
+
+    @staticmethod
+    def courses_key(token):
+        """Clé de session des cours suivis : empreinte du token qui sert à les récupérer
+
+        Les cours appartiennent à l'utilisateur authentifié par le token, jamais au userId envoyé par le client,
+        qui pourrait désigner un autre utilisateur.
+        """
+        return 'token:' + hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _get_user_courses(self, token):
+        """Récupère depuis l'API les cours suivis par l'utilisateur authentifié par le token"""
+        if not token:
+            return []
         # Si les cours sont en cache et récents (moins de 5 minutes)
-        if user_id in self.user_courses_cache:
-            cache_time, courses = self.user_courses_cache[user_id]
-            if (time.time() - cache_time) < 300:  # 5 minutes
-                return courses
+        session = self.sessions.get(self.courses_key(token))
+        with session.lock:
+            if session.courses is not None and (time.time() - session.courses_time) < 300:  # 5 minutes
+                return session.courses
 
         try:
-            # Faire la requête à l'API des cours
-            response = requests.get(
-                f"http://51.91.251.228:5000/api/courses/user/{user_id}",
-                headers={"Authorization": f"Bearer {self.api_token}"}
-            )
+            # Faire la requête à l'API des cours (l'utilisateur est identifié par son token)
+            response = self.backend.get("/api/courses/purchased", token)
             if response.status_code == 200:
-                courses = response.json().get('data', [])
-                # Mettre en cache
-                self.user_courses_cache[user_id] = (time.time(), courses)
-                return courses
+                return self.store_user_courses(token, response.json())
         except Exception as e:
-            print(f"Erreur lors de la récupération des cours: {e}")
+            courses_log.warning("Erreur lors de la récupération des cours: %s", e)
         return []
 
-    def _search_course(self, query, user_courses=None):
-        """Recherche un cours spécifique dans la base de données"""
+    def has_user_courses(self, token):
+        """Indique si les cours suivis par l'utilisateur du token sont en cache et récents"""
+        session = self.sessions.get(self.courses_key(token))
+        with session.lock:
+            return session.courses is not None and (time.time() - session.courses_time) < 300
+
+    def store_user_courses(self, token, data):
+        """Met en cache la réponse de /api/courses/purchased (liste ou {"data": [...]}) et retourne les cours
+
+        data doit avoir été obtenu avec token : le cache est rangé sous l'empreinte de ce token.
+        """
+        courses = data.get('data', []) if isinstance(data, dict) else data
+        course_view = frozenset(str(course['_id']) for course in courses if isinstance(course, dict) and course.get('_id'))
+        session = self.sessions.get(self.courses_key(token))
+        with session.lock:
+            session.courses_time = time.time()
+            session.courses = courses
+            session.course_view = course_view
+        return courses
+
+    def prefetch_user(self, key, token):
+        """Précharge les cours suivis par l'utilisateur du token et l'index des cours avant son premier message"""
+        self._get_user_courses(token)
+        self.course_index.ensure_loaded()
+
+    def _course_view(self, token=None):
+        """Identifiants des cours suivis par l'utilisateur authentifié par le token de la requête
+
+        Sans token, aucun : le userId du message ne suffit pas à identifier l'utilisateur. Un utilisateur qui
+        n'a pas été préchargé voit ses cours récupérés au premier message qui en a besoin.
+        """
+        if not token:
+            return None
+        session = self.sessions.get(self.courses_key(token))
+        with session.lock:
+            course_view = session.course_view
+        if course_view is None:
+            self._get_user_courses(token)
+            with session.lock:
+                course_view = session.course_view
+        return course_view
+
+    def _analyze(self, text):
+        """Découpe un texte en termes lemmatisés, sans les mots non pertinents pour la recherche"""
+        return self.preprocessor.search_terms(text)
+
+    def _fetch_courses(self):
+        """Récupère le catalogue complet des cours depuis l'API"""
+        response = self.backend.get("/api/courses", self.api_token)
+        if response.status_code != 200:
+            raise RuntimeError(f"Erreur API: {response.status_code}")
+        return self.parse_courses(response.json())
+
+    @staticmethod
+    def parse_courses(response_data):
+        """Extrait la liste des cours d'une réponse de /api/courses"""
+        # Traiter la réponse selon sa structure
+        if isinstance(response_data, list):
+            return response_data
+        if isinstance(response_data, dict) and 'data' in response_data:
+            data = response_data['data']
+            return data if isinstance(data, list) else [data]
+        return [response_data]
+
+    def _fetch_module(self, module_id):
+        """Récupère un module depuis l'API (utilisé pour retrouver la catégorie d'un cours)"""
         try:
-            # Nettoyer et préparer la requête
-            query = query.lower().strip()
-            query_terms = query.split()
-            # Supprimer les mots non pertinents
-            stop_words = ['cours', 'formation', 'de', 'en', 'le', 'la', 'les', 'du', 'des', 'et', 'sur', 'je', 'veux', 'voir', 'accéder', 'aller']
-            query_terms = [term for term in query_terms if term not in stop_words]
+            response = self.backend.get(f"/api/modules/{module_id}", self.api_token, endpoint="/api/modules/{id}")
+            if response.status_code == 200:
+                return response.json()
+        except (BackendUnavailableError, ValueError) as e:
+            courses_log.warning("Erreur lors de la récupération des données du module: %s", e)
+        return None
 
-            print(f"Termes de recherche après nettoyage: {query_terms}")
+    def _search_course(self, query, user_courses=None):
+        """Recherche un cours spécifique dans l'index des cours, en favorisant les cours suivis (user_courses)"""
+        with self.metrics.time('course_search'):
+            return self._search_course_index(query, user_courses)
 
-            try:
-                # Récupérer tous les cours depuis l'API
-                response = requests.get(
-                    "http://51.91.251.228:5000/api/courses",
-                    headers={
-                        "Authorization": f"Bearer {self.api_token}",
-                        "Content-Type": "application/json"
-                    }
-                )
-
-                print(f"Réponse API brute: {response.text}")  # Debug
-
-                if response.status_code == 200:
-                    try:
-                        response_data = response.json()
-                        courses = []
-
-                        # Traiter la réponse selon sa structure
-                        if isinstance(response_data, list):
-                            courses = response_data
-                        elif isinstance(response_data, dict):
-                            if 'data' in response_data:
-                                if isinstance(response_data['data'], list):
-                                    courses = response_data['data']
-                                else:
-                                    courses = [response_data['data']]
-                            else:
-                                courses = [response_data]
-
-                        print(f"Nombre de cours trouvés: {len(courses)}")
-                        print(f"Structure des cours: {courses[:1]}")  # Debug
-
-                        # Rechercher le meilleur match
-                        best_match = None
-                        highest_score = 0
-
-                        for course in courses:
-                            if not isinstance(course, dict):
-                                print(f"Course invalide: {course}")
-                                continue
-
-                            # Calculer un score de correspondance
-                            score = 0
-                            course_title = str(course.get('title', '')).lower()
-                            course_description = str(course.get('description', '')).lower()
-
-                            # Vérifier chaque terme de recherche
-                            for term in query_terms:
-                                if term in course_title:
-                                    score += 2  # Score plus élevé pour les correspondances dans le titre
-                                if term in course_description:
-                                    score += 1
-
-                            # Mettre à jour le meilleur match si nécessaire
-                            if score > highest_score:
-                                highest_score = score
-                                best_match = course
-
-                        if best_match and highest_score > 0:
-                            print(f"Meilleur cours trouvé: {best_match.get('title')} (score: {highest_score})")
-
-                            # Extraire les IDs de catégorie et de module
-                            module_id = best_match.get('module', {}).get('_id')
-                            category_id = best_match.get('category', {}).get('_id')
-
-                            # Si l'ID de catégorie n'est pas directement dans le cours, le récupérer depuis le module
-                            if not category_id and module_id:
-                                try:
-                                    module_response = requests.get(
-                                        f"http://51.91.251.228:5000/api/modules/{module_id}",
-                                        headers={
-                                            "Authorization": f"Bearer {self.api_token}",
-                                            "Content-Type": "application/json"
-                                        }
-                                    )
-                                    if module_response.status_code == 200:
-                                        module_data = module_response.json()
-                                        category_id = module_data.get('category', {}).get('_id')
-                                except Exception as e:
-                                    print(f"Erreur lors de la récupération des données du module: {e}")
-
-                            print(f"IDs extraits - Category: {category_id}, Module: {module_id}")
-
-                            return {
-                                "found": True,
-                                "course": best_match,
-                                "action": "redirect_course",
-                                "shouldRedirect": True,
-                                "response": f"J'ai trouvé le cours '{best_match.get('title')}'. Je vous y emmène !",
-                                "redirect_data": {
-                                    "courseId": best_match.get('_id'),
-                                    "title": best_match.get('title'),
-                                    "categoryId": category_id,
-                                    "moduleId": module_id
-                                }
-                            }
-                        else:
-                            print("Aucun cours correspondant trouvé")
-                            return {
-                                "found": False,
-                                "response": "Désolé, je n'ai pas trouvé de cours correspondant à votre recherche."
-                            }
-                    except json.JSONDecodeError as e:
-                        print(f"Erreur de décodage JSON: {e}")
-                        return {
-                            "found": False,
-                            "response": "Désolé, il y a eu une erreur lors de la lecture des cours."
-                        }
-                else:
-                    print(f"Erreur API: {response.status_code}")
-                    return {
-                        "found": False,
-                        "response": "Désolé, je n'arrive pas à accéder aux cours pour le moment."
-                    }
+    def _search_course_index(self, query, user_courses=None):
+        """Cherche le meilleur cours de l'index pour les termes de la requête"""
+        try:
+            query_terms = self._parse(query).search_terms
+            search_log.debug("Termes de recherche après nettoyage: %s", query_terms)
 
-            except requests.exceptions.RequestException as e:
-                print(f"Erreur de requête: {e}")
+            if not self.course_index.ensure_loaded():
                 return {
                     "found": False,
                     "response": "Désolé, je n'arrive pas à accéder aux cours pour le moment."
                 }
 
+            matches = self.course_index.search(query_terms, preferred=user_courses)
+            if not matches:
+                search_log.info("Aucun cours correspondant trouvé", extra={'fields': {"terms": query_terms}})
+                return {
+                    "found": False,
+                    "response": "Désolé, je n'ai pas trouvé de cours correspondant à votre recherche."
+                }
+
+            entry, score = matches[0]
+            search_log.info("Meilleur cours trouvé: %s", entry['title'], extra={'fields': {
+                "terms": query_terms, "score": round(score, 2),
+                "category_id": entry['category_id'], "module_id": entry['module_id']
+            }})
+
+            return {
+                "found": True,
+                "course": entry["course"],
+                "action": "redirect_course",
+                "shouldRedirect": True,
+                "response": f"J'ai trouvé le cours '{entry['title']}'. Je vous y emmène !",
+                "redirect_data": {
+                    "courseId": entry["course_id"],
+                    "title": entry["title"],
+                    "categoryId": entry["category_id"],
+                    "moduleId": entry["module_id"]
+                }
+            }
+
         except Exception as e:
-            print(f"Erreur lors de la recherche de cours: {e}")
-            import traceback
-            print(traceback.format_exc())
+            search_log.exception("Erreur lors de la recherche de cours: %s", e)
             return {
                 "found": False,
                 "response": "Une erreur s'est produite lors de la recherche du cours."
@@ -297,111 +725,119 @@ class ChatbotPredictor:
 
     def _get_unique_response(self, responses, user_id):
         """Retourne une réponse unique qui n'a pas été utilisée récemment"""
+        with self.metrics.time('response_selection'):
+            return self._select_response(responses, user_id)
+
+    def _select_response(self, responses, user_id):
+        """Choisit une réponse au hasard en évitant la dernière envoyée à l'utilisateur"""
         if not responses:
             return "Je ne suis pas sûr de comprendre. Pouvez-vous reformuler ?"
 
-        # Filtrer les réponses qui n'ont pas été utilisées récemment
-        available_responses = [r for r in responses if r != self.last_responses[user_id]]
+        session = self.sessions.get(user_id)
 
-        if not available_responses:
-            # Si toutes les réponses ont été utilisées, réinitialiser l'historique
-            self.response_history[user_id] = []
-            available_responses = responses
+        # Deux requêtes simultanées du même utilisateur ne doivent pas choisir d'après le même historique
+        with session.lock:
+            # Filtrer les réponses qui n'ont pas été utilisées récemment
+            available_responses = [r for r in responses if r != session.last_response]
 
-        # Choisir une réponse aléatoire parmi celles disponibles
-        response = random.choice(available_responses)
+            if not available_responses:
+                # Si toutes les réponses ont été utilisées, réinitialiser l'historique
+                session.response_history.clear()
+                available_responses = responses
 
-        # Mettre à jour l'historique
-        self.last_responses[user_id] = response
-        self.response_history[user_id].append(response)
+            # Choisir une réponse aléatoire parmi celles disponibles
+            response = random.choice(available_responses)
 
-        # Limiter la taille de l'historique à 5 réponses
-        if len(self.response_history[user_id]) > 5:
-            self.response_history[user_id].pop(0)
+            # Mettre à jour l'historique (anneau limité aux 5 dernières réponses)
+            session.last_response = response
+            session.response_history.append(response)
+            # Visible des autres processus si les sessions sont partagées
+            self.sessions.save(user_id, session)
 
         return response
 
-    def get_response(self, message, user_id=None):
-        """Génère une réponse en fonction du message de l'utilisateur"""
-        # Normaliser l'entrée
-        message = self._normalize_input(message)
+    def get_response(self, message, user_id=None, ints=None, search_course=None, token=None, state=None):
+        """Génère une réponse en fonction du message de l'utilisateur (token : celui de sa requête, s'il est connu)
+
+        state est la version du modèle lue une seule fois par la requête : l'intention prédite et la réponse
+        viennent de la même version, même si un rechargement a lieu pendant le traitement.
+        """
+        state = state or self.state
+        # Normaliser l'entrée (une seule fois si le message est déjà prétraité)
+        message = self._parse(message)
+        search_course = search_course or self._search_course
 
-        # Prédire l'intention
-        ints = self.predict_class(message)
+        # Prédire l'intention (déjà fait pour tout le lot dans predict_batch)
+        if ints is None:
+            ints = self.predict_class(message, state=state)
         if not ints:
+            self.metrics.count_outcome('no_prediction')
             return {
                 "response": "Je ne comprends pas votre demande.",
                 "action": None
             }
 
         intent = ints[0]["intent"]
-        print(f"Intention détectée: {intent}")
+        predict_log.debug("Intention détectée: %s", intent)
+        self.metrics.count_intent(intent)
 
         # Si l'intention est de chercher un cours
         if intent in ["search_course", "course_info", "unknown"]:
             # Rechercher le cours
-            search_result = self._search_course(message)
+            search_result = search_course(message, self._course_view(token))
             if search_result["found"]:
+                self.metrics.count_outcome('intent_course_found')
                 return search_result
 
         # Pour les autres intentions, continuer avec le traitement normal
-        for intent_data in self.intents["intents"]:
-            if intent_data["tag"] == intent:
-                response = self._get_unique_response(intent_data["responses"], user_id)
-                return {
-                    "response": response,
-                    "action": intent_data.get("action"),
-                    "data": intent_data.get("data")
-                }
+        intent_data = state.routing.intent(intent)
+        if intent_data is not None:
+            self.metrics.count_outcome('intent_response')
+            response = self._get_unique_response(intent_data["responses"], user_id)
+            return {
+                "response": response,
+                "action": intent_data.get("action"),
+                "data": intent_data.get("data")
+            }
 
+        self.metrics.count_outcome('fallback')
         return {
             "response": "Je ne suis pas sûr de comprendre. Pouvez-vous reformuler ?",
             "action": None
         }
 
-    def predict(self, message, user_id, user_context=None):
-        """Version améliorée de predict avec gestion des cours"""
-        try:
-            normalized_message = self._normalize_input(message)
-            print(f"\nMessage reçu: {message}")
-            print(f"Message normalisé: {normalized_message}")
+    def predict(self, message, user_id, token=None, ints=None, search_course=None, state=None):
+        """Version améliorée de predict avec gestion des cours
 
-            # Vérifier si le message contient des mots-clés de cours
-            course_keywords = ['html', 'css', 'javascript', 'python', 'java', 'react', 'angular', 'nodejs']
-            message_words = normalized_message.lower().split()
-            has_course_keywords = any(keyword in message_words for keyword in course_keywords)
+        Le prédicteur est partagé par tous les threads : les données propres à la requête (utilisateur et
+        token) sont passées en paramètres jusqu'aux appels à l'API et ne sont jamais stockées sur l'instance.
+        Le token identifie l'utilisateur dont les cours suivis personnalisent la recherche de cours ; ils sont
+        récupérés avec ce token si l'utilisateur n'a pas été préchargé. La version du modèle (state) est lue une
+        seule fois par requête, les requêtes en cours pendant un rechargement terminent avec l'ancienne version.
+        """
+        with self.metrics.time('total'):
+            return self._predict(message, user_id, token, ints, search_course, state or self.state)
 
-            print(f"Contient des mots-clés de cours: {has_course_keywords}")
+    def _predict(self, message, user_id, token, ints, search_course, state):
+        """Traite un message : recherche directe de cours ou réponse selon l'intention détectée"""
+        try:
+            parsed = self._parse(message)
+            search_course = search_course or self._search_course
+            predict_log.debug("Message reçu: %s", parsed.raw, extra={'fields': {"normalized": parsed.text}})
 
-            if has_course_keywords or "cours" in message_words:
+            # Les mots-clés de cours sont reconnus pendant le prétraitement (voir chatbot_routing)
+            if parsed.course_keywords or parsed.mentions_course:
                 # Rechercher le cours directement
-                search_result = self._search_course(normalized_message)
+                search_result = search_course(parsed, self._course_view(token))
 
                 if search_result and search_result.get("found"):
                     course = search_result.get("course")
-                    print(f"Cours trouvé: {course.get('title')}")
-
-                    # Créer l'URL complète pour le frontend
-                    module_id = course.get('module', {}).get('_id')
-                    category_id = course.get('category', {}).get('_id')
-
-                    # Si l'ID de catégorie n'est pas directement dans le cours, le récupérer depuis le module
-                    if not category_id and module_id:
-                        try:
-                            module_response = requests.get(
-                                f"http://51.91.251.228:5000/api/modules/{module_id}",
-                                headers={
-                                    "Authorization": f"Bearer {self.api_token}",
-                                    "Content-Type": "application/json"
-                                }
-                            )
-                            if module_response.status_code == 200:
-                                module_data = module_response.json()
-                                category_id = module_data.get('category', {}).get('_id')
-                        except Exception as e:
-                            print(f"Erreur lors de la récupération des données du module: {e}")
-
-                    print(f"IDs extraits - Category: {category_id}, Module: {module_id}")
+                    self.metrics.count_outcome('keyword_course_found')
+
+                    # Les identifiants de module et de catégorie sont résolus dans l'index
+                    redirect_data = search_result["redirect_data"]
+                    module_id = redirect_data["moduleId"]
+                    category_id = redirect_data["categoryId"]
                     course_url = f"/categories/{category_id}/modules/{module_id}/courses/{course.get('_id')}"
 
                     return {
@@ -418,14 +854,10 @@ class ChatbotPredictor:
                             "categoryId": category_id
                         },
                         "redirect_url": course_url,
-                        "redirect_data": {
-                            "courseId": course.get('_id'),
-                            "title": course.get('title'),
-                            "categoryId": category_id,
-                            "moduleId": module_id
-                        }
+                        "redirect_data": redirect_data
                     }
                 else:
+                    self.metrics.count_outcome('keyword_course_not_found')
                     return {
                         "response": search_result.get("response", "Je n'ai pas trouvé de cours correspondant à votre recherche."),
                         "confidence": 0.5,
@@ -435,24 +867,31 @@ class ChatbotPredictor:
                     }
 
             # Si aucun cours n'est trouvé ou pas de mots-clés de cours, continuer avec la prédiction normale
-            response_data = self.get_response(message)
+            response_data = self.get_response(parsed, user_id, ints=ints, search_course=search_course, token=token,
+                                              state=state)
 
             # Construire la réponse finale
+            session = self.sessions.get(user_id)
+            with session.lock:
+                conversation_history = list(session.conversation_history)
             final_response = {
                 "response": response_data.get("response", "Je ne comprends pas votre demande."),
                 "confidence": 0,
                 "intent": "unknown",
                 "action": response_data.get("action"),
                 "shouldRedirect": False,
-                "conversation_history": self.conversation_history[user_id]
+                "conversation_history": conversation_history
             }
 
             return final_response
 
+        except QueueFullError:
+            # Laisser la route répondre 429
+            self.metrics.count_outcome('rejected')
+            raise
         except Exception as e:
-            print(f"Erreur dans predict: {e}")
-            import traceback
-            print(traceback.format_exc())
+            self.metrics.count_outcome('error')
+            predict_log.exception("Erreur dans predict: %s", e)
             return {
                 "response": "Désolé, une erreur s'est produite lors du traitement de votre demande.",
                 "confidence": 0,
@@ -461,8 +900,169 @@ class ChatbotPredictor:
                 "shouldRedirect": False
             }
 
-# Initialiser le prédicteur
-predictor = ChatbotPredictor()
+    def predict_batch(self, messages, user_ids, search_results=None, token=None):
+        """Prédit les réponses d'un lot de messages avec une seule passe du modèle
+
+        Les recherches de cours identiques (mêmes termes et mêmes cours suivis) ne sont faites qu'une fois par lot ;
+        search_results permet de partager ces recherches entre plusieurs lots. Les cours suivis sont ceux de
+        l'utilisateur authentifié par le token de la requête.
+        """
+        if search_results is None:
+            search_results = {}
+
+        def search_course(parsed, user_courses=None):
+            key = (tuple(parsed.search_terms), user_courses)
+            if key not in search_results:
+                search_results[key] = self._search_course(parsed, user_courses)
+            return search_results[key]
+
+        # Une seule version du modèle pour tout le lot, de la prédiction des intentions jusqu'aux réponses
+        state = self.state
+        parsed = [self.preprocessor.parse(message) for message in messages]
+        predictions = self.predict_class_batch(parsed, state=state)
+        return [
+            self.predict(message, user_id, token, ints=ints, search_course=search_course, state=state)
+            for message, user_id, ints in zip(parsed, user_ids, predictions)
+        ]
+
+# Prédicteur global (modèle principal), modèles hébergés et arguments du service, initialisés au démarrage du serveur
+predictor = None
+models = None
+service_args = None
+
+def build_arg_parser():
+    """Construit l'analyseur des arguments du service"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Adresse IP du serveur Flask')
+    parser.add_argument('--port', type=int, default=5001, help='Port du serveur Flask')
+    parser.add_argument('--engine', type=str, choices=ENGINES, default=os.environ.get('CHATBOT_ENGINE', 'keras'),
+                        help="Moteur d'inférence : 'keras' (TensorFlow) ou 'numpy' (sans TensorFlow)")
+    parser.add_argument('--model-name', type=str, default=os.environ.get('CHATBOT_MODEL_NAME', 'chatbot_model'),
+                        help='Modèle principal, toujours chargé (fichiers models/{model_name}.*)')
+    parser.add_argument('--model-locales', type=parse_locales, default=os.environ.get('CHATBOT_MODEL_LOCALES', ''),
+                        help="Modèle par langue de l'utilisateur, par exemple 'en=chatbot_model_en,de=chatbot_model_de'")
+    parser.add_argument('--models-memory-mb', type=float, default=float(os.environ.get('CHATBOT_MODELS_MEMORY_MB', 512)),
+                        help='Mémoire estimée des modèles au-delà de laquelle les moins récemment utilisés sont déchargés')
+    parser.add_argument('--batch-window-ms', type=float, default=float(os.environ.get('CHATBOT_BATCH_WINDOW_MS', 0)),
+                        help='Fenêtre de regroupement des prédictions en ms (0 = désactivé)')
+    parser.add_argument('--max-batch-size', type=int, default=32, help='Taille maximale d\'un lot de prédictions')
+    parser.add_argument('--max-queue-size', type=int, default=256,
+                        help='Requêtes en attente au-delà desquelles le service répond 429')
+    parser.add_argument('--course-index-ttl', type=float, default=float(os.environ.get('CHATBOT_COURSE_INDEX_TTL', 300)),
+                        help="Intervalle de rafraîchissement de l'index des cours en secondes (0 = pas de rafraîchissement automatique)")
+    parser.add_argument('--prediction-cache-size', type=int, default=2048,
+                        help='Nombre de prédictions gardées en cache (0 = cache désactivé)')
+    parser.add_argument('--prediction-cache-ttl', type=float, default=3600,
+                        help='Durée de vie en secondes des prédictions en cache')
+    parser.add_argument('--backend-connect-timeout', type=float, default=2.0, help="Délai de connexion à l'API en secondes")
+    parser.add_argument('--backend-read-timeout', type=float, default=5.0, help="Délai de lecture des réponses de l'API en secondes")
+    parser.add_argument('--session-capacity', type=int, default=10000,
+                        help='Nombre maximal de sessions utilisateur gardées en mémoire')
+    parser.add_argument('--session-ttl', type=float, default=1800,
+                        help="Durée d'inactivité en secondes après laquelle une session est supprimée")
+    parser.add_argument('--session-backend', choices=SESSION_BACKENDS, default=os.environ.get('CHATBOT_SESSION_BACKEND', 'memory'),
+                        help="Sessions propres à chaque processus (memory) ou partagées dans une base SQLite locale (sqlite)")
+    parser.add_argument('--session-db', type=str,
+                        default=os.environ.get('CHATBOT_SESSION_DB',
+                                               os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data/chatbot_sessions.db')),
+                        help='Fichier SQLite des sessions partagées (--session-backend=sqlite)')
+    parser.add_argument('--session-cache-ttl', type=float, default=1.0,
+                        help='Durée en secondes pendant laquelle une session partagée est lue en mémoire sans relire la base')
+    parser.add_argument('--session-flush-interval', type=float, default=0.2,
+                        help='Intervalle en secondes des écritures groupées des sessions partagées')
+    parser.add_argument('--backend-retries', type=int, default=2, help="Nombre de reprises des requêtes GET vers l'API")
+    parser.add_argument('--backend-failure-threshold', type=int, default=5,
+                        help="Échecs consécutifs après lesquels les appels à l'API sont coupés (disjoncteur)")
+    parser.add_argument('--backend-reset-timeout', type=float, default=30,
+                        help="Délai en secondes avant une requête d'essai quand le disjoncteur est ouvert")
+    parser.add_argument('--max-batch-messages', type=int, default=int(os.environ.get('CHATBOT_MAX_BATCH_MESSAGES', 10000)),
+                        help='Nombre maximal de messages acceptés par /predict/batch')
+    parser.add_argument('--batch-stream-threshold', type=int, default=500,
+                        help='Taille de lot à partir de laquelle /predict/batch répond en NDJSON')
+    parser.add_argument('--model-watch-interval', type=float,
+                        default=float(os.environ.get('CHATBOT_MODEL_WATCH_INTERVAL', 5)),
+                        help="Intervalle en secondes de surveillance des fichiers du modèle pour le rechargement à chaud (0 = désactivé)")
+    parser.add_argument('--prefetch-workers', type=int, default=int(os.environ.get('CHATBOT_PREFETCH_WORKERS', 4)),
+                        help='Threads de préchargement des cours des utilisateurs (route /users/prefetch)')
+    parser.add_argument('--prefetch-max-pending', type=int, default=1000,
+                        help='Préchargements en attente au-delà desquels /users/prefetch répond 429')
+    parser.add_argument('--log-level', type=str.upper, choices=LOG_LEVELS, default=os.environ.get('CHATBOT_LOG_LEVEL', 'INFO'),
+                        help='Niveau des logs du chatbot')
+    parser.add_argument('--log-sample', type=parse_sample_rates, default=os.environ.get('CHATBOT_LOG_SAMPLE', ''),
+                        help="Taux d'échantillonnage par catégorie, par exemple 'request=0.1,predict=0.5' "
+                             "(les avertissements et erreurs sont toujours écrits)")
+    parser.add_argument('--log-max-length', type=int, default=2000,
+                        help='Longueur maximale d\'un message de log (0 = pas de troncature)')
+    return parser
+
+def init_predictor(args=None, start_background=True):
+    """Initialise le prédicteur global à partir des arguments du service"""
+    global predictor, models, service_args
+    if args is None:
+        args = build_arg_parser().parse_args([])
+    service_args = args
+    configure_logging(args.log_level, args.log_sample, args.log_max_length)
+
+    metrics = ChatbotMetrics()
+    backend = BackendClient(
+        API_BASE_URL,
+        connect_timeout=args.backend_connect_timeout,
+        read_timeout=args.backend_read_timeout,
+        retries=args.backend_retries,
+        failure_threshold=args.backend_failure_threshold,
+        reset_timeout=args.backend_reset_timeout,
+        metrics=metrics
+    )
+    sessions = open_session_store(args.session_backend, args.session_db, capacity=args.session_capacity,
+                                  idle_ttl=args.session_ttl, cache_ttl=args.session_cache_ttl,
+                                  flush_interval=args.session_flush_interval)
+    predictor = ChatbotPredictor(model_name=args.model_name, engine=args.engine,
+                                 course_index_ttl=args.course_index_ttl, backend=backend, sessions=sessions,
+                                 session_capacity=args.session_capacity, session_ttl=args.session_ttl,
+                                 prediction_cache_size=args.prediction_cache_size,
+                                 prediction_cache_ttl=args.prediction_cache_ttl, metrics=metrics,
+                                 prefetch_workers=args.prefetch_workers, prefetch_max_pending=args.prefetch_max_pending)
+    # Les autres modèles sont chargés au premier message qui les demande et partagent les ressources du principal
+    primary = predictor
+    models = ModelRegistry(primary, lambda model_name: ChatbotPredictor(model_name=model_name, engine=args.engine, shared=primary),
+                           memory_budget=args.models_memory_mb * MB, locales=args.model_locales, exists=primary.has_model)
+    if start_background:
+        start_background_tasks(args)
+    return predictor
+
+def start_background_tasks(args):
+    """Démarre les threads du prédicteur (à faire dans chaque processus après un fork)"""
+    start_logging()
+    if args.batch_window_ms > 0:
+        predictor.enable_batching(args.batch_window_ms, args.max_batch_size, args.max_queue_size)
+    predictor.course_index.start()
+    if args.model_watch_interval > 0:
+        models.start_model_watch(args.model_watch_interval)
+
+# Réponse renvoyée aux utilisateurs non connectés
+AUTH_ERROR_RESULT = {
+    "response": "Vous devez être connecté pour utiliser le chatbot. Veuillez vous connecter ou créer un compte.",
+    "action": None,
+    "shouldRedirect": False,
+    "intent": "auth_error"
+}
+
+# Taille des tranches traitées entre deux écritures d'une réponse NDJSON
+STREAM_CHUNK_SIZE = 256
+
+def _format_result(result):
+    """Formate le résultat d'une prédiction pour le frontend"""
+    return {
+        "response": result.get("response"),
+        "action": result.get("action"),
+        "shouldRedirect": result.get("shouldRedirect", False),
+        "course_data": result.get("course_data"),
+        "redirect_data": result.get("redirect_data"),
+        "redirect_url": result.get("redirect_url"),
+        "confidence": result.get("confidence"),
+        "intent": result.get("intent"),
+        "conversation_history": result.get("conversation_history", [])
+    }
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -478,66 +1078,260 @@ def predict():
         user_id = user_context.get('userId', 'default_user')
 
         # Récupérer le token d'authentification
+        token = None
         auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
-            predictor.set_api_token(token)
-            print(f"Token d'authentification reçu: {token[:10]}...")
+            request_log.debug("Token d'authentification reçu: %s...", token[:10])
         else:
-            print("Avertissement: Pas de token d'authentification fourni")
+            request_log.info("Pas de token d'authentification fourni", extra={'fields': {"user_id": user_id}})
             # Répondre avec un message d'erreur si aucun token n'est fourni
             if not user_id or user_id == 'default_user':
                 return jsonify({
                     "success": True,
-                    "data": {
-                        "response": "Vous devez être connecté pour utiliser le chatbot. Veuillez vous connecter ou créer un compte.",
-                        "action": None,
-                        "shouldRedirect": False,
-                        "intent": "auth_error"
-                    }
+                    "data": AUTH_ERROR_RESULT
                 })
 
+        # Modèle demandé (champ model), sinon celui de la langue de l'utilisateur, chargé au premier usage
+        target = models.get(models.resolve(data.get('model'), user_context.get('locale')))
+
         # Prédire la réponse
-        result = predictor.predict(message, user_id, user_context)
+        result = target.predict(message, user_id, token)
 
         # Formater la réponse pour le frontend
         response = {
             "success": True,
-            "data": {
-                "response": result.get("response"),
-                "action": result.get("action"),
-                "shouldRedirect": result.get("shouldRedirect", False),
-                "course_data": result.get("course_data"),
-                "redirect_data": result.get("redirect_data"),
-                "redirect_url": result.get("redirect_url"),
-                "confidence": result.get("confidence"),
-                "intent": result.get("intent"),
-                "conversation_history": result.get("conversation_history", [])
-            }
+            "data": _format_result(result)
         }
 
-        print("Réponse envoyée:", json.dumps(response, indent=2))  # Log de débogage plus lisible
+        # La réponse complète n'est sérialisée que si le niveau DEBUG est actif
+        request_log.debug("Réponse envoyée: %s", response)
+        request_log.info("Réponse envoyée", extra={'fields': {
+            "user_id": user_id, "intent": result.get("intent"), "action": result.get("action")
+        }})
 
         return jsonify(response)
+    except UnknownModelError as e:
+        request_log.warning("Modèle inconnu: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 400
+    except QueueFullError as e:
+        request_log.warning("Requête rejetée: %s", e)
+        return jsonify({
+            "success": False,
+            "error": "Le service est surchargé, veuillez réessayer dans quelques instants."
+        }), 429
     except Exception as e:
-        print(f"Erreur lors du traitement de la requête: {e}")
-        import traceback
-        print(traceback.format_exc())
+        request_log.exception("Erreur lors du traitement de la requête: %s", e)
         return jsonify({
             "success": False,
             "error": "Une erreur s'est produite lors du traitement de votre demande.",
             "details": str(e)
         }), 500
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Endpoint de vérification de santé de l'API"""
-    model_status = "loaded" if predictor.model else "not_loaded"
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """API endpoint pour prédire les réponses d'un lot de messages en une seule passe du modèle
+
+    Corps attendu : {"messages": ["...", {"message": "...", "context": {"userId": "..."}}, ...]}
+    Les résultats sont renvoyés dans l'ordre des messages, en NDJSON (une ligne par message)
+    pour les grands lots ou si "stream" vaut true.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('messages'), list):
+        return jsonify({"error": "No messages provided"}), 400
+
+    items = data['messages']
+    if len(items) > service_args.max_batch_messages:
+        return jsonify({"error": f"Too many messages (max {service_args.max_batch_messages})"}), 413
+
+    messages = []
+    user_ids = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"message": item}
+        if not isinstance(item, dict) or not isinstance(item.get('message'), str):
+            return jsonify({"error": f"Entry {index} must be a message or an object with a message", "index": index}), 400
+        context = item.get('context') or {}
+        if not isinstance(context, dict):
+            return jsonify({"error": f"Entry {index}: context must be an object", "index": index}), 400
+        messages.append(item['message'])
+        user_ids.append(context.get('userId', 'default_user'))
+
+    # Même règle que /predict : sans token, seuls les messages d'utilisateurs identifiés sont traités
+    auth_header = request.headers.get('Authorization')
+    token = auth_header.split(' ')[1] if auth_header and auth_header.startswith('Bearer ') else None
+    allowed = [token is not None or (user_id and user_id != 'default_user') for user_id in user_ids]
+
+    # Un seul modèle par lot : champ model, sinon le modèle principal
+    try:
+        target = models.get(models.resolve(data.get('model'))) if any(allowed) else predictor
+    except UnknownModelError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    def predict_chunk(start, end, search_results):
+        indexes = [i for i in range(start, end) if allowed[i]]
+        results = target.predict_batch([messages[i] for i in indexes], [user_ids[i] for i in indexes], search_results,
+                                       token)
+        by_index = dict(zip(indexes, results))
+        return [_format_result(by_index[i]) if i in by_index else AUTH_ERROR_RESULT for i in range(start, end)]
+
+    stream = data.get('stream', len(messages) >= service_args.batch_stream_threshold)
+    if not stream:
+        try:
+            return jsonify({"success": True, "data": predict_chunk(0, len(messages), {})})
+        except Exception as e:
+            request_log.exception("Erreur lors du traitement du lot: %s", e)
+            return jsonify({
+                "success": False,
+                "error": "Une erreur s'est produite lors du traitement du lot.",
+                "details": str(e)
+            }), 500
+
+    def generate():
+        # Les recherches de cours sont partagées entre les tranches du lot
+        search_results = {}
+        for start in range(0, len(messages), STREAM_CHUNK_SIZE):
+            end = min(start + STREAM_CHUNK_SIZE, len(messages))
+            try:
+                results = predict_chunk(start, end, search_results)
+            except Exception as e:
+                request_log.exception("Erreur lors du traitement du lot: %s", e)
+                yield json.dumps({"index": start, "success": False, "error": str(e)}) + "\n"
+                return
+            for offset, result in enumerate(results):
+                yield json.dumps({"index": start + offset, "success": True, "data": result}) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/users/prefetch', methods=['POST'])
+def prefetch_user():
+    """Précharge en arrière-plan les cours d'un utilisateur qui vient de se connecter (appelé par l'API Node.js)
+
+    Corps attendu : {"userId": "..."} avec l'en-tête Authorization: Bearer <token de l'utilisateur>. Les cours
+    sont rangés sous l'empreinte du token (voir ChatbotPredictor.courses_key), jamais sous le userId.
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('userId')
+    auth_header = request.headers.get('Authorization')
+    if not user_id or not auth_header or not auth_header.startswith('Bearer '):
+        return jsonify({"success": False, "error": "userId and bearer token required"}), 400
+
+    token = auth_header.split(' ')[1]
+    try:
+        started = predictor.prefetcher.submit(predictor.courses_key(token), token)
+    except QueueFullError as e:
+        request_log.warning("Préchargement rejeté: %s", e)
+        return jsonify({"success": False, "error": "Le service est surchargé, veuillez réessayer dans quelques instants."}), 429
+    return jsonify({"success": True, "started": started}), 202
+
+# Nombre maximal de suggestions renvoyées par /courses/suggest
+MAX_SUGGESTIONS = 20
+
+@app.route('/courses/suggest', methods=['GET'])
+def suggest_courses():
+    """Autocomplétion des titres de cours : /courses/suggest?q=jav&limit=5
+
+    Les cours dont un mot du titre commence par q (sans tenir compte des accents ni de la casse)
+    sont renvoyés par popularité décroissante. La réponse ne dépend jamais de l'API : tant que
+    l'index des cours n'est pas construit, la liste est vide et la construction est lancée.
+    """
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 5, type=int), 1), MAX_SUGGESTIONS)
+    if not predictor.course_index.loaded:
+        predictor.course_index.load_async()
     return jsonify({
+        "success": True,
+        "query": query,
+        "loaded": predictor.course_index.loaded,
+        "suggestions": predictor.suggester.suggest(query, limit),
+    })
+
+def _is_admin_request():
+    """Les routes d'administration demandent CHATBOT_ADMIN_TOKEN s'il est défini, sinon un appel local"""
+    admin_token = os.environ.get('CHATBOT_ADMIN_TOKEN')
+    if admin_token:
+        return request.headers.get('X-Admin-Token') == admin_token
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/courses/refresh', methods=['POST'])
+def refresh_courses():
+    """Force la reconstruction de l'index des cours (route d'administration)"""
+    if not _is_admin_request():
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+
+    refreshed = predictor.course_index.refresh()
+    return jsonify({
+        "success": refreshed,
+        "course_index": predictor.course_index.stats()
+    }), 200 if refreshed else 502
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """Recharge les fichiers de tous les modèles chargés sans interrompre le service (?wait=1 pour attendre la fin)"""
+    if not _is_admin_request():
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+
+    if request.args.get('wait') in ('1', 'true'):
+        reloaded = models.reload()
+        return jsonify({
+            "success": all(reloaded.values()),
+            "reloaded": reloaded,
+            "model": predictor.model_stats(),
+            "models": models.stats()
+        }), 200 if all(reloaded.values()) else 500
+
+    started = models.reload_async()
+    return jsonify({"success": True, "started": started, "model": predictor.model_stats(), "models": models.stats()}), 202
+
+def health_status():
+    """État du service renvoyé par /health (serveurs Flask et ASGI)"""
+    model_status = "loaded" if predictor.model else "not_loaded"
+    return {
         "status": "healthy",
         "model_status": model_status,
-        "num_intents": len(predictor.intents['intents']) if 'intents' in predictor.intents else 0
-    })
+        "model": predictor.model_stats(),
+        "models": models.stats(),
+        "engine": predictor.engine,
+        "num_intents": len(predictor.intents['intents']) if 'intents' in predictor.intents else 0,
+        "batching": predictor.batcher.stats() if predictor.batcher else None,
+        "course_index": predictor.course_index.stats(),
+        "suggest": predictor.suggester.stats(),
+        "backend": predictor.backend.stats(),
+        "sessions": predictor.sessions.stats(),
+        "prefetch": predictor.prefetcher.stats(),
+        "prediction_cache": predictor.prediction_cache.stats(),
+        "preprocessing": predictor.preprocessor.stats(),
+        "routing": predictor.routing.stats(),
+        "logging": logging_stats()
+    }
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Endpoint de vérification de santé de l'API"""
+    return jsonify(health_status())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques du chatbot au format texte de Prometheus"""
+    cache = predictor.prediction_cache.stats()
+    # Un compteur par modèle chargé (noms limités à MODEL_NAME, sans caractère à échapper)
+    exact_match_hits = [f'chatbot_exact_match_hits_total{{model="{model_name}"}} {target.exact_match_hits}'
+                        for model_name, target in models.loaded()]
+    extra = [
+        "# HELP chatbot_prediction_cache_hits_total Prédictions servies par le cache",
+        "# TYPE chatbot_prediction_cache_hits_total counter",
+        f"chatbot_prediction_cache_hits_total {cache['hits']}",
+        "# HELP chatbot_prediction_cache_misses_total Prédictions calculées par le modèle",
+        "# TYPE chatbot_prediction_cache_misses_total counter",
+        f"chatbot_prediction_cache_misses_total {cache['misses']}",
+        "# HELP chatbot_exact_match_hits_total Prédictions servies par la table des motifs d'entraînement",
+        "# TYPE chatbot_exact_match_hits_total counter",
+        *exact_match_hits,
+        "# HELP chatbot_sessions Sessions utilisateur en mémoire",
+        "# TYPE chatbot_sessions gauge",
+        f"chatbot_sessions {len(predictor.sessions)}",
+    ]
+    return Response(predictor.metrics.render(extra), content_type=METRICS_CONTENT_TYPE)
 
 if __name__ == '__main__':
     try:
@@ -545,16 +1339,13 @@ if __name__ == '__main__':
         os.makedirs(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../models'), exist_ok=True)
 
         # Lire les arguments
-        parser = argparse.ArgumentParser()
-        parser.add_argument('--host', type=str, default='127.0.0.1', help='Adresse IP du serveur Flask')
-        parser.add_argument('--port', type=int, default=5001, help='Port du serveur Flask')
-        args = parser.parse_args()
+        args = build_arg_parser().parse_args()
+
+        init_predictor(args)
 
-        print(f"Démarrage du serveur chatbot sur {args.host}:{args.port}")
+        server_log.info("Démarrage du serveur chatbot sur %s:%s", args.host, args.port)
 
         # Démarrer Flask avec les paramètres donnés
         app.run(host=args.host, port=args.port, debug=True)
     except Exception as e:
-        print(f"Erreur lors du démarrage du serveur: {e}")
-        import traceback
-        print(traceback.format_exc())
+        server_log.exception("Erreur lors du démarrage du serveur: %s", e)
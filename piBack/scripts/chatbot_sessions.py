@@ -0,0 +1,336 @@
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from chatbot_logging import get_logger
+
+log = get_logger('sessions')
+
+# Implémentations du magasin de sessions (voir open_session_store)
+SESSION_BACKENDS = ['memory', 'sqlite']
+
+
+class UserSession:
+    """État de conversation d'un utilisateur"""
+
+    __slots__ = ('conversation_history', 'response_history', 'last_response',
+                 'courses', 'courses_time', 'course_view', 'search_state', 'last_seen', 'lock',
+                 'revision', 'synced_at')
+
+    # Champs partagés entre les processus par un magasin durable ; les autres restent propres au processus
+    DURABLE_FIELDS = ('conversation_history', 'response_history', 'last_response')
+
+    def __init__(self, history_size=5):
+        # Protège les champs de la session quand plusieurs requêtes du même utilisateur arrivent en même temps
+        self.lock = threading.Lock()
+        self.conversation_history = deque(maxlen=history_size)
+        # Anneau des dernières réponses envoyées, sans list.pop(0)
+        self.response_history = deque(maxlen=history_size)
+        self.last_response = ''
+        self.courses = None
+        self.courses_time = 0
+        # Identifiants des cours suivis, favorisés par la recherche de cours
+        self.course_view = None
+        self.search_state = {"searching": False, "last_query": None}
+        self.last_seen = time.monotonic()
+        # Nombre de modifications enregistrées et date de la dernière lecture du magasin durable
+        self.revision = 0
+        self.synced_at = None
+
+    def snapshot(self):
+        """Champs durables de la session, sérialisables en JSON (à appeler sous session.lock)"""
+        return {
+            "conversation_history": list(self.conversation_history),
+            "response_history": list(self.response_history),
+            "last_response": self.last_response,
+        }
+
+    def restore(self, data):
+        """Remplace les champs durables par ceux d'un snapshot (à appeler sous session.lock)"""
+        self.conversation_history.clear()
+        self.conversation_history.extend(data.get("conversation_history", []))
+        self.response_history.clear()
+        self.response_history.extend(data.get("response_history", []))
+        self.last_response = data.get("last_response", '')
+
+    def approx_size(self):
+        """Estimation de la mémoire occupée par la session, en octets"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.search_state) + sys.getsizeof(self.last_response)
+        for history in (self.conversation_history, self.response_history):
+            size += sys.getsizeof(history) + sum(sys.getsizeof(item) for item in history)
+        if self.courses is not None:
+            size += sys.getsizeof(self.courses)
+        if self.course_view is not None:
+            size += sys.getsizeof(self.course_view)
+        return size
+
+
+class SessionStore:
+    """Sessions par utilisateur bornées : capacité LRU, expiration après inactivité, accès en O(1)"""
+
+    def __init__(self, capacity=10000, idle_ttl=1800, history_size=5):
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self.history_size = history_size
+        # Ordre d'accès : la session la moins récemment utilisée est en tête
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id):
+        return user_id in self._sessions
+
+    def _expire(self, now):
+        """Supprime les sessions inactives depuis plus de idle_ttl secondes (en tête de l'ordre d'accès)"""
+        sessions = self._sessions
+        while sessions:
+            user_id, session = next(iter(sessions.items()))
+            if now - session.last_seen < self.idle_ttl:
+                break
+            del sessions[user_id]
+            self.expirations += 1
+
+    def get(self, user_id):
+        """Retourne la session de l'utilisateur, en la créant si nécessaire"""
+        now = time.monotonic()
+        with self._lock:
+            if self.idle_ttl:
+                self._expire(now)
+
+            session = self._sessions.get(user_id)
+            if session is None:
+                session = UserSession(self.history_size)
+                self._sessions[user_id] = session
+                if len(self._sessions) > self.capacity:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(user_id)
+            session.last_seen = now
+            return session
+
+    def save(self, user_id, session):
+        """Enregistre les champs durables après une modification (à appeler sous session.lock)
+
+        Les sessions en mémoire sont déjà à jour : rien à faire.
+        """
+
+    def flush(self):
+        """Écrit les modifications en attente ; retourne le nombre de sessions écrites"""
+        return 0
+
+    def close(self):
+        self.flush()
+
+    def stats(self, sample_size=100):
+        """Retourne le nombre de sessions et une estimation de la mémoire occupée"""
+        with self._lock:
+            count = len(self._sessions)
+            sample = []
+            for session in reversed(self._sessions.values()):
+                if len(sample) >= sample_size:
+                    break
+                sample.append(session.approx_size())
+            container = sys.getsizeof(self._sessions)
+        average = sum(sample) / len(sample) if sample else 0
+        return {
+            "backend": "memory",
+            "entries": count,
+            "capacity": self.capacity,
+            "idle_ttl": self.idle_ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "approx_bytes": int(container + count * average),
+        }
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions partagées par plusieurs processus dans une base SQLite en mode WAL
+
+    Les sessions restent gardées en mémoire (capacité LRU et expiration comme SessionStore) et servent de
+    cache de lecture : une session n'est relue dans la base qu'après cache_ttl secondes. Les modifications
+    sont écrites par lots, par un thread propre à chaque processus, toutes les flush_interval secondes ou
+    dès que batch_size sessions attendent. Un autre processus voit donc une réponse envoyée au plus
+    flush_interval + cache_ttl secondes plus tard ; en cas d'écritures simultanées, la dernière l'emporte.
+    """
+
+    # Intervalle en secondes de suppression des sessions inactives dans la base
+    CLEANUP_INTERVAL = 60
+
+    def __init__(self, path, capacity=10000, idle_ttl=1800, history_size=5, cache_ttl=1.0, flush_interval=0.2,
+                 batch_size=256):
+        super().__init__(capacity=capacity, idle_ttl=idle_ttl, history_size=history_size)
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        # Sessions modifiées pas encore écrites : identifiant → (snapshot, date de modification)
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._wake = threading.Event()
+        # Connexions par thread et thread d'écriture, recréés dans chaque processus après un fork
+        self._local = threading.local()
+        self._pid = None
+        self._closed = False
+        self._last_cleanup = 0.0
+
+        # Statistiques
+        self.reads = 0
+        self.cache_hits = 0
+        self.writes = 0
+        self.flushes = 0
+        self.write_errors = 0
+
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS sessions "
+                               "(user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+        atexit.register(self.close)
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # WAL : les lectures ne bloquent pas l'écriture d'un autre processus
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _ensure_writer(self):
+        # Le thread d'écriture du processus parent n'existe plus après un fork
+        if self._pid != os.getpid():
+            with self._dirty_lock:
+                if self._pid != os.getpid():
+                    self._dirty = {}
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._write_loop, name='chatbot-sessions-writer', daemon=True).start()
+
+    def get(self, user_id):
+        """Retourne la session de l'utilisateur, relue dans la base si la copie en mémoire a plus de cache_ttl secondes"""
+        session = super().get(user_id)
+        if session.synced_at is not None and time.monotonic() - session.synced_at < self.cache_ttl:
+            self.cache_hits += 1
+            return session
+
+        revision = session.revision
+        try:
+            row = self._connection().execute("SELECT data FROM sessions WHERE user_id = ?", (str(user_id),)).fetchone()
+        except sqlite3.Error as e:
+            # La copie en mémoire reste utilisable si la base est momentanément indisponible
+            log.warning("Erreur lors de la lecture de la session: %s", e)
+            return session
+        self.reads += 1
+
+        with session.lock:
+            # Une modification locale faite pendant la lecture, ou pas encore écrite, est plus récente que la base
+            with self._dirty_lock:
+                pending = str(user_id) in self._dirty
+            if row is not None and session.revision == revision and not pending:
+                session.restore(json.loads(row[0]))
+            session.synced_at = time.monotonic()
+        return session
+
+    def save(self, user_id, session):
+        """Met la session en attente d'écriture (à appeler sous session.lock)"""
+        self._ensure_writer()
+        session.revision += 1
+        with self._dirty_lock:
+            self._dirty[str(user_id)] = (session.snapshot(), time.time())
+            full = len(self._dirty) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if self.idle_ttl and time.time() - self._last_cleanup >= self.CLEANUP_INTERVAL:
+                self._cleanup()
+
+    def flush(self):
+        """Écrit les sessions modifiées en une seule transaction ; retourne le nombre de sessions écrites"""
+        with self._dirty_lock:
+            batch = dict(self._dirty)
+        if not batch:
+            return 0
+
+        rows = [(user_id, json.dumps(data, ensure_ascii=False), updated_at)
+                for user_id, (data, updated_at) in batch.items()]
+        connection = self._connection()
+        try:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany("INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            # Les sessions restent en attente et seront écrites au prochain passage
+            self.write_errors += 1
+            log.warning("Erreur lors de l'écriture de %d sessions: %s", len(rows), e)
+            return 0
+
+        # Retirer de l'attente les sessions écrites, sauf celles modifiées de nouveau pendant l'écriture
+        with self._dirty_lock:
+            for user_id, entry in batch.items():
+                if self._dirty.get(user_id) is entry:
+                    del self._dirty[user_id]
+        self.writes += len(rows)
+        self.flushes += 1
+        return len(rows)
+
+    def _cleanup(self):
+        """Supprime de la base les sessions inactives depuis plus de idle_ttl secondes"""
+        self._last_cleanup = time.time()
+        try:
+            with self._connection() as connection:
+                deleted = connection.execute("DELETE FROM sessions WHERE updated_at < ?",
+                                             (time.time() - self.idle_ttl,)).rowcount
+        except sqlite3.Error as e:
+            log.warning("Erreur lors du nettoyage des sessions: %s", e)
+            return
+        if deleted:
+            log.info("%d sessions inactives supprimées de la base", deleted)
+
+    def close(self):
+        """Écrit les modifications en attente et arrête le thread d'écriture"""
+        if self._pid == os.getpid():
+            self.flush()
+        self._closed = True
+        self._wake.set()
+
+    def stats(self, sample_size=100):
+        stats = super().stats(sample_size)
+        with self._dirty_lock:
+            pending = len(self._dirty)
+        stats.update({
+            "backend": "sqlite",
+            "path": self.path,
+            "cache_ttl": self.cache_ttl,
+            "flush_interval": self.flush_interval,
+            "pending_writes": pending,
+            "reads": self.reads,
+            "cache_hits": self.cache_hits,
+            "writes": self.writes,
+            "flushes": self.flushes,
+            "write_errors": self.write_errors,
+        })
+        return stats
+
+
+def open_session_store(backend='memory', path=None, **options):
+    """Crée le magasin de sessions choisi : 'memory' (par processus) ou 'sqlite' (partagé, durable)"""
+    if backend == 'sqlite':
+        return SqliteSessionStore(path, **options)
+    for name in ('cache_ttl', 'flush_interval', 'batch_size'):
+        options.pop(name, None)
+    return SessionStore(**options)
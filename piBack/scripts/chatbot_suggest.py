@@ -0,0 +1,224 @@
+import bisect
+from collections import defaultdict
+import heapq
+from operator import itemgetter
+import re
+import threading
+import unicodedata
+
+
+# Diacritiques séparés de leur lettre par la décomposition NFKD (é → e + accent aigu)
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+_WORD = re.compile(r"\w+")
+
+
+def fold(text):
+    """Minuscules sans accents ni ponctuation : « Réseaux & Sécurité » → « reseaux securite »"""
+    stripped = _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', str(text).lower()))
+    return ' '.join(_WORD.findall(stripped))
+
+
+def popularity(course):
+    """Popularité d'un cours : champ popularity s'il existe, sinon nombre d'acheteurs"""
+    value = course.get('popularity')
+    if isinstance(value, (int, float)):
+        return value
+    purchased_by = course.get('purchasedBy')
+    return len(purchased_by) if isinstance(purchased_by, list) else 0
+
+
+class TitleSuggester:
+    """Autocomplétion des titres de cours par préfixe, sur des tableaux triés
+
+    Chaque titre normalisé est rangé une fois par mot (« introduction a react », « a react », « react ») :
+    un préfixe de n'importe quel mot du titre le retrouve par recherche dichotomique. À chaque clé est
+    associé l'ordre de popularité du cours, (-popularité, titre, identifiant). Les préfixes courts, qui
+    correspondent à beaucoup de titres, gardent leurs meilleurs cours précalculés. Les mises à jour ne
+    normalisent que les cours ajoutés, supprimés ou modifiés, et les insèrent ou les retirent par
+    recherche dichotomique dans les tableaux existants.
+    """
+
+    # Préfixes dont les meilleurs cours sont précalculés : TOP_K suggestions au plus (MAX_SUGGESTIONS du
+    # service), gardées avec une réserve pour que les suppressions n'imposent presque jamais de recalcul
+    SHORT_PREFIX = 3
+    TOP_K = 20
+    TOP_RESERVE = 2 * TOP_K
+
+    def __init__(self):
+        # Clés triées et ordres des cours correspondants, cours indexés (identifiant → (clé du titre, ordre,
+        # suggestion, signature)), meilleurs ordres et nombre de cours de chaque préfixe court,
+        # remplacés d'un bloc à chaque mise à jour
+        self._state = ([], [], {}, {}, {})
+        # Cours dont le titre normalisé est vide (identifiant → signature) : ignorés tant qu'ils ne changent pas
+        self._unindexed = {}
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def __len__(self):
+        return len(self._state[2])
+
+    @staticmethod
+    def _keys(title_key):
+        words = title_key.split()
+        return [' '.join(words[i:]) for i in range(len(words))]
+
+    def _prefixes(self, title_key):
+        return {key[:n] for key in self._keys(title_key) for n in range(1, min(len(key), self.SHORT_PREFIX) + 1)}
+
+    @staticmethod
+    def _splice(keys, orders, removals, additions):
+        """Retire les positions removals et insère les couples (clé, ordre) additions dans les tableaux triés
+
+        Les positions d'insertion sont trouvées par dichotomie dans les anciens tableaux, qui sont recopiés
+        par tranches entre deux modifications.
+        """
+        additions = sorted(additions, key=itemgetter(0))
+        # À position égale, l'insertion passe avant la suppression de l'ancien élément ; le tri est stable,
+        # les insertions à la même position restent dans l'ordre des clés
+        cuts = sorted([(bisect.bisect_left(keys, key), 0, (key, order)) for key, order in additions]
+                      + [(position, 1, None) for position in sorted(removals)], key=itemgetter(0, 1))
+        new_keys, new_orders = [], []
+        last = 0
+        for position, is_removal, item in cuts:
+            new_keys.extend(keys[last:position])
+            new_orders.extend(orders[last:position])
+            if is_removal:
+                last = position + 1
+            else:
+                new_keys.append(item[0])
+                new_orders.append(item[1])
+                last = position
+        new_keys.extend(keys[last:])
+        new_orders.extend(orders[last:])
+        return new_keys, new_orders
+
+    @staticmethod
+    def _scan(keys, orders, prefix, limit):
+        """limit meilleurs ordres des cours dont une clé commence par prefix, par parcours de l'intervalle"""
+        # Toutes les clés commençant par le préfixe sont contiguës dans le tableau trié
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\uffff', start)
+        return heapq.nsmallest(limit, set(orders[start:end]))
+
+    def _top_prefixes(self, courses):
+        """Meilleurs ordres et nombre de cours de chaque préfixe court, calculés sur tous les cours"""
+        groups = defaultdict(list)
+        for title_key, order, _, _ in courses.values():
+            for prefix in self._prefixes(title_key):
+                groups[prefix].append(order)
+        top = {prefix: heapq.nsmallest(self.TOP_RESERVE, group) for prefix, group in groups.items()}
+        return top, {prefix: len(group) for prefix, group in groups.items()}
+
+    def sync(self, entries):
+        """Met l'index à jour d'après les entrées de l'index des cours ; retourne (ajoutés, retirés)
+
+        Un cours dont le titre, la popularité, le module ou la catégorie a changé est retiré puis ajouté.
+        """
+        current = {}
+        for entry in entries:
+            if entry.get('course_id') is None or not entry.get('title'):
+                continue
+            current[str(entry['course_id'])] = (entry['title'], popularity(entry.get('course') or {}),
+                                                entry.get('module_id'), entry.get('category_id'))
+
+        with self._lock:
+            keys, orders, courses, top, counts = self._state
+            removed = [course_id for course_id, course in courses.items() if current.get(course_id) != course[3]]
+            removed_set = set(removed)
+            self._unindexed = {course_id: signature for course_id, signature in self._unindexed.items()
+                               if current.get(course_id) == signature}
+            added = [course_id for course_id, signature in current.items()
+                     if (course_id not in courses or course_id in removed_set)
+                     and self._unindexed.get(course_id) != signature]
+
+            # Seuls les titres des cours ajoutés ou modifiés sont normalisés
+            indexed = {}
+            for course_id in added:
+                title, score, module_id, category_id = signature = current[course_id]
+                title_key = fold(title)
+                if not title_key:
+                    self._unindexed[course_id] = signature
+                    continue
+                indexed[course_id] = (title_key, (-score, title_key, course_id),
+                                      {"id": course_id, "title": title, "moduleId": module_id,
+                                       "categoryId": category_id, "popularity": score}, signature)
+            if not removed and not indexed:
+                return 0, 0
+
+            additions = [(key, course[1]) for course in indexed.values() for key in self._keys(course[0])]
+            if len(indexed) > len(courses) - len(removed):
+                # Construction initiale ou catalogue presque entièrement renouvelé : tri et calcul complets
+                merged = [(key, order) for key, order in zip(keys, orders) if order[2] not in removed_set]
+                merged.extend(additions)
+                merged.sort(key=itemgetter(0))
+                courses = {course_id: course for course_id, course in courses.items() if course_id not in removed_set}
+                courses.update(indexed)
+                top, counts = self._top_prefixes(courses)
+                self._state = ([key for key, _ in merged], [order for _, order in merged], courses, top, counts)
+                self.updates += 1
+                return len(indexed), len(removed)
+
+            # Positions des clés retirées : dichotomie puis recherche du cours parmi les clés égales
+            removals = []
+            for course_id in removed:
+                for key in self._keys(courses[course_id][0]):
+                    position = bisect.bisect_left(keys, key)
+                    while orders[position][2] != course_id:
+                        position += 1
+                    removals.append(position)
+            # Nouvelles copies publiées d'un bloc : une recherche en cours garde l'ancienne version
+            keys, orders = self._splice(keys, orders, removals, additions)
+
+            courses = dict(courses)
+            # Meilleurs ordres des préfixes courts : toujours les premiers de la liste complète des cours du
+            # préfixe, qui sont tous présents quand la liste a autant d'éléments que le préfixe a de cours
+            top = dict(top)
+            counts = dict(counts)
+            touched = set()
+            for course_id in removed:
+                title_key, order = courses.pop(course_id)[:2]
+                for prefix in self._prefixes(title_key):
+                    counts[prefix] -= 1
+                    if order in top[prefix]:
+                        if prefix not in touched:
+                            top[prefix] = list(top[prefix])
+                            touched.add(prefix)
+                        top[prefix].remove(order)
+            courses.update(indexed)
+            for title_key, order, _, _ in indexed.values():
+                for prefix in self._prefixes(title_key):
+                    best = top.get(prefix, ())
+                    if len(best) == counts.get(prefix, 0) or order < best[-1]:
+                        if prefix not in touched:
+                            best = top[prefix] = list(best)
+                            touched.add(prefix)
+                        bisect.insort(best, order)
+                        if len(best) > self.TOP_RESERVE:
+                            best.pop()
+                    counts[prefix] = counts.get(prefix, 0) + 1
+            # Un préfixe dont la réserve est épuisée est recalculé sur son intervalle
+            for prefix in touched:
+                if not counts[prefix]:
+                    del top[prefix], counts[prefix]
+                elif len(top[prefix]) < min(self.TOP_K, counts[prefix]):
+                    top[prefix] = self._scan(keys, orders, prefix, self.TOP_RESERVE)
+
+            self._state = (keys, orders, courses, top, counts)
+            self.updates += 1
+        return len(indexed), len(removed)
+
+    def suggest(self, query, limit=5):
+        """Retourne les limit cours les plus populaires dont un mot du titre commence par la requête"""
+        prefix = fold(query)
+        if not prefix:
+            return []
+        keys, orders, courses, top, _ = self._state
+        if len(prefix) <= self.SHORT_PREFIX and limit <= self.TOP_K:
+            best = top.get(prefix, ())[:limit]
+        else:
+            best = self._scan(keys, orders, prefix, limit)
+        return [courses[order[2]][2] for order in best]
+
+    def stats(self):
+        keys, _, courses, _, _ = self._state
+        return {"courses": len(courses), "keys": len(keys), "updates": self.updates}
@@ -31,6 +31,12 @@ try:
 except ImportError:
     print('NumPy n\'est pas installé')
 
+try:
+    import h5py
+    print('h5py est installé:', h5py.__version__)
+except ImportError:
+    print('h5py n\'est pas installé')
+
 try:
     import requests
     print('Requests est installé:', requests.__version__)
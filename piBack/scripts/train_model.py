@@ -1,3 +1,4 @@
+import argparse
 import json
 import numpy as np
 import tensorflow as tf
@@ -10,12 +11,16 @@ import pickle
 import random
 import os
 
+from chatbot_bundle import bundle_path, save_bundle
+from chatbot_features import (BagOfWordsEncoder, ExactMatchTable, HashedNgramEncoder, features_path, save_encoder_config,
+                              training_matrices)
+
 # Télécharger les ressources NLTK nécessaires
 nltk.download('punkt')
 nltk.download('wordnet')
 
 class ChatbotModelTrainer:
-    def __init__(self, intents_file='intents.json', model_name='chatbot_model'):
+    def __init__(self, intents_file='intents.json', model_name='chatbot_model', features='bow', hash_dim=4096):
         # Chemin du dossier des modèles
         self.models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../models')
         os.makedirs(self.models_dir, exist_ok=True)
@@ -28,6 +33,10 @@ class ChatbotModelTrainer:
         self.documents = []
         self.ignore_letters = ['?', '!', '.', ',']
         self.model = None
+        # Encodage des motifs : sac de mots du vocabulaire (bow) ou n-grammes hachés sur hash_dim colonnes (hashed)
+        self.features = features
+        self.hash_dim = hash_dim
+        self.encoder = None
         
         # Charge le fichier d'intentions
         try:
@@ -192,39 +201,58 @@ class ChatbotModelTrainer:
         # Sauvegarde des mots et classes pour une utilisation ultérieure
         pickle.dump(self.words, open(os.path.join(self.models_dir, f'{self.model_name}_words.pkl'), 'wb'))
         pickle.dump(self.classes, open(os.path.join(self.models_dir, f'{self.model_name}_classes.pkl'), 'wb'))
+        self.save_exact_matches()
+        
+        # Description de l'encodeur, relue par le service pour encoder les messages comme à l'entraînement
+        self.encoder = self.create_encoder()
+        save_encoder_config(features_path(self.models_dir, self.model_name), self.encoder)
+        print(f"Encodage {self.features} : {len(self.encoder)} colonnes")
+    
+    def create_encoder(self):
+        """Crée l'encodeur des motifs choisi par features"""
+        if self.features == 'hashed':
+            return HashedNgramEncoder(self.hash_dim)
+        return BagOfWordsEncoder(self.words)
+    
+    def save_exact_matches(self):
+        """Sauvegarde la table motif lemmatisé → intention utilisée par le service avant le modèle"""
+        documents = [([self.lemmatizer.lemmatize(word) for word in word_list], tag) for word_list, tag in self.documents]
+        table = ExactMatchTable.from_documents(documents)
+        table.save(os.path.join(self.models_dir, f'{self.model_name}_exact_matches.json'))
+        print(f"{len(table)} motifs sans ambiguïté pour la correspondance exacte")
     
     def create_training_data(self):
-        """Crée les données d'entraînement pour le modèle"""
-        training = []
-        output_empty = [0] * len(self.classes)
-        
-        for document in self.documents:
-            bag = []
-            word_patterns = document[0]
-            word_patterns = [self.lemmatizer.lemmatize(word.lower()) for word in word_patterns]
-            
-            for word in self.words:
-                bag.append(1) if word in word_patterns else bag.append(0)
-            
-            output_row = list(output_empty)
-            output_row[self.classes.index(document[1])] = 1
-            
-            training.append([bag, output_row])
+        """Crée les données d'entraînement pour le modèle : motifs en matrice creuse CSR, étiquettes one-hot"""
+        # Chaque mot distinct n'est lemmatisé qu'une fois
+        lemmas = {}
+        documents = []
+        for word_patterns, tag in self.documents:
+            for word in word_patterns:
+                if word not in lemmas:
+                    lemmas[word] = self.lemmatizer.lemmatize(word.lower())
+            documents.append(([lemmas[word] for word in word_patterns], tag))
         
         # Mélange les données d'entraînement
-        random.shuffle(training)
-        training = np.array(training, dtype=object)
+        random.shuffle(documents)
         
-        # Sépare les features et les labels
-        train_x = np.array([np.array(item[0]) for item in training])
-        train_y = np.array([np.array(item[1]) for item in training])
-        
-        return train_x, train_y
+        # Colonnes par index mot → colonne et étiquettes par index classe → colonne, sans matrice dense
+        return training_matrices(self.encoder, documents, self.classes)
+    
+    def create_dataset(self, x, y, batch_size, shuffle=False):
+        """Lots d'entraînement lus dans la matrice creuse ; seul le lot en cours est converti en matrice dense"""
+        sparse_x = tf.sparse.SparseTensor(np.stack([x.row_ids(), x.indices.astype(np.int64)], axis=1),
+                                          np.ones(x.nnz, dtype=np.float32), x.shape)
+        dataset = tf.data.Dataset.from_tensor_slices((sparse_x, y))
+        if shuffle:
+            dataset = dataset.shuffle(len(x), reshuffle_each_iteration=True)
+        width = x.shape[1]
+        return dataset.batch(batch_size).map(
+            lambda batch_x, batch_y: (tf.ensure_shape(tf.sparse.to_dense(batch_x), (None, width)), batch_y))
     
     def build_model(self):
         """Construit et compile le modèle de réseau de neurones"""
         self.model = Sequential()
-        self.model.add(Dense(128, input_shape=(len(self.words),), activation='relu'))
+        self.model.add(Dense(128, input_shape=(len(self.encoder),), activation='relu'))
         self.model.add(Dropout(0.5))
         self.model.add(Dense(64, activation='relu'))
         self.model.add(Dropout(0.5))
@@ -248,18 +276,30 @@ class ChatbotModelTrainer:
         
         # Entraînement du modèle
         history = self.model.fit(
-            train_x, train_y,
+            self.create_dataset(train_x, train_y, batch_size, shuffle=True),
             epochs=epochs,
-            batch_size=batch_size,
             verbose=verbose
         )
         
         # Sauvegarde du modèle
         self.model.save(os.path.join(self.models_dir, f'{self.model_name}.h5'))
         print(f"Modèle sauvegardé sous {os.path.join(self.models_dir, self.model_name)}.h5")
+        self.save_bundle()
         
         return history
     
+    def save_bundle(self):
+        """Sauvegarde vocabulaire, classes et poids dans un bundle projetable en mémoire (chargé par le moteur numpy)"""
+        layers = []
+        for layer in self.model.layers:
+            if isinstance(layer, Dense):
+                kernel, bias = layer.get_weights()
+                layers.append((kernel, bias, layer.get_config()['activation']))
+        
+        path = bundle_path(self.models_dir, self.model_name)
+        content_hash = save_bundle(path, self.words, self.classes, layers)
+        print(f"Bundle sauvegardé sous {path} (empreinte {content_hash[:12]})")
+    
     def evaluate_model(self, test_size=0.2):
         """Évalue le modèle sur un ensemble de test"""
         if not self.words or not self.classes:
@@ -281,13 +321,31 @@ class ChatbotModelTrainer:
                 return None
         
         # Évaluation du modèle
-        scores = self.model.evaluate(x_test, y_test, verbose=0)
+        scores = self.model.evaluate(self.create_dataset(x_test, y_test, batch_size=256), verbose=0)
         print(f"Précision du modèle: {scores[1]*100:.2f}%")
         
         return scores
 
 if __name__ == "__main__":
-    trainer = ChatbotModelTrainer()
+    parser = argparse.ArgumentParser(description="Entraîne un modèle du chatbot")
+    parser.add_argument('--model-name', type=str, default='chatbot_model',
+                        help='Nom du modèle (fichiers models/{model_name}.*), par exemple chatbot_model_en')
+    parser.add_argument('--intents-file', type=str, default=None,
+                        help="Fichier d'intentions du dossier scripts (par défaut {model_name}_intents.json s'il existe, "
+                             "sinon intents.json, comme le service)")
+    parser.add_argument('--features', choices=['bow', 'hashed'], default='bow',
+                        help="Encodage des messages : sac de mots du vocabulaire (bow) ou n-grammes de mots et de "
+                             "caractères hachés (hashed, tolère les fautes de frappe et les mots absents de l'entraînement)")
+    parser.add_argument('--hash-dim', type=int, default=4096, help='Nombre de colonnes de l\'encodage hashed')
+    args = parser.parse_args()
+    intents_file = args.intents_file
+    if intents_file is None:
+        intents_file = f'{args.model_name}_intents.json'
+        if not os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), intents_file)):
+            intents_file = 'intents.json'
+
+    trainer = ChatbotModelTrainer(intents_file=intents_file, model_name=args.model_name,
+                                  features=args.features, hash_dim=args.hash_dim)
     trainer.preprocess_data()
     trainer.train_model(epochs=200, verbose=1)
     trainer.evaluate_model()
@@ -103,9 +103,21 @@ const getPrediction = async (message, userContext = {}) => {
     }
 };
 
+// Fonction pour précharger les cours d'un utilisateur dans le chatbot à sa connexion
+// (sans attendre la réponse : un échec ne doit jamais bloquer la connexion)
+const prefetchUserCourses = (userId, token) => {
+    axios.post(`${PYTHON_SERVICE_URL}/users/prefetch`, { userId }, {
+        headers: { Authorization: `Bearer ${token}` },
+        timeout: 2000
+    }).catch((error) => {
+        console.log('Préchargement du chatbot ignoré:', error.message);
+    });
+};
+
 module.exports = {
     checkPythonService,
     startPythonService,
     trainModel,
-    getPrediction
+    getPrediction,
+    prefetchUserCourses
 };